@@ -7,6 +7,7 @@ will be included or excluded during the loop to minimise time selecting substrat
 """
 
 from f_make_surrogate_model import *
+from f_parallel_screening import screen_substrates
 
 # ----- script specifications
 saveSwitch = True
@@ -43,25 +44,32 @@ toIgnore = ['D-Lyxitol', 'alpha-Methyl-D-glucoside', 'CELB', 'TRHL', 'GLCN', 'Su
             'Thyminose', 'D-Ribose', 'Glucuronate', 'Fumarate', '2-Oxobutyrate', 'L-Malate', 'DTYL', '2-Oxoglutarate',
             'D-Arabinose', 'D-Mannose', 'Salicin', 'L-Lyxitol', 'Xylitol', 'D-GLUCOSE-6-PHOSPHATE', 'GLUCOSE-1-PHOSPHATE']
 
-# create the json files
-allConsideredSubstrates = []
-allIgnoredSubstrate = []
-for i, organism in enumerate(microorganisms):
-    objec, considered, ignored = SBML_2_json_v2(modelName=organism, substrate_exchange_rnx='select',
-                                                product_exchange_rnx=products, maxConcentration= maxConcentration,
-                                                yieldTol=tolerance, saveName=saveNames[i], save=saveSwitch,
-                                                toIgnore=toIgnore, alreadyConsidered=alreadyConsidered)
+# the workers of the parallel screening are spawned on Windows, so the script runs from within the main guard
+if __name__ == '__main__':
+    # screen the substrates of all the models in parallel (one pFBA per substrate)
+    yieldDFs = screen_substrates(modelNames=microorganisms, substrateExchRxnIDs=substrates,
+                                 productExchRxnIDs=products)
 
-    allConsideredSubstrates += considered
-    allIgnoredSubstrate += ignored
+    # create the json files
+    allConsideredSubstrates = []
+    allIgnoredSubstrate = []
+    for i, organism in enumerate(microorganisms):
+        objec, considered, ignored = SBML_2_json_v2(modelName=organism, substrate_exchange_rnx='select',
+                                                    product_exchange_rnx=products, maxConcentration= maxConcentration,
+                                                    yieldTol=tolerance, saveName=saveNames[i], save=saveSwitch,
+                                                    toIgnore=toIgnore, alreadyConsidered=alreadyConsidered,
+                                                    yieldDF=yieldDFs[organism])
 
-    alreadyConsidered = list(set(allConsideredSubstrates))
-    toIgnore = list(set(allIgnoredSubstrate))
+        allConsideredSubstrates += considered
+        allIgnoredSubstrate += ignored
 
-# print all the considered and ignored substrates to the terminal
-print(alreadyConsidered)
-print(toIgnore)
+        alreadyConsidered = list(set(allConsideredSubstrates))
+        toIgnore = list(set(allIgnoredSubstrate))
 
-# save the input clusters to a json file as well
-inputCluster = {'inputs': alreadyConsidered}
-save_2_json(saveName='input_cluster.json', saveObject=inputCluster)
+    # print all the considered and ignored substrates to the terminal
+    print(alreadyConsidered)
+    print(toIgnore)
+
+    # save the input clusters to a json file as well
+    inputCluster = {'inputs': alreadyConsidered}
+    save_2_json(saveName='input_cluster.json', saveObject=inputCluster)
@@ -0,0 +1,141 @@
+"""
+Checks of the enumeration of the configurations of f_enumerate_configurations
+
+Run this script from the Alquimia folder (the case study model is read from 'excel files'), every check raises an
+AssertionError when it fails.
+"""
+
+import io
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import pyomo.environ as pe
+from f_enumerate_configurations import get_choice_sets, solve_configuration, enumerate_model_configurations, \
+    get_node_backend, _init_enumeration_worker, _solve_node_worker
+from f_make_super_structure import make_super_structure
+from f_solvers import is_backend_available
+
+
+def make_unbounded_relaxation_model():
+    """ small superstructure of two choice sets (y_a, y_b) and (y_c, y_d). The constraints with products of booleans
+    that are not fixed are left out of the relaxations of the nodes, so the relaxation of every partial configuration
+    is unbounded (x = w + v). The configurations with y_b are infeasible (x <= 9 and x >= 50), the best configuration
+    is (y_a, y_c) with x = 10 + 20 """
+    model = pe.ConcreteModel()
+    model.var = pe.Var(['x', 'w', 'v'], domain=pe.Reals, bounds=(0, None))
+    model.boolVar = pe.Var(['y_a', 'y_b', 'y_c', 'y_d'], domain=pe.Boolean)
+    x, w, v, y = model.var['x'], model.var['w'], model.var['v'], model.boolVar
+    model.constraints = pe.ConstraintList()
+    model.constraints.add(1 == y['y_a'] + y['y_b'])
+    model.constraints.add(1 == y['y_c'] + y['y_d'])
+    model.constraints.add(x == w + v)
+    model.constraints.add(w <= 10 * y['y_a'] * y['y_c'] + 6 * y['y_a'] * y['y_d'] + 3 * y['y_b'] * y['y_c']
+                          + 4 * y['y_b'] * y['y_d'])
+    model.constraints.add(v <= 2 * w * y['y_c'])
+    model.constraints.add(x >= 50 * y['y_b'])
+    model.objectiveValue = pe.Objective(expr=x, sense=pe.maximize)
+    return model
+
+
+def check_unbounded_relaxation(backend):
+    """ an unbounded relaxation is not pruned as infeasible, the feasible configurations below it are solved """
+    model = make_unbounded_relaxation_model()
+    choiceSets = {'choice_set_{}'.format(i + 1): boolNames for i, boolNames in enumerate(get_choice_sets(model))}
+    assert list(choiceSets.values()) == [['y_a', 'y_b'], ['y_c', 'y_d']], choiceSets
+
+    for assignment in [{}, {'choice_set_1': 'y_a'}, {'choice_set_1': 'y_b'}]:
+        node = solve_configuration(model, assignment, choiceSets, 1, {'backend': backend})
+        assert node['status'] in ('unbounded', 'infeasibleOrUnbounded') and node['objective'] is None, node
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        rankingDF = enumerate_model_configurations(model, nWorkers=1, solveOptions={'backend': backend})
+    best = rankingDF.loc[1]
+    assert (best['choice_set_1'], best['choice_set_2'], best['status']) == ('y_a', 'y_c', 'optimal'), rankingDF
+    assert abs(best['objective'] - 30 * 24) < 1e-6, rankingDF
+    infeasible = rankingDF[rankingDF['choice_set_1'] == 'y_b']
+    assert (infeasible['status'] == 'infeasible').all(), rankingDF
+
+
+def check_spawned_enumeration(backend):
+    """ the enumeration with spawned worker processes (as on Windows and macOS) gives the same ranking as the
+    enumeration in this process """
+    model = make_unbounded_relaxation_model()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rankingDF = enumerate_model_configurations(model, nWorkers=1, solveOptions={'backend': backend}, prune=False)
+        spawnedDF = enumerate_model_configurations(model, nWorkers=2, solveOptions={'backend': backend}, prune=False)
+    # the configurations without an objective are ranked in the order they are solved
+    columns = [column for column in rankingDF.columns if column != 'solve_time']
+    setNames = ['choice_set_1', 'choice_set_2']
+    pd.testing.assert_frame_equal(rankingDF[columns].sort_values(setNames).reset_index(drop=True),
+                                  spawnedDF[columns].sort_values(setNames).reset_index(drop=True))
+
+
+def check_case_study_configuration(excelFile='propionate_case_study_v2.xlsx', backend='highs'):
+    """ the relaxations of the nodes of the case study are not infeasible and the configuration
+    (y_acn, y_liq_liq, y_L-Lactate_carbon_source) is solved, also by a spawned worker process """
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = make_super_structure(excelFile, useExcelCache=False)
+    choiceSets = {'choice_set_{}'.format(i + 1): boolNames for i, boolNames in enumerate(get_choice_sets(model))}
+
+    chosenBools = ['y_acn', 'y_liq_liq', 'y_L-Lactate_carbon_source']
+    assignment = {setName: chosenBool for setName, boolNames in choiceSets.items() for chosenBool in chosenBools
+                  if chosenBool in boolNames}
+    assert len(assignment) == len(choiceSets), assignment
+    for level in range(len(choiceSets)):
+        partialAssignment = dict(list(assignment.items())[:level])
+        node = solve_configuration(model, partialAssignment, choiceSets, 1, {'backend': backend})
+        assert node['status'] != 'infeasible', node
+    node = solve_configuration(model, assignment, choiceSets, 1, {'backend': backend})
+    assert node['status'] == 'optimal' and node['objective'] is not None, node
+
+    # the same configuration solved by a spawned worker process that gets the superstructure when it starts
+    with ProcessPoolExecutor(max_workers=1, initializer=_init_enumeration_worker, initargs=(model,)) as executor:
+        workerNode = executor.submit(_solve_node_worker, (assignment, choiceSets, 1, {'backend': backend})).result()
+    assert workerNode['status'] == 'optimal' and abs(workerNode['objective'] - node['objective']) < 1e-6, workerNode
+    return node['objective']
+
+
+def check_nonlinear_configurations(excelFile='propionate_case_study_v2.xlsx', backend='highs'):
+    """ the configurations that stay nonlinear (e.g., the pH of open_fermentation, also with the hull reformulation)
+    are solved with an NLP solver, without one the enumeration stops before solving instead of ranking errors """
+    buildOptions = {'equationMode': 'symbolic', 'boolReformulation': 'hull'}
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = make_super_structure(excelFile, useExcelCache=False, **buildOptions)
+
+    nlpBackend = get_node_backend('NLP', {'backend': backend})
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            rankingDF = enumerate_model_configurations(model, nWorkers=1, solveOptions={'backend': backend})
+    except Exception as e:
+        assert nlpBackend is None and 'NLP' in str(e), e
+    else:
+        assert nlpBackend is not None and not rankingDF['status'].str.startswith('error').any(), rankingDF
+
+    # with a fixed pH all the configurations are linear
+    model.var['pH_open_fermentation'].fix(6)
+    with contextlib.redirect_stdout(io.StringIO()):
+        rankingDF = enumerate_model_configurations(model, nWorkers=1, solveOptions={'backend': backend})
+    assert not rankingDF['status'].str.startswith('error').any(), rankingDF
+    best = rankingDF.loc[1]
+    assert (best['choice_set_1'], best['choice_set_2'], best['choice_set_3']) == \
+           ('y_acn', 'y_liq_liq', 'y_L-Lactate_carbon_source'), rankingDF
+    return nlpBackend
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('spawn', force=True)
+    for backend in ['highs', 'glpk']:
+        if not is_backend_available(backend):
+            print('{} is not installed, skipped'.format(backend))
+            continue
+        check_unbounded_relaxation(backend)
+        print('unbounded relaxation ({}): ok'.format(backend))
+        check_spawned_enumeration(backend)
+        print('spawned workers ({}): ok'.format(backend))
+    objective = check_case_study_configuration()
+    print('propionate_case_study_v2.xlsx: the configuration (y_acn, y_liq_liq, y_L-Lactate_carbon_source) is optimal, '
+          'objective = {}'.format(objective))
+    nlpBackend = check_nonlinear_configurations()
+    print('propionate_case_study_v2.xlsx (hull): the nonlinear configurations are solved with {}'.format(
+        nlpBackend if nlpBackend else 'no solver, the enumeration stops before solving'))
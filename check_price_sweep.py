@@ -0,0 +1,46 @@
+"""
+Checks of the parallel price sweep of f_price_sweep
+
+Run this script from the Alquimia folder (the case study model is read from 'excel files'), every check raises an
+AssertionError when it fails. The worker processes are spawned (as on Windows and macOS), so the superstructure has to
+be picklable to be send to the workers.
+"""
+
+import io
+import pickle
+import contextlib
+import multiprocessing
+import pandas as pd
+from f_make_super_structure import make_super_structure
+from f_price_sweep import run_price_sweep
+
+
+def check_pickle_model(excelFile):
+    """ the superstructures of the different build options can be pickled """
+    for buildOptions in [{}, {'modelStructure': 'blocks'}, {'equationMode': 'symbolic', 'boolReformulation': 'hull'},
+                         {'equationMode': 'symbolic', 'gdpTransformation': 'hull'}]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = make_super_structure(excelFile, useExcelCache=False, **buildOptions)
+        copyModel = pickle.loads(pickle.dumps(model))
+        assert len(list(copyModel.component_data_objects())) == len(list(model.component_data_objects())), \
+            buildOptions
+
+
+def check_spawned_sweep(excelFile):
+    """ the sweep with spawned worker processes gives the same results as the sweep in this process """
+    scenarios = pd.DataFrame({'D-Glucose': [0.1, 0.5, 5]}, index=['low', 'base', 'high'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultsDF = run_price_sweep(excelFile, scenarios, nWorkers=1, useExcelCache=False)
+        spawnedDF = run_price_sweep(excelFile, scenarios, nWorkers=2, useExcelCache=False)
+    columns = [column for column in resultsDF.columns if column != 'solve_time']
+    pd.testing.assert_frame_equal(resultsDF[columns], spawnedDF[columns])
+    return resultsDF['status'].to_dict()
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('spawn', force=True)
+    for file in ['propionate_case_study_v1.xlsx', 'propionate_case_study_v2.xlsx']:
+        check_pickle_model(file)
+        print('{}: the superstructure can be pickled'.format(file))
+        statusDict = check_spawned_sweep(file)
+        print('{}: the spawned workers give the same results {}'.format(file, statusDict))
@@ -0,0 +1,52 @@
+"""
+Checks of the solver backends of f_solvers
+
+Every check raises an AssertionError when it fails, the backends that are not installed are skipped.
+"""
+
+import pyomo.environ as pe
+from pyomo.opt import SolverResults, TerminationCondition
+from f_solvers import is_backend_available, solve_with_backend, has_solution, get_solve_status
+
+
+def make_small_model(infeasible=False):
+    """ max x + 2 y with x + y <= 4, y <= 3 (x = 1, y = 3) """
+    model = pe.ConcreteModel()
+    model.x = pe.Var(bounds=(0, None))
+    model.y = pe.Var(bounds=(0, 3), domain=pe.Integers)
+    model.capacity = pe.Constraint(expr=model.x + model.y <= 4)
+    if infeasible:
+        model.demand = pe.Constraint(expr=model.x >= 5)
+    model.objective = pe.Objective(expr=model.x + 2 * model.y, sense=pe.maximize)
+    return model
+
+
+def check_limit_without_solution():
+    """ a solver stopped by a limit before it found a solution has no solution to read """
+    results = SolverResults()
+    results.solver.termination_condition = TerminationCondition.maxTimeLimit
+    assert not has_solution(results)
+    assert get_solve_status(results) == 'maxTimeLimit'
+
+
+def check_backend(backend):
+    """ the solution of a solve is loaded in the model, an infeasible model has no solution """
+    model = make_small_model()
+    results = solve_with_backend(model, backend)
+    assert get_solve_status(results) == 'optimal' and has_solution(results), results.solver
+    assert abs(pe.value(model.objective) - 7) < 1e-6, pe.value(model.objective)
+
+    model = make_small_model(infeasible=True)
+    results = solve_with_backend(model, backend)
+    assert get_solve_status(results) == 'infeasible' and not has_solution(results), results.solver
+
+
+if __name__ == '__main__':
+    check_limit_without_solution()
+    print('limit without a solution: ok')
+    for backend in ['highs', 'glpk', 'cbc', 'bonmin', 'couenne', 'gams']:
+        if not is_backend_available(backend):
+            print('{} is not installed, skipped'.format(backend))
+            continue
+        check_backend(backend)
+        print('{}: ok'.format(backend))
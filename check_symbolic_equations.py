@@ -0,0 +1,139 @@
+"""
+Checks of the equation parser and the name substitution of f_symbolic_equations
+
+Run this script from the Alquimia folder (the case study models are read from 'excel files'), every check raises an
+AssertionError when it fails.
+"""
+
+import io
+import random
+import contextlib
+import pyomo.environ as pe
+from pyomo.core.expr.visitor import identify_variables
+from pyomo.common.collections import ComponentSet
+from pyomo.util.calc_var_value import calculate_variable_from_constraint
+from f_symbolic_equations import tokenize_equation, str_2_symbolic_equation, substitute_names
+from f_make_super_structure import make_super_structure
+
+
+def check_special_names():
+    """ names with special characters (e.g., 'D-Glucose') are read as one name when they are given """
+    tokens = tokenize_equation("prop == + D-Glucose * 0.28", names=['D-Glucose'])
+    assert tokens == [('name', 'prop'), ('op', '=='), ('op', '+'), ('name', 'D-Glucose'), ('op', '*'),
+                      ('number', 0.28)], tokens
+
+    # without the names D-Glucose is read as D minus Glucose
+    tokens = tokenize_equation("prop == + D-Glucose * 0.28")
+    assert ('name', 'D-Glucose') not in tokens and ('name', 'Glucose') in tokens, tokens
+
+    equation = str_2_symbolic_equation("prop == + D-Glucose * 0.28", names=['D-Glucose'])
+    assert equation.sense == '=='
+    assert equation.lhs.variables() == {('var', 'prop')}, equation
+    assert equation.rhs.variables() == {('var', 'D-Glucose')}, equation
+    assert list(equation.rhs.terms.values()) == [0.28], equation
+
+    # references to the model keep their component and index, '>=' is turned around
+    equation = str_2_symbolic_equation("model.var['Hpr_sep1'] >= 0.3 * model.boolVar['y_R1'] + L-Lactate",
+                                       names=['L-Lactate'])
+    assert equation.sense == '<='
+    assert equation.rhs.variables() == {('var', 'Hpr_sep1')}, equation
+    assert equation.lhs.variables() == {('boolVar', 'y_R1'), ('var', 'L-Lactate')}, equation
+
+
+def check_substitute_names():
+    """ only whole names are replaced, not parts of other names or the indices of model references """
+    equation = "model.var['Hpr_sep1'] == 0.3 * Hpr + Hpr_sep1 * D-Glucose + model.var['Hpr_R1']"
+    newEquation = substitute_names(equation, {'Hpr': "model.var['Hpr_R1']", 'D-Glucose': 'glu'})
+    assert newEquation == "model.var['Hpr_sep1'] == 0.3 * model.var['Hpr_R1'] + Hpr_sep1 * glu + " \
+                          "model.var['Hpr_R1']", newEquation
+
+    # the indices of the references are only renamed with the referenceDict
+    newEquation = substitute_names("model.var['Q_tot'] == Q_tot * 2", {}, referenceDict={'Q_tot': 'energy'})
+    assert newEquation == "model.var['energy'] == Q_tot * 2", newEquation
+
+    # characters that are not part of an equation are kept
+    newEquation = substitute_names("Hpr; Hpr_2 ? Hpr", {'Hpr': 'x'})
+    assert newEquation == "x; Hpr_2 ? x", newEquation
+
+
+def check_case_study(excelFile, seed=0):
+    """ the model made with equationMode='symbolic' has the same constraints as the one made with 'string',
+    the constraints are compared by evaluating them with the same (random) values of the variables """
+    models = {}
+    for equationMode in ('string', 'symbolic'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            models[equationMode] = make_super_structure(excelFile, equationMode=equationMode, useExcelCache=False)
+
+    random.seed(seed)
+    values = {}
+    constraints = {}
+    for equationMode, model in models.items():
+        for var in model.component_data_objects(pe.Var):
+            var.set_value(values.setdefault(var.name, random.uniform(0.1, 1)), skip_validation=True)
+        constraints[equationMode] = {con.name: con for con in model.component_data_objects(pe.Constraint,
+                                                                                           active=True)}
+
+    stringCons, symbolicCons = constraints['string'], constraints['symbolic']
+    assert set(stringCons) == set(symbolicCons), set(stringCons) ^ set(symbolicCons)
+    for name, con in stringCons.items():
+        otherCon = symbolicCons[name]
+        assert pe.value(con.lower) == pe.value(otherCon.lower) and pe.value(con.upper) == pe.value(otherCon.upper), \
+            '{}: {} | {}'.format(name, con.expr, otherCon.expr)
+        stringValue, symbolicValue = pe.value(con.body), pe.value(otherCon.body)
+        assert abs(stringValue - symbolicValue) <= 1e-8 * max(1, abs(stringValue)), \
+            '{}: {} | {}'.format(name, con.expr, otherCon.expr)
+
+    stringObjective = pe.value(models['string'].objectiveValue.expr)
+    symbolicObjective = pe.value(models['symbolic'].objectiveValue.expr)
+    assert abs(stringObjective - symbolicObjective) <= 1e-8 * max(1, abs(stringObjective))
+    return len(stringCons)
+
+
+def check_waste_cost(excelFile, seed=0):
+    """ the waste equations of the symbolic mode sum the same separated streams as the (unchanged) string equations,
+    so the cost of the waste is the same in both modes. The waste masses and the waste cost are calculated from their
+    equations with the same (random) values of the separated streams """
+    random.seed(seed)
+    values = {}
+    wasteCosts = {}
+    wasteStreams = {}
+    for equationMode in ('string', 'symbolic'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = make_super_structure(excelFile, equationMode=equationMode, useExcelCache=False)
+        for var in model.component_data_objects(pe.Var):
+            var.set_value(values.setdefault(var.name, random.uniform(0.1, 1)), skip_validation=True)
+
+        costVar = model.var['cost_waste']
+        wasteVars = [model.var[name] for name in model.price if name.startswith('waste_')]
+        streams = {}
+        for wasteVar in wasteVars:
+            cons = [con for con in model.component_data_objects(pe.Constraint, active=True)
+                    if wasteVar in ComponentSet(identify_variables(con.body)) and
+                    costVar not in ComponentSet(identify_variables(con.body))]
+            assert len(cons) == 1, '{}: {}'.format(wasteVar.name, [con.name for con in cons])
+            streams[wasteVar.name] = sorted(var.name for var in identify_variables(cons[0].body) if var is not wasteVar)
+            assert streams[wasteVar.name], wasteVar.name
+            calculate_variable_from_constraint(wasteVar, cons[0])
+        costCons = [con for con in model.component_data_objects(pe.Constraint, active=True)
+                    if ComponentSet(identify_variables(con.body)) == ComponentSet([costVar] + wasteVars)]
+        assert len(costCons) == 1, [con.name for con in costCons]
+        calculate_variable_from_constraint(costVar, costCons[0])
+        wasteCosts[equationMode] = pe.value(costVar)
+        wasteStreams[equationMode] = streams
+
+    assert wasteStreams['string'] == wasteStreams['symbolic'], wasteStreams
+    stringCost, symbolicCost = wasteCosts['string'], wasteCosts['symbolic']
+    assert abs(stringCost - symbolicCost) <= 1e-8 * max(1, abs(stringCost)), wasteCosts
+    return stringCost
+
+
+if __name__ == '__main__':
+    check_special_names()
+    print('special names: ok')
+    check_substitute_names()
+    print('substitute names: ok')
+    for file in ['propionate_case_study_v1.xlsx', 'propionate_case_study_v2.xlsx']:
+        nConstraints = check_case_study(file)
+        print('{}: the {} constraints of the symbolic and string mode are the same'.format(file, nConstraints))
+        wasteCost = check_waste_cost(file)
+        print('{}: the waste cost of the symbolic and string mode is the same ({})'.format(file, wasteCost))
@@ -0,0 +1,360 @@
+"""
+Functions to enumerate the flowsheet configurations of the superstructure
+
+Instead of solving one MINLP, every combination of the choice sets of booleans (1 == y1 + y2 + ...) is solved as a
+continuous problem with the booleans fixed. The configurations are enumerated as a tree (one level per choice set) in a
+process pool: a node fixes the booleans of the first choice sets and relaxes the others between 0 and 1. The
+constraints that are still nonlinear are left out of the node, so its linear relaxation gives a bound for all the
+configurations below it, these are pruned when the bound is not better than the best configuration found so far.
+The result is the ranked list of configurations.
+"""
+
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+import pyomo.environ as pe
+from pyomo.repn import generate_standard_repn
+from f_make_super_structure import make_super_structure, solve_model
+from f_solvers import SOLVER_BACKENDS, SOLVER_PREFERENCE, get_problem_class, get_solve_status, has_solution, \
+    get_available_backends
+from f_price_sweep import get_model_variables
+
+# superstructure of a worker process (it is passed once to every worker when the pool starts)
+_workerModel = None
+
+
+def _init_enumeration_worker(model):
+    global _workerModel
+    _workerModel = model
+
+
+def _solve_node_worker(nodeInfo):
+    assignment, choiceSets, operatingDays, solveOptions = nodeInfo
+    return solve_configuration(_workerModel, assignment, choiceSets, operatingDays, solveOptions)
+
+
+def get_choice_sets(model):
+    """ finds the choice sets of the booleans in the constraints of the model: 1 == y1 + y2 + ...
+
+    Params:
+        model (pyomo model): the superstructure (flat or with blocks)
+
+    Returns:
+        choiceSets (list): the lists of the names of the booleans of every choice set
+    """
+    choiceSets = []
+    for constraint in model.component_data_objects(pe.Constraint, active=True, descend_into=True):
+        if not constraint.equality:
+            continue
+        repn = generate_standard_repn(constraint.body, compute_values=True)
+        if not repn.is_linear() or not repn.linear_vars:
+            continue
+        if any(var.parent_component().local_name != 'boolVar' for var in repn.linear_vars):
+            continue
+        coefs = set(repn.linear_coefs)
+        if len(coefs) != 1:
+            continue
+        coef = coefs.pop()
+        if abs((pe.value(constraint.upper) - repn.constant) / coef - 1) > 1e-9:
+            continue
+        choiceSets.append([var.index() for var in repn.linear_vars])
+    return choiceSets
+
+
+def check_boolean_constraints(model):
+    """ checks the constraints of which all variables are fixed (e.g., logic constraints between booleans)
+
+    Returns:
+        feasible (bool): False if one of these constraints is violated
+    """
+    for constraint in model.component_data_objects(pe.Constraint, active=True, descend_into=True):
+        variables = list(generate_standard_repn(constraint.body, compute_values=False).linear_vars)
+        if not variables or not all(var.fixed for var in variables):
+            continue
+        value = pe.value(constraint.body)
+        if constraint.has_lb() and value < pe.value(constraint.lower) - 1e-6:
+            return False
+        if constraint.has_ub() and value > pe.value(constraint.upper) + 1e-6:
+            return False
+    return True
+
+
+def linearize_fixed_constraints(model, dropNonlinear=False):
+    """ the products of equations with booleans that are fixed become linear (e.g., (a*x*pH + b*x*pH**2)*y with y = 0).
+    These constraints are replaced by their linear form (model.configuration_constraints)
+
+    Params:
+        model (pyomo model): the superstructure with fixed booleans
+        dropNonlinear (bool): if True the constraints that stay nonlinear are deactivated (relaxation of the model)
+    """
+    model.configuration_constraints = pe.ConstraintList()
+    for constraint in list(model.component_data_objects(pe.Constraint, active=True, descend_into=True)):
+        # the solver interfaces do not use the values of the fixed variables to decide if a constraint is linear
+        if generate_standard_repn(constraint.body, compute_values=False, quadratic=False).nonlinear_expr is None:
+            continue
+        repn = generate_standard_repn(constraint.body, compute_values=True)
+        if repn.is_linear():
+            lower = pe.value(constraint.lower) if constraint.has_lb() else None
+            upper = pe.value(constraint.upper) if constraint.has_ub() else None
+            model.configuration_constraints.add((lower, repn.to_expression(), upper))
+            constraint.deactivate()
+        elif dropNonlinear:
+            constraint.deactivate()
+
+
+def get_node_backend(problemClass, solveOptions):
+    """ the backend of the solve options if it can solve the problem class of the node, otherwise the fastest
+    installed backend that can (e.g., an NLP solver for the configurations that stay nonlinear)
+
+    Params:
+        problemClass (str): problem class of the node 'LP', 'MILP', 'NLP' or 'MINLP'
+        solveOptions (dict): options passed on to solve_model e.g., {'backend': 'highs', 'timeLimit': 60}
+
+    Returns:
+        backend (str): name of the backend, None if no installed backend can solve the problem class
+    """
+    backend = solveOptions.get('backend')
+    if backend is None and solveOptions.get('solverType') is not None:
+        backend = 'gams'  # the solverType refers to a solver of GAMS
+    if backend is not None and problemClass in SOLVER_BACKENDS[backend]['problemClasses']:
+        return backend
+    availableBackends = get_available_backends()
+    for otherBackend in SOLVER_PREFERENCE[problemClass]:
+        if otherBackend in availableBackends:
+            return otherBackend
+    return None
+
+
+def get_configuration_problem_class(model, choiceSets):
+    """ the problem class of the complete configurations that are the hardest to solve: the booleans of the choice sets
+    are fixed at 1 so none of the products with booleans disappears (see linearize_fixed_constraints)
+
+    Params:
+        model (pyomo model): the superstructure
+        choiceSets (dict): {name of the choice set: names of its booleans}
+
+    Returns:
+        problemClass (str): 'LP', 'MILP', 'NLP' or 'MINLP'
+    """
+    model = model.clone()
+    boolVariables = get_model_variables(model, 'boolVar')
+    for boolNames in choiceSets.values():
+        for boolName in boolNames:
+            boolVariables[boolName].fix(1)
+    linearize_fixed_constraints(model)
+    return get_problem_class(model)
+
+
+def solve_configuration(model, assignment, choiceSets, operatingDays, solveOptions=None):
+    """ fixes the booleans of a (partial) configuration in a copy of the model and solves it. For a complete
+    configuration the booleans that are not part of a choice set stay binary. For a partial configuration the other
+    booleans are relaxed between 0 and 1 and the constraints that are nonlinear are left out, so the objective of this
+    linear relaxation is a bound for all the configurations below it
+
+    Params:
+        model (pyomo model): the superstructure
+        assignment (dict): {name of the choice set: chosen boolean}, the booleans of the choice set are fixed
+        choiceSets (dict): {name of the choice set: names of its booleans}
+        operatingDays (int): operating days (the objective is multiplied by the operating hours)
+        solveOptions (dict): options passed on to solve_model e.g., {'backend': 'highs', 'timeLimit': 60}
+
+    Returns:
+        node (dict): assignment, status, problem class, objective (None if infeasible) and solve time
+    """
+    if solveOptions is None:
+        solveOptions = {}
+    operatingHours = operatingDays * 24
+    complete = len(assignment) == len(choiceSets)
+    model = model.clone()
+
+    fixedBools = {}
+    for setName, chosenBool in assignment.items():
+        fixedBools.update({boolName: int(boolName == chosenBool) for boolName in choiceSets[setName]})
+    for name, var in get_model_variables(model, 'boolVar').items():
+        if name in fixedBools:
+            var.fix(fixedBools[name])
+        else:
+            var.unfix()
+            var.domain = pe.Binary if complete else pe.UnitInterval
+
+    node = {'assignment': assignment, 'complete': complete}
+    startTime = time.time()
+    if not check_boolean_constraints(model):
+        node.update({'status': 'infeasible', 'problem_class': None, 'objective': None, 'solve_time': 0})
+        return node
+
+    linearize_fixed_constraints(model, dropNonlinear=not complete)
+    problemClass = get_problem_class(model)
+    node.update({'problem_class': problemClass})
+    # e.g., the configurations of which the chosen intervals have nonlinear equations need an NLP solver
+    backend = get_node_backend(problemClass, solveOptions)
+    if backend is None:
+        raise Exception('No solver is installed that can solve the {} problem of the configuration {}, install one of: '
+                        '{}'.format(problemClass, assignment, SOLVER_PREFERENCE[problemClass]))
+    try:
+        results = solve_model(model, operatingDays=operatingDays, printResults=False,
+                              **(solveOptions | {'backend': backend}))
+        # only a proven infeasible node is pruned, an unbounded relaxation gives no bound (its subtree is branched)
+        status = get_solve_status(results)
+        solutionFound = has_solution(results)
+    except Exception as e:
+        # a failed configuration should not stop the enumeration
+        status = 'error: {}'.format(e)
+        solutionFound = False
+    node.update({'status': status, 'solve_time': time.time() - startTime})
+
+    # a complete configuration stopped by a limit keeps the solution it found, the objective of a relaxation is only a
+    # bound if it is optimal
+    if solutionFound and (complete or status == 'optimal'):
+        objectiveValue = pe.value(model.objectiveValue, exception=False)
+    else:
+        objectiveValue = None
+    node.update({'objective': objectiveValue * operatingHours if objectiveValue is not None else None})
+    return node
+
+
+def enumerate_configurations(excelFile, nWorkers=None, operatingDays=1, solveOptions=None, prune=True,
+                             tolerance=1e-6, saveName=None, **buildOptions):
+    """ Enumerates all the configurations of the choice sets of booleans, solves them in parallel and ranks them.
+    The tree of the configurations fixes one choice set per level, a node is pruned if the objective of its linear
+    relaxation (a bound) is not better than the best configuration found so far.
+
+    REMARK: on Windows the worker processes are spawned, call this function from within
+    if __name__ == '__main__':
+
+    Params:
+        excelFile (str): name of the Excel file of the superstructure
+        nWorkers (int): amount of worker processes, if None the amount of cores. If 1 the nodes are solved in this
+                        process
+        operatingDays (int): operating days used to report the objective
+        solveOptions (dict): options passed on to solve_model e.g., {'backend': 'highs', 'timeLimit': 60}. The
+                             configurations the backend can not solve (e.g., the ones that stay nonlinear) are solved
+                             with the fastest installed backend that can (see get_node_backend)
+        prune (bool): if False every configuration is solved (complete ranking)
+        tolerance (float): a node is pruned if its bound is not better than the best objective plus this tolerance
+        saveName (str): if given the ranking is saved to this Excel file
+        buildOptions: extra arguments of make_super_structure (e.g., equationMode='symbolic')
+
+    Returns:
+        rankingDF (DF): one row per configuration: the chosen booleans, status, objective, bound (objective of the
+                        relaxation of the node above it) and solve time, sorted from the best to the worst
+                        configuration (the pruned ones last)
+    """
+    model = make_super_structure(excelFile=excelFile, **buildOptions)
+    return enumerate_model_configurations(model, nWorkers=nWorkers, operatingDays=operatingDays,
+                                          solveOptions=solveOptions, prune=prune, tolerance=tolerance,
+                                          saveName=saveName)
+
+
+def enumerate_model_configurations(model, nWorkers=None, operatingDays=1, solveOptions=None, prune=True,
+                                   tolerance=1e-6, saveName=None):
+    """ Enumerates and ranks the configurations of a superstructure that is already made (see
+    enumerate_configurations). The choice sets are the constraints 1 == y1 + y2 + ... of the boolean variables
+    (model.boolVar) and the objective is model.objectiveValue
+
+    Params:
+        model (pyomo model): the superstructure
+        other params: see enumerate_configurations
+
+    Returns:
+        rankingDF (DF): see enumerate_configurations
+    """
+    choiceSets = get_choice_sets(model)
+    if not choiceSets:
+        raise Exception('The superstructure has no choice sets (1 == y1 + y2 + ...), there are no configurations to '
+                        'enumerate')
+    choiceSets = {'choice_set_{}'.format(i + 1): boolNames for i, boolNames in enumerate(choiceSets)}
+    setNames = list(choiceSets.keys())
+
+    # check that the configurations can be solved before filling the ranking with errors
+    if solveOptions is None:
+        solveOptions = {}
+    problemClass = get_configuration_problem_class(model, choiceSets)
+    if get_node_backend(problemClass, solveOptions) is None:
+        raise Exception('The configurations of the superstructure are {} problems (the equations of some of the '
+                        'intervals stay nonlinear when the booleans are fixed) and no solver is installed that can '
+                        'solve them, install one of: {}'.format(problemClass, SOLVER_PREFERENCE[problemClass]))
+    maximise = model.objectiveValue.sense == pe.maximize
+    nConfigurations = 1
+    for boolNames in choiceSets.values():
+        nConfigurations *= len(boolNames)
+    print('enumerating {} configurations of {} choice sets'.format(nConfigurations, len(choiceSets)))
+
+    def is_worse(bound, incumbent):
+        if incumbent is None:
+            return False
+        return bound <= incumbent + tolerance if maximise else bound >= incumbent - tolerance
+
+    def make_row(assignment, status, objective, bound, solveTime):
+        row = {setName: assignment.get(setName) for setName in setNames}
+        row.update({'status': status, 'objective': objective, 'bound': bound, 'solve_time': solveTime})
+        return row
+
+    def make_rows_below(assignment, status, bound):
+        """ rows of all the complete configurations below a node that are not solved (pruned or infeasible) """
+        remainingSets = setNames[len(assignment):]
+        return [make_row(assignment | dict(zip(remainingSets, chosenBools)), status, None, bound, 0)
+                for chosenBools in itertools.product(*[choiceSets[setName] for setName in remainingSets])]
+
+    if nWorkers is None:
+        nWorkers = os.cpu_count()
+    if nWorkers == 1:
+        _init_enumeration_worker(model)
+        executor = ThreadPoolExecutor(max_workers=1)  # one thread solving in this process
+    else:
+        executor = ProcessPoolExecutor(max_workers=nWorkers, initializer=_init_enumeration_worker,
+                                       initargs=(model,))
+
+    rows = []
+    incumbent = None
+    # without pruning only the complete configurations are solved
+    if prune:
+        queue = [({}, None)]  # (assignment, bound of the parent node)
+    else:
+        queue = [(dict(zip(setNames, chosenBools)), None) for chosenBools in itertools.product(*choiceSets.values())]
+    running = {}
+    with executor:
+        while queue or running:
+            # send the nodes that are not pruned yet to the workers
+            while queue and len(running) < 2 * nWorkers:
+                assignment, parentBound = queue.pop()
+                if parentBound is not None and is_worse(parentBound, incumbent):
+                    rows += make_rows_below(assignment, 'pruned', parentBound)
+                    continue
+                future = executor.submit(_solve_node_worker, (assignment, choiceSets, operatingDays, solveOptions))
+                running.update({future: (assignment, parentBound)})
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                assignment, parentBound = running.pop(future)
+                node = future.result()
+                if node['complete']:
+                    rows.append(make_row(assignment, node['status'], node['objective'], parentBound,
+                                         node['solve_time']))
+                    if node['objective'] is not None and (incumbent is None or not is_worse(node['objective'],
+                                                                                            incumbent)):
+                        incumbent = node['objective']
+                    continue
+
+                if node['status'] == 'infeasible':
+                    # the relaxation is proven infeasible so all the configurations below it are infeasible
+                    rows += make_rows_below(assignment, 'infeasible', None)
+                    continue
+                bound = node['objective']
+                if bound is not None and is_worse(bound, incumbent):
+                    rows += make_rows_below(assignment, 'pruned', bound)
+                    continue
+                nextSet = setNames[len(assignment)]
+                queue += [(assignment | {nextSet: chosenBool}, bound) for chosenBool in choiceSets[nextSet]]
+
+    rankingDF = pd.DataFrame(rows)
+    rankingDF = rankingDF.sort_values('objective', ascending=not maximise, na_position='last').reset_index(drop=True)
+    rankingDF.index = rankingDF.index + 1
+    rankingDF.index.name = 'rank'
+    print('{} configurations are solved, {} are pruned'.format(sum(rankingDF['status'] != 'pruned'),
+                                                               sum(rankingDF['status'] == 'pruned')))
+    if saveName:
+        rankingDF.to_excel(saveName)
+    return rankingDF
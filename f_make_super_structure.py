@@ -10,11 +10,21 @@ import pandas as pd
 import cobra
 import cobra.io
 import numpy as np
+import os
 from collections import OrderedDict
 import pyomo.environ as pe
 import pyomo.opt as po
+from pyomo.contrib.fbbt.fbbt import fbbt, compute_bounds_on_expr
+from pyomo.common.collections import ComponentSet
+from pyomo.core.expr.visitor import identify_mutable_parameters, identify_variables
+from pyomo.repn import generate_standard_repn
+from pyomo.gdp import Disjunct, Disjunction
 from f_usefull_functions import *
-from f_screen_SBML import count_atom_in_formula
+from f_screen_SBML import count_atom_in_formula, load_sbml_model
+from f_solvers import select_backend, solve_with_backend, get_problem_class, has_solution
+from f_superstructure_file import SUPERSTRUCTURE_FILE_EXTENSIONS, read_superstructure_file_sheets
+from f_symbolic_equations import SymbolicEquation, sym_var, sym_bool, sym_fraction, sym_param, sym_sum, \
+    str_2_symbolic_equation, str_2_symbolic_expression, tokenize_equation, substitute_names
 import time
 
 
@@ -40,7 +50,7 @@ def get_conversion_sbml(modelLocations, substrate_exchange_rnx, product_exchange
     allEquations = []
     modelNames = []
     for i in modelLocations:
-        model = cobra.io.read_sbml_model(i)
+        model = load_sbml_model(i)
         # make sure the right objective is set
         if newObjectiveReaction:
             model.objective = newObjectiveReaction
@@ -113,12 +123,7 @@ def make_str_eq_smbl(modelName, substrate_exchange_rnx, product_exchange_rnx, eq
     for i, out in enumerate(outputSbmlName):
         abbrDict.update({out: outputAbrr[i]})
 
-    allEquations = []
-    for eq in equations:
-        for name in abbrDict:
-            if name in eq:
-                eq = eq.replace(name, abbrDict[name])
-        allEquations.append(eq)
+    allEquations = [substitute_names(eq, abbrDict) for eq in equations]
 
     return allEquations
 
@@ -178,26 +183,24 @@ def make_str_eq_json(modelObject, equationInfo):
     for i, varN in enumerate(varNames):
         abbrDict.update({varN: Abrr[i]})
 
+    # update the water Eq
+    waterEq = substitute_names(waterEq, {out: abbrDict[out] for out in outputs})
+
     equationList = []
     print(name)
     for out in outputs:
         outAbrr = abbrDict[out]
         coefOfOutputs = coef[out]
 
-        # update the water Eq
-        waterEq = waterEq.replace(out, outAbrr)
-
         # preallocate the right side of the reaction equation
         yieldEq = ''
         for feature in coefOfOutputs:
-            ### this for loop to replace all the full variable names with the abbreviuations
-            featureAbbr = ''
-            for v in varNames:
-                if v in feature:
-                    featureAbbr = feature.replace(v, abbrDict[v])
-            if not featureAbbr:
+            ### replace all the full variable names with the abbreviuations
+            featureNames = [value for kind, value in tokenize_equation(feature, names=varNames) if kind == 'name']
+            if not set(featureNames).intersection(abbrDict):
                 raise Exception('the feature {} has no abbreviation check the JSON file and the sheet models, '
                                 'are names and abrr correct?'.format(feature))
+            featureAbbr = substitute_names(feature, abbrDict)
             ###
             featureCoef = coefOfOutputs[feature]
             yieldEq += ' + {} * {} '.format(featureAbbr, featureCoef)
@@ -259,15 +262,44 @@ def make_str_eq_distilation_json(modelObject, intervalName):
     # add intercept
     energyRequiermentEqRight += " + {}".format(intercept[out])
     energyRequiermentEqRight = '(' + energyRequiermentEqRight + ')'
-    for var in replacementDict:
-        rplc = "model.var['{}']".format(replacementDict[var])
-        energyRequiermentEqRight = energyRequiermentEqRight.replace(var,rplc)
+    pyomoReplacementDict = {var: "model.var['{}']".format(replacementDict[var]) for var in replacementDict}
+    energyRequiermentEqRight = substitute_names(energyRequiermentEqRight, pyomoReplacementDict)
     eq = energyRequiermentEqLeft + energyRequiermentEqRight
 
     variableList = list(replacementDict.values())
     return eq, variableList
 
 
+def make_symbolic_eq_distilation_json(modelObject, intervalName):
+    """Same as make_str_eq_distilation_json but returns the energy equation as a SymbolicEquation
+    inputs:
+    model object (dict): is the unpacked .json file
+    intervalName (str): name of the interval
+
+    returns:
+    equation (SymbolicEquation): energy_consumption_{intervalName} == regression of the input variables
+    variableList (list): list of the variables of the regression
+    """
+    inputs = modelObject['inputs']
+    outputs = modelObject['outputs']
+    coef = modelObject['coef']
+    intercept = modelObject['intercept']
+
+    varNames = inputs + outputs
+    replacementDict = {var: '{}_{}'.format(var, intervalName) for var in varNames}
+
+    out = outputs[0]  # there should only be one output name
+    outVar = 'energy_consumption_{}'.format(intervalName)
+    coefOfOutputs = coef[out]
+    energyRequiermentRight = sym_sum(str_2_symbolic_expression(feature, names=varNames) * coefOfOutputs[feature]
+                                     for feature in coefOfOutputs)
+    energyRequiermentRight = (energyRequiermentRight + intercept[out]).rename(replacementDict)
+    equation = SymbolicEquation(sym_var(outVar), energyRequiermentRight)
+
+    variableList = list(replacementDict.values())
+    return equation, variableList
+
+
 # Created on Tue Oct 04 2022
 # Contains the classes to make the process interval objects
 
@@ -322,6 +354,152 @@ def define_connect_info(connectInfo):
     return connectKey, sepKey, splitKey, boolKey
 
 
+class ConnectionEdge:
+    __slots__ = ('source', 'target', 'info', 'connectKey', 'sepKey', 'splitKey', 'boolKey')
+
+    def __init__(self, source, target, info):
+        """ a connection between two intervals (a non zero cell of the connection matrix, not on the diagonal)
+
+        Params:
+            source (str): name of the interval the stream leaves (row of the connection matrix)
+            target (str): name of the interval the stream enters (column of the connection matrix)
+            info (int or str): the cell of the connection matrix
+        """
+        self.source = source
+        self.target = target
+        self.info = info
+        # the connection keys are read once (see define_connect_info)
+        self.connectKey, self.sepKey, self.splitKey, self.boolKey = define_connect_info(info)
+
+    def __repr__(self):
+        return 'ConnectionEdge({} -> {}: {})'.format(self.source, self.target, self.info)
+
+
+class ConnectionGraph:
+    def __init__(self, DFconnectionMatrix):
+        """ The connection matrix compiled to a graph in one pass. The non zero cells (that are not on the diagonal) are
+        the edges, the strings on the diagonal are the boolean variables of the intervals. The edges entering and
+        leaving every interval are kept in the order of the rows and columns of the connection matrix, so the builders
+        of the interval objects find the same connections as when scanning the matrix.
+
+        Params:
+            DFconnectionMatrix (DF): the connection matrix, the index and columns are the interval names
+        """
+        self.connectionDF = DFconnectionMatrix
+        self.intervals = list(DFconnectionMatrix.index)
+        self.booleans = {}  # {interval: boolean variable on the diagonal}
+        self.edges = []
+        self.inEdges = {name: [] for name in DFconnectionMatrix.columns}
+        self.outEdges = {name: [] for name in DFconnectionMatrix.index}
+
+        # the cells that connect intervals (empty cells are read as 0)
+        cells = DFconnectionMatrix.to_numpy()
+        connected = (DFconnectionMatrix.ne(0) & DFconnectionMatrix.notna()).to_numpy()
+        columns = list(DFconnectionMatrix.columns)
+        for row, col in zip(*np.nonzero(connected)):  # row by row, so the entering edges are in the order of the rows
+            source = self.intervals[row]
+            target = columns[col]
+            info = cells[row, col]
+            if source == target:
+                if isinstance(info, str):
+                    self.booleans[source] = info
+                continue
+            edge = ConnectionEdge(source=source, target=target, info=info)
+            self.edges.append(edge)
+            self.outEdges[source].append(edge)
+            self.inEdges[target].append(edge)
+
+    def in_edges(self, intervalName):
+        """ the edges entering the interval (in the order of the rows of the connection matrix) """
+        return self.inEdges.get(intervalName, [])
+
+    def out_edges(self, intervalName):
+        """ the edges leaving the interval (in the order of the columns of the connection matrix) """
+        return self.outEdges.get(intervalName, [])
+
+    def boolean(self, intervalName):
+        """ the boolean variable of the interval (diagonal of the connection matrix), None if there is none """
+        return self.booleans.get(intervalName)
+
+    def connected_intervals(self, intervalName):
+        """ the intervals that go into the interval {interval name: cell of the connection matrix}
+        (same as get_connected_intervals) """
+        return {edge.source: edge.info for edge in self.in_edges(intervalName)}
+
+    def mix_dictionary(self, intervalName):
+        """ the intervals mixed in the interval {interval name: cell of the connection matrix}, empty if less than 2
+        intervals go into the interval (same as make_mix_dictionary) """
+        connectedIntervals = self.connected_intervals(intervalName)
+        if len(connectedIntervals) >= 2:
+            return connectedIntervals
+        return {}
+
+    def split_streams(self, intervalName):
+        """ the streams of the interval that are split (the interval or its separated streams, e.g., 'name_sep1') """
+        splitList = []
+        for edge in self.out_edges(intervalName):
+            if edge.splitKey and edge.sepKey:
+                splitList.append('{}_{}'.format(intervalName, edge.sepKey))
+            elif edge.splitKey:
+                splitList.append(intervalName)
+        return splitList
+
+
+def get_connection_graph(ExcelDict):
+    """ Returns the compiled connection matrix of the superstructure (see ConnectionGraph). The graph is kept in the
+    ExcelDict under 'connection_graph' and compiled again if the connection matrix has been replaced (e.g., by
+    presolve_connection_graph)
+
+    Parameters:
+        ExcelDict (Dict): Dictionary containing all info on the superstructure in the form of dataframes
+
+    Returns:
+        connectionGraph (ConnectionGraph)
+    """
+    connectionGraph = ExcelDict.get('connection_graph')
+    if connectionGraph is None or connectionGraph.connectionDF is not ExcelDict['connection_DF']:
+        connectionGraph = ConnectionGraph(ExcelDict['connection_DF'])
+        ExcelDict['connection_graph'] = connectionGraph
+    return connectionGraph
+
+
+def find_boolean_choice_sets(connectionGraph, booleanIntervals):
+    """ Divides the intervals with a boolean variable in the sets of intervals of which only one can be chosen
+    (1 == sum(boolean variables)). The boolean intervals (in the order of the columns of the connection matrix) are cut
+    in consecutive sets: a set starts at the first interval that is not in a set yet and holds the longest run of
+    consecutive boolean intervals an interval (row of the connection matrix, diagonal included) is connected to.
+    The runs of all the rows are counted in one pass from the last boolean interval to the first, so the sets are found
+    without scanning the connection matrix again for every set.
+
+    Params:
+        connectionGraph (ConnectionGraph): the compiled connection matrix (see get_connection_graph)
+        booleanIntervals (list): names of the intervals with a boolean variable on the diagonal (order of the columns)
+
+    Returns:
+        choiceSets (list): a list with the interval names of every set
+    """
+    rowPosition = {name: i for i, name in enumerate(connectionGraph.intervals)}
+    connected = np.zeros((len(rowPosition), len(booleanIntervals)), dtype=bool)
+    for j, intervalName in enumerate(booleanIntervals):
+        connected[rowPosition[intervalName], j] = True  # the boolean variable on the diagonal
+        for edge in connectionGraph.in_edges(intervalName):
+            connected[rowPosition[edge.source], j] = True
+
+    # runLength[i, j]: the amount of consecutive boolean intervals (from column j on) row i is connected to
+    runLength = np.zeros((len(rowPosition), len(booleanIntervals) + 1), dtype=int)
+    for j in range(len(booleanIntervals) - 1, -1, -1):
+        runLength[:, j] = np.where(connected[:, j], runLength[:, j + 1] + 1, 0)
+    longestRun = runLength.max(axis=0)
+
+    # the diagonal makes every run at least 1 long, so every boolean interval ends up in a set
+    choiceSets = []
+    j = 0
+    while j < len(booleanIntervals):
+        choiceSets.append(booleanIntervals[j:j + longestRun[j]])
+        j += longestRun[j]
+    return choiceSets
+
+
 class BooleanClass:
     def __init__(self, ExcelDict):
         """ makes the equations that regulate if a certain process is chosen or not nl: 1 == sum(boolean variables)
@@ -335,10 +513,12 @@ class BooleanClass:
 
         # create the label for the object
         self.label = 'bool object'
+        self.parameters = {}  # mutable parameters (prices) {name: value}
 
         # extract the necesary dataframes
         DFIntervals = ExcelDict['input_output_DF']
         DFconnectionMatrix = ExcelDict['connection_DF']
+        connectionGraph = get_connection_graph(ExcelDict)
 
         # find the input intervals
         posInputs = DFIntervals.input_price.to_numpy() != 0
@@ -359,6 +539,8 @@ class BooleanClass:
         inputBoolEquation = "1 == " # bool amoug different input intervals
         inputBoolEquationCluster = "1 == " #bool equation for selection of substrtate in cluster of 1 interval
         equationCheck = inputBoolEquation
+        inputBoolSum = []  # boolean variables of the symbolic equations
+        inputBoolSumCluster = []
         clusterSwitch = False
         for i, intervalName in enumerate(inputIntervalNames):
             componentSpecification = DFIntervals.loc[posInputs, 'components'][i]
@@ -372,22 +554,25 @@ class BooleanClass:
                     inputs_prices = json.load(file)
                 inputNames = list(inputs_prices.keys())
                 inputBooleanVariables = []  # prealloccate
+                inputBoolSumCluster = []
 
                 # only one input from the cluster can be chosen
                 for iName in inputNames:
                     inputBoolVar = 'y_{}_{}'.format(iName,inputIntervalNames[0])
                     inputBooleanVariables.append(inputBoolVar)
                     inputBoolEquationCluster += " + " + "model.boolVar['{}']".format(inputBoolVar)
+                    inputBoolSumCluster.append(inputBoolVar)
                     price = inputs_prices[iName]
                     inputClusterDict.update({iName: {'price': price, 'bool': inputBoolVar}})
                 # make the over arcing dictionary
                 ClusterDict.update({intervalName:inputClusterDict})
 
             # look if there is a boolean amoung the input variables
-            inputBoolVar = DFconnectionMatrix[intervalName][intervalName]  # diagonal position of the connection matrix
-            if isinstance(inputBoolVar, str):
+            inputBoolVar = connectionGraph.boolean(intervalName)  # diagonal position of the connection matrix
+            if inputBoolVar is not None:
                 inputBooleanVariables.append(inputBoolVar)
                 inputBoolEquation += " + " + "model.boolVar['{}']".format(inputBoolVar)
+                inputBoolSum.append(inputBoolVar)
 
         inputBoolEquation = [inputBoolEquation]
         inputBoolEquationCluster = [inputBoolEquationCluster]
@@ -398,6 +583,10 @@ class BooleanClass:
         if equationCheck == inputBoolEquationCluster[0]:
             inputBoolEquationCluster = []  # just empty
 
+        # symbolic version of the input boolean equations
+        inputBoolSymbolic = [SymbolicEquation(1, sym_sum(sym_bool(b) for b in inputBoolSum))] if inputBoolSum else []
+        inputBoolClusterSymbolic = [SymbolicEquation(1, sym_sum(sym_bool(b) for b in inputBoolSumCluster))] \
+            if inputBoolSumCluster else []
 
         # # find out if your working with clusters
         # componentSpecification = '' # preallocate to avoid errors
@@ -451,70 +640,26 @@ class BooleanClass:
 
 
         # ------------------------------ other interval boolean equations-----------------------------------------------
-        # main idea:
-        # 1) loop over the rows of the DF.
-        # 2) count the columns of this row which are not zero in  sequence! (save the interval names in a list)
-        # 3) the longest list is the list of intervals dependant of the boolean variable
-        # 4) the boolean variable can be found on the diagonal (i.e. with the same row and column index)
-        # 5) make the boolean equation
-        # 6) delete the columns that contain the sequence
-        # 7) restart at step 1 till the DF is empty
-
-        # make a list of all the intervals excluding the inputs
-        DFconnectionMatrix = DFconnectionMatrix.drop(labels=inputIntervalNames, axis=1)
-        processIntervalnames = list(DFconnectionMatrix.index)[len(inputIntervalNames):]
-
-        # prun the Dataframe, anything that does not have a bool label on the diagonal can be dropped
-        toDrop = []
-        for i in processIntervalnames:
-            if not isinstance(DFconnectionMatrix[i][i], str):
-                toDrop.append(i)
-        DFconnectionMatrix = DFconnectionMatrix.drop(labels=toDrop, axis=1)
-
-        # start the while loop, aslong as the dataframe is not empty continue
-        switch = True
+        # the intervals with a boolean variable on the diagonal are divided in sets of which only one interval can be
+        # chosen (see find_boolean_choice_sets), for each set the equation 1 == sum(boolean variables) is made
+        processIntervalnames = [name for name in DFconnectionMatrix.columns if name not in inputIntervalNames]
+        booleanIntervals = [name for name in processIntervalnames if connectionGraph.boolean(name) is not None]
+        choiceSets = find_boolean_choice_sets(connectionGraph, booleanIntervals)
+
         equationsSumOfBools = []
+        symbolicSumOfBools = []
         booleanVariables = []
-        iteration = 0
-        while switch:
-            iteration += 1
-            saveDict = {}
-            for index, row in DFconnectionMatrix.iterrows():
-                intervalNames = []
-                for indexCol, element in row.items():
-                    if isinstance(element, str) or element != 0:  # so comes from a separation or just connected by '1'
-                        intervalNames.append(indexCol)
-                    else:
-                        break
-                saveDict.update({index: intervalNames})
-
-            # find the key in the saveDict that has the longest list
-            key_max_sequential = max(saveDict, key=lambda k: len(saveDict[k]))
-
-            # create the equation
+        for choiceSet in choiceSets:
             eq = '1 == '
-            for interval in saveDict[key_max_sequential]:
-                boolVar = DFconnectionMatrix[interval][interval]
+            boolsOfSet = []
+            for interval in choiceSet:
+                boolVar = connectionGraph.boolean(interval)
                 booleanVariables.append(boolVar)
+                boolsOfSet.append(boolVar)
                 eq += "+ model.boolVar['{}'] ".format(boolVar)
             equationsSumOfBools.append(eq)
+            symbolicSumOfBools.append(SymbolicEquation(1, sym_sum(sym_bool(b) for b in boolsOfSet)))
 
-            # now we need to drop the colums in the original dataframe that already form 1 set of equations
-            # the colunms that need to be droped are in saveDict[key_max_sequential]1
-            cols2drop = saveDict[key_max_sequential]
-            DFconnectionMatrix = DFconnectionMatrix.drop(labels=cols2drop, axis=1)
-
-            # once the DF is empty we can stop the while loop
-            if DFconnectionMatrix.empty:
-                switch = False
-
-            # if iteration 50 is hit, then stop the program, somthing wrong is going on
-            if iteration > 50:
-                raise Exception(
-                    "50 iteration have passed to try and make the boolean equations, check to see if the "
-                    "connection matrix is correctly formulated or check the function 'make_boolean_equations'")
-
-        # while loop has stopped
         # check that all the boolean variables have unique values
         uniqueSet = set(booleanVariables)
         if len(uniqueSet) != len(booleanVariables):
@@ -537,6 +682,7 @@ class BooleanClass:
 
         # add the equations to the pyomoEquations object
         self.pyomoEquations = equationsSumOfBools + inputBoolEquation + inputBoolEquationCluster
+        self.symbolicEquations = symbolicSumOfBools + inputBoolSymbolic + inputBoolClusterSymbolic
 
 
 class InputIntervalClass:
@@ -553,9 +699,11 @@ class InputIntervalClass:
 
         # declare (preallocate) empty pyomo equations list
         pyomoEq = []
+        symbolicEq = []
 
         # declare input interval name
         self.label = 'input'
+        self.parameters = {}  # mutable parameters (prices) {name: value}
         self.inputName = inputName.upper()  # put in capitals
         self.inputPrice = inputPrice
         addOn4Variables = '_' + inputName.lower()
@@ -605,6 +753,8 @@ class InputIntervalClass:
                 # add to the list of equations
                 pyomoEq.append(activationEqPyoLB)
                 pyomoEq.append(activationEqPyoUB)
+                symbolicEq += self.make_symbolic_activation_equations(inputVariable, booleanVariable,
+                                                                      boundryInputVar)
 
             # declare component variables
             componentVariables = list(intervalCluster.keys())
@@ -617,6 +767,8 @@ class InputIntervalClass:
                 eqPy = "model.var['{}'] == {} * model.var['{}']".format(component, self.compositionDict[component],
                                                                         self.inputName)
                 pyomoEq.append(eqPy)
+                symbolicEq.append(SymbolicEquation(sym_var(component),
+                                                   self.compositionDict[component] * sym_var(self.inputName)))
 
             componentVariables = list(compositionDictNew.keys())
             continuousVariables = componentVariables + [self.inputName]
@@ -635,6 +787,8 @@ class InputIntervalClass:
                                                                                            booleanVariable, self.inputName)
                 pyomoEq.append(activationEqPyoLB)
                 pyomoEq.append(activationEqPyoUB)
+                symbolicEq += self.make_symbolic_activation_equations(self.inputName, booleanVariable,
+                                                                      boundryInputVar)
 
 
 
@@ -654,6 +808,14 @@ class InputIntervalClass:
 
         # put all EQUATIONS that pyomo needs to declare here
         self.pyomoEquations = pyomoEq
+        self.symbolicEquations = symbolicEq
+
+    @staticmethod
+    def make_symbolic_activation_equations(inputVariable, booleanVariable, boundryInputVar):
+        """ symbolic version of the activation equations: lb * y <= input and input <= ub * y """
+        activationEqLB = SymbolicEquation(boundryInputVar[0] * sym_bool(booleanVariable), sym_var(inputVariable), '<=')
+        activationEqUB = SymbolicEquation(sym_var(inputVariable), boundryInputVar[1] * sym_bool(booleanVariable), '<=')
+        return [activationEqLB, activationEqUB]
 
 
 class ProcessIntervalClass:
@@ -675,6 +837,7 @@ class ProcessIntervalClass:
             energyUtility = {}
 
         self.label = 'process_interval'
+        self.parameters = {}  # mutable parameters (prices) {name: value}
         self.booleanVariable = booleanVariable
         self.operationalVariablesDict = operationalVariablesDict
 
@@ -708,6 +871,7 @@ class ProcessIntervalClass:
 
         # declare (preallocate) empty pyomo equations list
         pyomoEq = []
+        symbolicEq = []
 
         # reactor equations
         reactionVariablesOutput = []  # preallocate to avoid error
@@ -730,6 +894,7 @@ class ProcessIntervalClass:
                                                                                            booleanVariable=booleanVariable)
             if helpingDict:  # if the helping dict does noit exist the separation equations are added during the update function
                 pyomoEq += separationEquationsPyomo  # otherwise they can be added strait away
+                symbolicEq += self.separationEquationsSymbolic
 
         # spliting equations
         splitComponentVariables = []  # preallocate to avoid error
@@ -739,6 +904,7 @@ class ProcessIntervalClass:
                                                                                                             addOn4Variables,
                                                                                                             booleanVariable=booleanVariable)
             pyomoEq += splittingEquations
+            symbolicEq += self.splitEquationsSymbolic
 
         # mixing equations
         # see def make_mixing_equations(), these equations are made in the update when it is known
@@ -820,6 +986,7 @@ class ProcessIntervalClass:
         # make a list with all the equations
         # self.allEquations = self.separationEquations + self.eqSumOfBools + self.boolActivationEquations + self.totalMassEquation
         self.pyomoEquations = pyomoEq
+        self.symbolicEquations = symbolicEq
 
     def make_reaction_equations(self, reactionEquations, intervalVariable, booleanVariable=None):
         """ function that creates the (preliminary) equations of the reactions that take place in an interval.
@@ -846,28 +1013,36 @@ class ProcessIntervalClass:
 
         ouputs2change = self.outputs
         ReactorEquationsPyomo = []
+        reactionEquationsSymbolic = []
         reactionVariablesOutput = []
         helpingDict = {}
+        # names that can be found in the reaction equations (can contain special characters e.g., D-Glucose)
+        knownNames = self.inputs + self.outputs + list(self.operationalVariablesDict.keys()) + list(self.utilities.keys())
+        outputReplacementDict = {out: out + addOn4Variables for out in ouputs2change}
+        # pyomo version
+        outputReplacementDictPyo = {out: "model.var['{}']".format(outputReplacementDict[out]) for out in ouputs2change}
         for eq in reactionEquations:
-            eqPyo = eq
+            eqSymbolic = str_2_symbolic_equation(eq, names=knownNames)
+            eqPyo = substitute_names(eq, outputReplacementDictPyo, names=knownNames)
             for out in ouputs2change:
-                newOutputName = out + '{}'.format(addOn4Variables)
-                eq = eq.replace(out, newOutputName)
-                # pyomo version
-                newOutputNamePyo = "model.var['{}']".format(newOutputName)
-                eqPyo = eqPyo.replace(out, newOutputNamePyo)
-
+                newOutputName = outputReplacementDict[out]
                 if newOutputName not in reactionVariablesOutput:
                     reactionVariablesOutput.append(newOutputName)
                     helpingDict.update({out: newOutputName})  # helpìng dictionary for the separation equations
 
+            # symbolic version, the outputs are renamed in the whole equation
+            eqSymbolic = eqSymbolic.rename(outputReplacementDict)
+
             if booleanVariable:
                 eqPyo = make_eqation_bool_dependent(equation=eqPyo, booleanVariable=booleanVariable)
+                eqSymbolic = eqSymbolic.make_bool_dependent(booleanVariable)
 
             ReactorEquationsPyomo.append(eqPyo)
+            reactionEquationsSymbolic.append(eqSymbolic)
 
         # place all the equations in the object
         self.reactionEquations = ReactorEquationsPyomo
+        self.reactionEquationsSymbolic = reactionEquationsSymbolic
 
         # mass equations (of the outputs from the reaction equations )
         eqMassInterval = intervalVariable + " == "
@@ -913,6 +1088,7 @@ class ProcessIntervalClass:
                seperationVariables (list): list of variables
             """
         separationEquationsPyomo = []
+        separationEquationsSymbolic = []
         separationVariables = []
         for sep in separationDict:  # if it is empty it should not loop nmrly
             for componentSep in separationDict[sep]:
@@ -931,13 +1107,19 @@ class ProcessIntervalClass:
                     var = componentSep
                     eqSepPyo = "model.var['{}'] == {} * {}".format(sepVar, separationDict[sep][componentSep],
                                                                    var)
+                # symbolic version (if there is no helping dict the variable is renamed in the update function)
+                eqSepSymbolic = SymbolicEquation(sym_var(sepVar), separationDict[sep][componentSep] * sym_var(var))
+
                 if booleanVariable:  # add boolean variable if there are any
                     eqSepPyo = eqSepPyo.replace('==', '== ( ')
                     eqSepPyo += " ) * model.boolVar['{}'] ".format(booleanVariable)
+                    eqSepSymbolic = eqSepSymbolic.make_bool_dependent(booleanVariable)
 
                 separationEquationsPyomo.append(eqSepPyo)
+                separationEquationsSymbolic.append(eqSepSymbolic)
 
         self.separationEquations = separationEquationsPyomo
+        self.separationEquationsSymbolic = separationEquationsSymbolic
         self.separationVariables = separationVariables
 
         return separationEquationsPyomo, separationVariables
@@ -963,6 +1145,7 @@ class ProcessIntervalClass:
         splitFractionVariables = []
         splitComponentVariables = []
         splittingEquations = []
+        splittingEquationsSymbolic = []
 
         # make split equations
         for splitStream in splitList:
@@ -984,18 +1167,29 @@ class ProcessIntervalClass:
                                                                                                           splitFractionVar,
                                                                                                           component2split)
 
+                # symbolic version
+                eqSplit1Symbolic = SymbolicEquation(sym_var(split1),
+                                                    sym_fraction(splitFractionVar) * sym_var(component2split))
+                eqSplit2Symbolic = SymbolicEquation(sym_var(split2),
+                                                    (1 - sym_fraction(splitFractionVar)) * sym_var(component2split))
+
                 # add boolean variable if there are any
                 if booleanVariable:
                     eqSplit1Pyo = eqSplit1Pyo.replace('==', '== ( ')
                     eqSplit2Pyo = eqSplit2Pyo.replace('==', '== ( ')
                     eqSplit1Pyo += " ) * model.boolVar['{}'] ".format(booleanVariable)
                     eqSplit2Pyo += " ) * model.boolVar['{}'] ".format(booleanVariable)
+                    eqSplit1Symbolic = eqSplit1Symbolic.make_bool_dependent(booleanVariable)
+                    eqSplit2Symbolic = eqSplit2Symbolic.make_bool_dependent(booleanVariable)
 
                 # add equations to the lsit
                 splittingEquations.append(eqSplit1Pyo)
                 splittingEquations.append(eqSplit2Pyo)
+                splittingEquationsSymbolic.append(eqSplit1Symbolic)
+                splittingEquationsSymbolic.append(eqSplit2Symbolic)
 
         self.splitEquations = splittingEquations
+        self.splitEquationsSymbolic = splittingEquationsSymbolic
         return splittingEquations, splitComponentVariables, splitFractionVariables
 
     def make_mix_equations(self, objects2mix):
@@ -1047,6 +1241,7 @@ class ProcessIntervalClass:
         # make the equations
         mixingVariables = []
         eqMixPyo2Add = []
+        eqMixSymbolic2Add = []
         intervalName = list(self.nameDict.keys())[0]
         for i, ins in enumerate(initialInputNames):
             mixVar = "{}_{}_mix".format(ins, intervalName)
@@ -1058,19 +1253,24 @@ class ProcessIntervalClass:
             eqMixPyo = mixVarPyo + " == "
 
             # startMixEqPyo = eqMixPyo
+            mixedVars = []
             for lvar in leavingVars:
                 if ins in lvar:
                     eqMix += " + " + lvar
                     eqMixPyo += " + " + "model.var['{}']".format(lvar)
+                    mixedVars.append(lvar)
+            eqMixSymbolic = SymbolicEquation(sym_var(mixVar), sym_sum(mixedVars))
 
             # For example in the case of pH this does not come from the previous interval!!
             # so the variable can stay as it is and no extra equations needs to be added, hence if eqMix != startMixEq:
             if eqMix != startMixEq:
                 if booleanVariable:  # check if there is a dependance on a boolean variable
                     eqMixPyo = make_eqation_bool_dependent(equation=eqMixPyo, booleanVariable=booleanVariable)
+                    eqMixSymbolic = eqMixSymbolic.make_bool_dependent(booleanVariable)
                 mixEquations.append(eqMix)
                 mixingVariables.append(mixVar)
                 eqMixPyo2Add.append(eqMixPyo)
+                eqMixSymbolic2Add.append(eqMixSymbolic)
 
         # # total flow going into the interval after mixing
         # totalMixVarible = "{}_total_mix".format(intervalName)
@@ -1097,6 +1297,8 @@ class ProcessIntervalClass:
         self.allVariables['continuous'] += mixingVariables
         self.pyomoEquations += eqMixPyo2Add
         self.mixEquations = eqMixPyo2Add
+        self.symbolicEquations += eqMixSymbolic2Add
+        self.mixEquationsSymbolic = eqMixSymbolic2Add
 
     def make_incoming_massbalance_equation(self, enteringVariables):
         """
@@ -1117,12 +1319,17 @@ class ProcessIntervalClass:
         for enteringVars in enteringVariables:
             enteringMassEqationPyomo += " + model.var['{}']".format(enteringVars)
 
+        enteringMassEqationSymbolic = SymbolicEquation(sym_var(enteringMassVarible), sym_sum(enteringVariables))
+
         if self.booleanVariable:
             enteringMassEqationPyomo = make_eqation_bool_dependent(equation=enteringMassEqationPyomo,
                                                                    booleanVariable=self.booleanVariable)
+            enteringMassEqationSymbolic = enteringMassEqationSymbolic.make_bool_dependent(self.booleanVariable)
 
         # add to the list of equations + variables and update the boundry dictionary
         self.pyomoEquations += [enteringMassEqationPyomo]
+        self.symbolicEquations += [enteringMassEqationSymbolic]
+        self.incomingFlowEquationSymbolic = [enteringMassEqationSymbolic]
         self.incomingFlowEquation = [enteringMassEqationPyomo]
         self.incomingFlowVariable = enteringMassVarible
         self.allVariables['continuous'] += [enteringMassVarible]
@@ -1154,28 +1361,33 @@ class ProcessIntervalClass:
         # determine which equations need to be updated
         if intervalType == 'reactor':
             equationsInterval = self.reactionEquations  # the reactor equations
+            symbolicEquationsInterval = self.reactionEquationsSymbolic
 
         else:  # so intervalType == 'separator':
             equationsInterval = self.separationEquations  # the separation equations
+            symbolicEquationsInterval = self.separationEquationsSymbolic
 
+        pyomoReplacementDict = {var: "model.var['{}']".format(replacementDict[var]) for var in replacementDict}
         allEquations = []
         for eq in equationsInterval:
-            for var in replacementDict:
-                newVarName = replacementDict[var]
-                # the output of the equation is already in pyomo format, to avoid conflict split
-                # the eqution left and right of the '==', The right side is the part that needs to be updated
-                posEqualSign = eq.find('==')
-                leftEquation = eq[0:posEqualSign]
-                rightEquation = eq[posEqualSign:]  # slice till the end [position:]
-                rightEquation = rightEquation.replace(var, "model.var['{}']".format(newVarName))
-                eq = leftEquation + rightEquation
-            allEquations.append(eq)
+            # the output of the equation is already in pyomo format, to avoid conflict split
+            # the eqution left and right of the '==', The right side is the part that needs to be updated
+            posEqualSign = eq.find('==')
+            leftEquation = eq[0:posEqualSign]
+            rightEquation = eq[posEqualSign:]  # slice till the end [position:]
+            rightEquation = substitute_names(rightEquation, pyomoReplacementDict, names=self.inputs)
+            allEquations.append(leftEquation + rightEquation)
+
+        # symbolic version: only the variables of the right side are renamed
+        allSymbolicEquations = [eq.rename(replacementDict, side='rhs') for eq in symbolicEquationsInterval]
 
         # update the reactor/separation equations to the object
         if intervalType == 'reactor':
             self.reactionEquations = allEquations
+            self.reactionEquationsSymbolic = allSymbolicEquations
         else:  # so intervalType == 'separator':
             self.separationEquations = allEquations
+            self.separationEquationsSymbolic = allSymbolicEquations
 
         # add the variables and equations to the allVariables/pyomoEquations object
         reactionVariablesInputs = list(replacementDict.values())
@@ -1183,6 +1395,7 @@ class ProcessIntervalClass:
         self.allVariables[
             'continuous'] += self.reactionVariablesInputs  # + [enteringMassVarible] # add to the list of variables
         self.pyomoEquations += allEquations
+        self.symbolicEquations += allSymbolicEquations
 
         # add variables to boundary dictionary
         self.boundaries.update(boundsDict)
@@ -1214,6 +1427,8 @@ class ProcessIntervalClass:
 
         # loop over al the utilities
         massEquations = []
+        massEquationsSymbolic = []
+        utilityCostEqRightSymbolic = []
         for ut in utilities:
             utilityName = ut
             utilityParameter = utilities[ut]['parameter']
@@ -1232,8 +1447,11 @@ class ProcessIntervalClass:
             if utilityUnit == 'kg/kgFeed':
                 utilityMassEqPyomo = "model.var['{}'] == {} * model.var['{}']".format(utilityVariable, utilityParameter,
                                                                                    incomingFlowVariable)
+                utilityMassEqSymbolic = SymbolicEquation(sym_var(utilityVariable),
+                                                         utilityParameter * sym_var(incomingFlowVariable))
             elif utilityUnit == 'kg/h':
                 utilityMassEqPyomo = "model.var['{}'] == {}".format(utilityVariable, utilityParameter,incomingFlowVariable)
+                utilityMassEqSymbolic = SymbolicEquation(sym_var(utilityVariable), utilityParameter)
 
             else:
                 raise Exception("the unit of utility '{}' should either be kg/kgFeed or kg/h".format(ut))
@@ -1242,16 +1460,24 @@ class ProcessIntervalClass:
             if booleanVariable:
                 utilityMassEqPyomo = utilityMassEqPyomo.replace('==', '== ( ')
                 utilityMassEqPyomo += " ) * model.boolVar['{}']".format(booleanVariable)
+                utilityMassEqSymbolic = utilityMassEqSymbolic.make_bool_dependent(booleanVariable)
 
             # add the equation to the list
             massEquations.append(utilityMassEqPyomo)
+            massEquationsSymbolic.append(utilityMassEqSymbolic)
+
+            # cost equation, the price is a mutable parameter
+            utilityCostEqPyomo += "+ (model.var['{}'] * model.price['{}'])".format(utilityVariable, utilityVariable)
+            utilityCostEqRightSymbolic.append(sym_var(utilityVariable) * sym_param(utilityVariable))
+            self.parameters.update({utilityVariable: utilityCost})
 
-            # cost equation
-            utilityCostEqPyomo += "+ (model.var['{}'] * {})".format(utilityVariable, utilityCost)
+        utilityCostEqSymbolic = SymbolicEquation(sym_var(utlityCostVariable), sym_sum(utilityCostEqRightSymbolic))
 
         # add the cost equation to pyomo equation list
         self.pyomoEquations += massEquations + [utilityCostEqPyomo]
         self.utilityEquations = massEquations + [utilityCostEqPyomo]
+        self.symbolicEquations += massEquationsSymbolic + [utilityCostEqSymbolic]
+        self.utilityEquationsSymbolic = massEquationsSymbolic + [utilityCostEqSymbolic]
         self.utilityCostVariable = utlityCostVariable
         # add the inflow equation as well as it relates to the utility equations
 
@@ -1266,6 +1492,7 @@ class ProcessIntervalClass:
         energyPrice = self.utilityEnergy['price']
 
         allEnergyEquation = []
+        allEnergyEquationSymbolic = []
         allEnergyVars = []
         energyVar = "energy_consumption_{}".format(self.intervalName)
         if isinstance(energyConsumptionParameter, str) and 'json' in energyConsumptionParameter:
@@ -1309,17 +1536,19 @@ class ProcessIntervalClass:
                                                                                                Feed_Var)  # in mass %
 
                 # build the equations of the shortcut method
-                equationsShortcut = []
-                for eq in eqList:
-                    eq = eq.replace('Feed', "model.var['{}']".format(Feed_Var))
-                    eq = eq.replace('x_F', "model.var['{}']".format(x_F_var))
-                    eq = eq.replace('x_D', str(x_D_var))
-                    eq = eq.replace('x_B', str(x_B_var))
-                    eq = eq.replace('Q_tot_{}'.format(name), "energy_consumption_{}".format(self.intervalName))
-                    equationsShortcut.append(eq)
+                shortcutReplacementDict = {'Feed': "model.var['{}']".format(Feed_Var),
+                                           'x_F': "model.var['{}']".format(x_F_var),
+                                           'x_D': str(x_D_var),
+                                           'x_B': str(x_B_var),
+                                           'Q_tot_{}'.format(name): energyVar}
+                equationsShortcut = [substitute_names(eq, shortcutReplacementDict, names=varList,
+                                                      referenceDict={'Q_tot_{}'.format(name): energyVar})
+                                     for eq in eqList]
 
                 # add all the equations and variable to the 'collecting list'
                 allEnergyEquation += [x_F_eq] + equationsShortcut
+                allEnergyEquationSymbolic += [str_2_symbolic_equation(eq, names=varList)
+                                              for eq in [x_F_eq] + equationsShortcut]
                 allEnergyVars += [x_F_var] + [energyVar] + varList
                 for var in allEnergyVars:
                     self.boundaries.update({var: (1e-6, None)})  # make it so that these variables can not hit zero
@@ -1332,6 +1561,10 @@ class ProcessIntervalClass:
                 eq, variables = make_str_eq_distilation_json(modelObject=energyConsumptionObject, intervalName=self.intervalName)
                 eq += " * model.var['{}']".format(self.incomingFlowVariable)
                 allEnergyEquation.append(eq)
+                eqSymbolic, _ = make_symbolic_eq_distilation_json(modelObject=energyConsumptionObject,
+                                                                  intervalName=self.intervalName)
+                eqSymbolic = SymbolicEquation(eqSymbolic.lhs, eqSymbolic.rhs * sym_var(self.incomingFlowVariable))
+                allEnergyEquationSymbolic.append(eqSymbolic)
                 # make the equation that defines the feed composition of the light key
                 lightKey = energyConsumptionObject['lightKey']
                 lightKeyVar = ''
@@ -1347,6 +1580,8 @@ class ProcessIntervalClass:
                 compositionEq = "model.var['{}'] == model.var['{}'] / (model.var['{}'] + 1e-12)" \
                                 "".format(variables[0],lightKeyVar,self.incomingFlowVariable)
                 allEnergyEquation.append(compositionEq)
+                allEnergyEquationSymbolic.append(SymbolicEquation(sym_var(variables[0]), sym_var(lightKeyVar) /
+                                                                  (sym_var(self.incomingFlowVariable) + 1e-12)))
                 # add the variable to the list
                 allEnergyVars += variables
                 for var in variables:
@@ -1356,6 +1591,8 @@ class ProcessIntervalClass:
                                                                                    energyConsumptionParameter,
                                                                                    self.incomingFlowVariable)
             allEnergyEquation.append(energyConsumptionEq)
+            allEnergyEquationSymbolic.append(SymbolicEquation(sym_var(energyVar), energyConsumptionParameter *
+                                                              sym_var(self.incomingFlowVariable)))
             allEnergyVars.append(energyVar)
             for var in allEnergyVars:
                 self.boundaries.update({var: (0, None)})  # make it so that these variables can hit zero
@@ -1363,12 +1600,16 @@ class ProcessIntervalClass:
         # -------- cost eqution for energy consumption
         costVariable = "cost_utility_energy_{}".format(self.intervalName)
         self.boundaries.update({costVariable: (0, None)})
-        costEq = "model.var['{}'] == {} * model.var['{}'] ".format(costVariable, energyPrice, energyVar)
+        costEq = "model.var['{}'] == model.price['{}'] * model.var['{}'] ".format(costVariable, energyVar, energyVar)
+        costEqSymbolic = SymbolicEquation(sym_var(costVariable), sym_param(energyVar) * sym_var(energyVar))
+        self.parameters.update({energyVar: energyPrice})
 
         # add all the varibles and equations to the pyomo list, and it's individual list
         self.pyomoEquations += allEnergyEquation + [costEq]
         self.allVariables['continuous'] += allEnergyVars + [costVariable]
         self.utilityEnergyEquations = allEnergyEquation + [costEq]
+        self.symbolicEquations += allEnergyEquationSymbolic + [costEqSymbolic]
+        self.utilityEnergyEquationsSymbolic = allEnergyEquationSymbolic + [costEqSymbolic]
         self.utilityEnergyCostVariable = costVariable
 
     # helping functions not related to making equations
@@ -1418,6 +1659,7 @@ class OutputIntervalClass:
         if mixDict is None:
             mixDict = {}
         self.label = 'output'
+        self.parameters = {}  # mutable parameters (prices) {name: value}
         outputName = outputName.upper()
         self.outputName = outputName
         self.outputPrice = outputPrice
@@ -1430,6 +1672,8 @@ class OutputIntervalClass:
                              'boolean': [],  # there are no boolean variables for output intervals
                              'fraction': []}  # there are no fraction variables for output intervals
         self.boundaries = {outputName: self.outputBound}
+        self.pyomoEquations = []
+        self.symbolicEquations = []
 
     def make_output_equations(self, objects2mix):
 
@@ -1461,6 +1705,7 @@ class OutputIntervalClass:
         self.endEquations = eqEnd
         self.allEquations = [eqEnd]
         self.pyomoEquations = [pyomoEqEnd]
+        self.symbolicEquations = [SymbolicEquation(sym_var(endVar), sym_sum(leavingVars))]
         # self.endVariables = endVar
 
 
@@ -1480,6 +1725,7 @@ class WastIntervalClass:
         if mixDict is None:
             mixDict = {}
         self.label = 'waste'
+        self.parameters = {}  # mutable parameters (prices) {name: value}
         outputName = 'WASTE'
         self.outputName = outputName
         self.wastePrice = wastePrice
@@ -1488,6 +1734,7 @@ class WastIntervalClass:
         # iniciate equation list, varibale list and boundry dictionary
         self.allVariables = {'continuous': [], 'boolean': [], 'fraction': []}
         self.pyomoEquations = []
+        self.symbolicEquations = []
         self.boundaries = {}
 
     def make_waste_equations(self, objects2mix):
@@ -1502,6 +1749,7 @@ class WastIntervalClass:
         # find the leaving variables of the object(s) that go into the waste interval
         wasteVariableList = []
         equationList = []
+        symbolicEquationList = []
         variableList = []
 
         for objName in objects2mix:
@@ -1527,8 +1775,9 @@ class WastIntervalClass:
             for var in allSepVars:
                 if connectInfo in var:  # and outputVars in var:
                     wasteEqPyomo += "+ model.var['{}'] ".format(var)
-                    # wasteComponents.append(var)
+                    wasteComponents.append(var)  # summed by the symbolic waste equation below
             equationList.append(wasteEqPyomo)
+            symbolicEquationList.append(SymbolicEquation(sym_var(wasteVariableMass), sym_sum(wasteComponents)))
 
         # iniciate cost equation for waste
         wasteVariableCost = "cost_waste"  # make waste cost variable
@@ -1543,17 +1792,22 @@ class WastIntervalClass:
         # wastePrices = wastePrices.reindex(wasteVariableList)
 
         # iterate over the waste variuables to calculate the cost of disposed waste
+        wasteCostSymbolic = []
         for wasteVar, row in wastePrices.iterrows():
-            wasteCostEquation += "+ model.var['{}'] * {}".format(wasteVar, row.waste_price)
+            wasteCostEquation += "+ model.var['{}'] * model.price['{}']".format(wasteVar, wasteVar)
+            wasteCostSymbolic.append(sym_var(wasteVar) * sym_param(wasteVar))
+            self.parameters.update({wasteVar: row.waste_price})
 
         # make/ add a list of all equations and variable to pass on
         equationList.append(wasteCostEquation)
+        symbolicEquationList.append(SymbolicEquation(sym_var(wasteVariableCost), sym_sum(wasteCostSymbolic)))
         variableList += wasteVariableList + [wasteVariableCost]
 
         # add eqautions and variable top the object, so they can be read later on
         self.allVariables['continuous'] += variableList
         self.costVariable = wasteVariableCost
         self.pyomoEquations += equationList
+        self.symbolicEquations += symbolicEquationList
         for var in variableList:
             self.boundaries.update({var: (0, None)})  # positive reals
 
@@ -1566,6 +1820,7 @@ class MakeObjectiveClass:
             outputObjects (Dict): a dictionary containing all the output interval objects
         """
         self.label = 'cost_model'
+        self.parameters = {}  # mutable parameters (prices) {name: value}
         self.allVariables = {'continuous': [],
                              'boolean': [],
                              'fraction': []}
@@ -1577,6 +1832,7 @@ class MakeObjectiveClass:
 
         variableList = [GREV_var] + variables
         self.pyomoEquations = [GREV_eq] + equations
+        self.symbolicEquations = [self.GREV_eqSymbolic] + self.OPEX_equationsSymbolic
         self.allVariables['continuous'] += variableList
 
         # initiate the dictionary for boundries of the variables
@@ -1595,11 +1851,13 @@ class MakeObjectiveClass:
         # a given operation
         EBIT = "model.var['{}'] - model.var['{}']".format(GREV_var, OPEX_var)
         self.EBIT = EBIT
+        self.EBITSymbolic = sym_var(GREV_var) - sym_var(OPEX_var)
 
     def make_GREV_equation(self, objectsOutputDict):
         """ make the equation for the Gross revenue """
         GREV_var = "GREV"
         GREV_eq = "model.var['{}'] == ".format(GREV_var)
+        GREV_rightSymbolic = []
         for nameObj in objectsOutputDict:
             outObj = objectsOutputDict[nameObj]
             outputPrice = outObj.outputPrice
@@ -1607,10 +1865,13 @@ class MakeObjectiveClass:
             if not outputPrice:
                 raise Exception('Hey you forgot to give a price for the output interval {}'.format(outVar))
             else:
-                GREV_eq += "model.var['{}'] * {} + ".format(outVar, outputPrice)
+                GREV_eq += "model.var['{}'] * model.price['{}'] + ".format(outVar, outVar)
+                GREV_rightSymbolic.append(sym_var(outVar) * sym_param(outVar))
+                self.parameters.update({outVar: outputPrice})
 
         posPlus = GREV_eq.rfind('+')
         GREV_eq = GREV_eq[0:posPlus]
+        self.GREV_eqSymbolic = SymbolicEquation(sym_var(GREV_var), sym_sum(GREV_rightSymbolic))
         # GREV_eq = '(' + GREV_eq + ')'
 
         return GREV_var, GREV_eq
@@ -1625,11 +1886,13 @@ class MakeObjectiveClass:
         # preallocate the cost variables and equations that need to be added
         allCostVariables = []
         allCostEquations = []
+        allCostEquationsSymbolic = []
 
         # -------- cost raw materials
 
         CostRawMaterialVar = "Raw_material_cost"
         CostRawMaterialEq = "model.var['{}'] == ".format(CostRawMaterialVar)
+        CostRawMaterialRightSymbolic = []
         for nameObj in inputObjects:
             # retrive the object from the dictionary
             inObj = inputObjects[nameObj]
@@ -1642,10 +1905,14 @@ class MakeObjectiveClass:
             if inputCluster:
               for substrate in  inputCluster:
                   inputPrice = inputCluster[substrate]['price']
-                  CostRawMaterialEq += "model.var['{}'] * {} + ".format(substrate, inputPrice)
+                  CostRawMaterialEq += "model.var['{}'] * model.price['{}'] + ".format(substrate, substrate)
+                  CostRawMaterialRightSymbolic.append(sym_var(substrate) * sym_param(substrate))
+                  self.parameters.update({substrate: inputPrice})
 
             elif isinstance(inputPrice, float) or isinstance(inputPrice, int):
-                CostRawMaterialEq += "model.var['{}'] * {} + ".format(inputVar, inputPrice)
+                CostRawMaterialEq += "model.var['{}'] * model.price['{}'] + ".format(inputVar, inputVar)
+                CostRawMaterialRightSymbolic.append(sym_var(inputVar) * sym_param(inputVar))
+                self.parameters.update({inputVar: inputPrice})
             else:
                 raise Exception('Hey you forgot to give a price or list of substrates (clusterDict) for the input '
                                 'interval {}'.format(inputVar))
@@ -1655,6 +1922,8 @@ class MakeObjectiveClass:
 
         # add to the lists of variables and equations
         allCostEquations.append(CostRawMaterialEq)
+        allCostEquationsSymbolic.append(SymbolicEquation(sym_var(CostRawMaterialVar),
+                                                         sym_sum(CostRawMaterialRightSymbolic)))
         allCostVariables.append(CostRawMaterialVar)
         self.CostRawMaterialEq = CostRawMaterialEq
 
@@ -1662,13 +1931,16 @@ class MakeObjectiveClass:
         costUtilitiesVar = 'Utility_cost'
         costUtilitiesEqLeft = "model.var['{}'] == ".format(costUtilitiesVar)
         costUtilitiesEqRight = ''
+        utilityCostVariables = []
         for nameObj, obj in processObjects.items():
             if hasattr(obj, 'utilityCostVariable'):
                 utCostVar = obj.utilityCostVariable  # cost of chemicals
                 costUtilitiesEqRight += " model.var['{}'] +".format(utCostVar)
+                utilityCostVariables.append(utCostVar)
             if hasattr(obj, 'utilityEnergyCostVariable'):
                 utCostVar = obj.utilityEnergyCostVariable  # cost of energy
                 costUtilitiesEqRight += " model.var['{}'] +".format(utCostVar)
+                utilityCostVariables.append(utCostVar)
 
         posPlus = costUtilitiesEqRight.rfind('+')  # finds the last '+' in the equation
         costUtilitiesEqRight = costUtilitiesEqRight[0:posPlus]  # delete the last plus
@@ -1679,6 +1951,7 @@ class MakeObjectiveClass:
             costUtilitiesEq = costUtilitiesEqLeft + costUtilitiesEqRight
             allCostVariables.append(costUtilitiesVar)
             allCostEquations.append(costUtilitiesEq)
+            allCostEquationsSymbolic.append(SymbolicEquation(sym_var(costUtilitiesVar), sym_sum(utilityCostVariables)))
             self.CostUtilitiesEq = costUtilitiesEq
 
         # -------- cost of waste
@@ -1700,8 +1973,10 @@ class MakeObjectiveClass:
         self.OPEX_eq = OPEX_eq
 
         # add to lists
+        allCostEquationsSymbolic.append(SymbolicEquation(sym_var(OPEX_var), sym_sum(allCostVariables)))
         allCostVariables.append(OPEX_var)
         allCostEquations.append(OPEX_eq)
+        self.OPEX_equationsSymbolic = allCostEquationsSymbolic
 
         return OPEX_var, allCostVariables, allCostEquations
 
@@ -1713,7 +1988,7 @@ class MakeObjectiveClass:
 # List of possible errors:
 # 1) Make sure only split, sep bool ands mix are the only words in the connection matrix
 
-def check_seperation_coef(coef, intervalName, amountOfSep, connectionMatrix):
+def check_seperation_coef(coef, intervalName, amountOfSep, connectionGraph):
     """
     makes sure the mass balances of the seperation processes are respected
     not sure if this really makes sens for distilation where you have different compositions in top and bottom however...
@@ -1723,7 +1998,7 @@ def check_seperation_coef(coef, intervalName, amountOfSep, connectionMatrix):
         coef (str): string of all the seperation coef as read from the Excel file in the column speration_coef
         intervalName (str): name of the interval
         amountOfSep(int): the amount of separations by counting the number intervals in coef
-        connectionMatrix (DF): a dataframe with the entire connecntion matrix
+        connectionGraph (ConnectionGraph): the compiled connection matrix (see get_connection_graph)
 
     Returns:
         erros made in the Excel file
@@ -1734,10 +2009,8 @@ def check_seperation_coef(coef, intervalName, amountOfSep, connectionMatrix):
 
     # check if you have not forgotten to define the bounds if in the connection matrix, seperated streams have been defined
     if coef == 0:
-        rowConnenctionMatrix = connectionMatrix.loc[intervalName]
-        countSeperationInMatrix = 0
-        for i in rowConnenctionMatrix:
-            if isinstance(i, str) and 'sep' in i:
+        for edge in connectionGraph.out_edges(intervalName):
+            if edge.sepKey:
                 raise Exception("No bounds where giving for the separation of the the interval '{}' but separated "
                                 "streams are found in the connnection matrix. Plz "
                                 "define seperation bounds in the Excel sheet 'process_intervals'".format(intervalName))
@@ -1761,18 +2034,15 @@ def check_seperation_coef(coef, intervalName, amountOfSep, connectionMatrix):
             intervalName))
 
     # check if all the seperation processes are accounted for in the connenction matrix
-    try:
-        rowMatrix = connectionMatrix.loc[intervalName]
-    except:
+    if intervalName not in connectionGraph.outEdges:
         raise Exception("The interval name '{}' could not be found make sure the interval name does not contain spaces "
                         "and is written correctly".format(intervalName))
 
     counterSeparation = []
     counterSplit = []
-    for connectCell in rowMatrix:
-        keys = define_connect_info(connectInfo=connectCell)
-        sepKey = keys[1]
-        splitKey = keys[2]
+    for edge in connectionGraph.out_edges(intervalName):
+        sepKey = edge.sepKey
+        splitKey = edge.splitKey
 
         if 'sep' in sepKey:
             counterSeparation.append(sepKey)
@@ -1802,14 +2072,18 @@ def check_seperation_coef(coef, intervalName, amountOfSep, connectionMatrix):
 def check_excel_file(excelName):
     """ checks if the Excel file does not contain fatal errors for the generation of the super structure
     """
+    check_excel_sheets(read_excel_sheets(excelName))
 
-    loc = get_location(excelName)
 
-    DFIntervals = pd.read_excel(loc, sheet_name='input_output_intervals')
-    DFprocessIntervals = pd.read_excel(loc, sheet_name='process_intervals')
-    DFeconomicParameters = pd.read_excel(loc, sheet_name='economic_parameters')
-    DFConnectionMatrix = pd.read_excel(loc, sheet_name='connection_matrix')
-    DFAbbr = pd.read_excel(loc, sheet_name='abbreviations')
+def check_excel_sheets(sheets):
+    """ checks if the sheets of the Excel file (see read_excel_sheets) do not contain fatal errors for the generation
+    of the super structure
+    """
+    DFIntervals = sheets['input_output_intervals']
+    DFprocessIntervals = sheets['process_intervals']
+    DFeconomicParameters = sheets['economic_parameters']
+    DFConnectionMatrix = sheets['connection_matrix']
+    DFAbbr = sheets['abbreviations']
 
     # check interval names in the connection matrix and interval list
     intervalNamesIn = remove_spaces(DFIntervals.process_intervals[DFIntervals.input_price != 0].to_list())
@@ -1868,38 +2142,132 @@ def check_excel_file(excelName):
 # ============================================================================================================
 # Functions to make the interval objects
 # ============================================================================================================
+# sheets of the Excel file of the superstructure {sheet name: column used as index}
+EXCEL_SHEETS = OrderedDict([('input_output_intervals', None),
+                            ('connection_matrix', 'process_intervals'),
+                            ('process_intervals', 'process_intervals'),
+                            ('economic_parameters', 'process_intervals'),
+                            ('models', 'model_name'),
+                            ('abbreviations', None)])
+
+# Excel files that are already read in this process {file location: (file stamp, ExcelDict)}
+_loadedExcelFiles = {}
+
+
+def get_superstructure_location(fileName, exists=True):
+    """ location of the Excel file (or json, yaml or toml file, see f_superstructure_file) of a superstructure, the
+    files are in the directory 'excel files' if fileName is not a location """
+    if os.path.isfile(fileName) or os.path.dirname(fileName):
+        loc = fileName
+    else:
+        stem, extension = os.path.splitext(fileName)
+        loc = os.path.splitext(get_location(file=stem + '.xlsx'))[0] + extension
+    if exists and not os.path.isfile(loc):
+        raise Exception("The superstructure file '{}' is not found, looked for it at: {}".format(fileName, loc))
+    return loc
+
+
+def read_excel_sheets(excelName):
+    """ reads all the sheets of the superstructure (EXCEL_SHEETS) in one pass, the workbook is only opened once
+
+    Returns:
+        sheets (dict): {sheet name: DF} without index columns
+    """
+    loc = get_superstructure_location(excelName)
+    with pd.ExcelFile(loc) as workbook:
+        missingSheets = [sheet for sheet in EXCEL_SHEETS if sheet not in workbook.sheet_names]
+        if missingSheets:
+            raise Exception('The Excel file {} is missing the sheets: {}'.format(excelName, missingSheets))
+        sheets = pd.read_excel(workbook, sheet_name=list(EXCEL_SHEETS.keys()))
+    return sheets
+
+
+def read_superstructure_sheets(fileName):
+    """ reads the sheets of the superstructure from the Excel file or from a json, yaml or toml file (see
+    f_superstructure_file) """
+    if os.path.splitext(fileName)[1].lower() in SUPERSTRUCTURE_FILE_EXTENSIONS:
+        return read_superstructure_file_sheets(get_superstructure_location(fileName))
+    return read_excel_sheets(fileName)
+
+
+def make_excel_dict(sheets):
+    """ makes the ExcelDict (see read_excel_sheets4_superstructure) from the sheets of the Excel file """
+    indexedSheets = {}
+    for sheet, indexColumn in EXCEL_SHEETS.items():
+        DF = sheets[sheet]
+        if indexColumn is not None:
+            DF = DF.set_index(indexColumn)
+        indexedSheets.update({sheet: DF})
+
+    ExcelDict = {
+        'input_output_DF': indexedSheets['input_output_intervals'],
+        'connection_DF': indexedSheets['connection_matrix'],
+        'process_interval_DF': indexedSheets['process_intervals'],
+        'economic_parameters_DF': indexedSheets['economic_parameters'],
+        'models_DF': indexedSheets['models'],
+        'abbreviations_DF': indexedSheets['abbreviations']
+    }
+    return ExcelDict
+
+
 def read_excel_sheets4_superstructure(excelName):
     '''
     Reads the Excel file containing the data for superstructure generation and returns each sheet as a dataframes
     The dataframes are stored in a dictionary
 
     parameters:
-    excelName (str): name of the Excel file saved in the file directory 'excel files'
+    excelName (str): name of the Excel file saved in the file directory 'excel files' (or a json, yaml or toml file,
+                     see f_superstructure_file)
 
     returns:
     ExcelDict (Dict): a dictionary containing DF
     '''
-    # read Excel file
-    loc = get_location(file=excelName)
+    return make_excel_dict(read_superstructure_sheets(excelName))
 
-    # read excel info
-    DFInOutIntervals = pd.read_excel(loc, sheet_name='input_output_intervals')
-    DFconnectionMatrix = pd.read_excel(loc, sheet_name='connection_matrix', index_col='process_intervals')
-    DFprocessIntervals = pd.read_excel(loc, sheet_name='process_intervals', index_col='process_intervals')
-    DFeconomicParameters = pd.read_excel(loc, sheet_name='economic_parameters', index_col='process_intervals')
-    DFmodels = pd.read_excel(loc, sheet_name='models', index_col='model_name')
-    DFabrriviations = pd.read_excel(loc, sheet_name='abbreviations')
 
-    ExcelDict = {
-        'input_output_DF': DFInOutIntervals,
-        'connection_DF': DFconnectionMatrix,
-        'process_interval_DF': DFprocessIntervals,
-        'economic_parameters_DF': DFeconomicParameters,
-        'models_DF': DFmodels,
-        'abbreviations_DF': DFabrriviations
-    }
+def load_excel_superstructure(excelName, useCache=True):
+    """ reads and checks (see check_excel_sheets) the Excel file of the superstructure. Parsing the workbook is slow,
+    so the ExcelDict is saved next to the Excel file (.pkl) and kept in memory. The cache is not used if the Excel file
+    has changed (size, modification time and hash of the file)
 
-    return ExcelDict
+    Params:
+        excelName (str): name of the Excel file saved in the file directory 'excel files' (or a json, yaml or toml
+                         file, see f_superstructure_file)
+        useCache (bool): if False the Excel file is always parsed (and the cache is not updated)
+
+    Returns:
+        ExcelDict (Dict): a dictionary containing DF (copies, so changing them does not change the cache)
+    """
+    loc = get_superstructure_location(excelName)
+
+    if not useCache:
+        sheets = read_superstructure_sheets(excelName)
+        check_excel_sheets(sheets)
+        return make_excel_dict(sheets)
+
+    fileStamp = get_file_stamp(loc)
+
+    ExcelDict = None
+    # the Excel file is already read in this process
+    if loc in _loadedExcelFiles and _loadedExcelFiles[loc][0] == fileStamp:
+        ExcelDict = _loadedExcelFiles[loc][1]
+
+    # the Excel file is parsed before and saved next to it (a text file with the same name has its own cache)
+    if os.path.splitext(loc)[1].lower() in SUPERSTRUCTURE_FILE_EXTENSIONS:
+        cacheLocation = loc + '.pkl'
+    else:
+        cacheLocation = os.path.splitext(loc)[0] + '.pkl'
+    if ExcelDict is None:
+        ExcelDict = load_pickle_cache(cacheLocation, loc, fileStamp)
+
+    if ExcelDict is None:
+        sheets = read_superstructure_sheets(excelName)
+        check_excel_sheets(sheets)
+        ExcelDict = make_excel_dict(sheets)
+        save_pickle_cache(cacheLocation, ExcelDict, loc, fileStamp)
+
+    _loadedExcelFiles.update({loc: (fileStamp, ExcelDict)})
+    return {key: DF.copy() for key, DF in ExcelDict.items()}
 
 
 def make_mix_dictionary(intervalName, DFconnectionMatrix):
@@ -1940,68 +2308,30 @@ def make_boolean_equations(DFconnectionMatrix, processIntervalnames):
     the function works as followed: the DFconnectionMatrix excludes the inputs!! important!! the input boolean variables
     are regulated in the first input objected.
     main idea:
-    1) loop over the rows of the DF.
-    2) count the colums of this row which are not zero in  sequence! (save the interval names in a list)
-    3) the longest list is the list of intervals dependant of the boolean variable
-    4) the boolean variable can be found on the diagonal (i.e. with the same row and column index)
-    5) make the boolean equation
-    6) deleet the columns that contain the sequence
-    7) restart at step 1 till the DF is empty
+    1) compile the connection matrix (see ConnectionGraph)
+    2) keep the process intervals with a boolean variable on the diagonal
+    3) divide them in the sets of which only one interval can be chosen (see find_boolean_choice_sets)
+    4) make the boolean equation of each set
 
     returns:
         boolean variables (list): list of boolean variables
         boolean equations (lsit): list of boolean equations
     """
 
-    # prun the Dataframe, anything that does not have a bool label on the diagonal can be droped
-    toDrop = []
-    for i in processIntervalnames:
-        if not isinstance(DFconnectionMatrix[i][i], str):
-            toDrop.append(i)
-
-    DFconnectionMatrix = DFconnectionMatrix.drop(labels=toDrop, axis=1)
+    connectionGraph = ConnectionGraph(DFconnectionMatrix)
+    booleanIntervals = [name for name in DFconnectionMatrix.columns if name in processIntervalnames and
+                        connectionGraph.boolean(name) is not None]
 
-    switch = True
     equationsSumOfBools = []
     booleanVariables = []
-    iteration = 0
-    while switch:
-        iteration += 1
-        saveDict = {}
-        for index, row in DFconnectionMatrix.iterrows():
-            intervalNames = []
-            for indexCol, element in row.items():
-                # element = row[colName]
-                if isinstance(element, str) or element != 0:  # so comes from a separation or just connected by '1'
-                    intervalNames.append(indexCol)
-                else:
-                    break
-
-            saveDict.update({index: intervalNames})
-
-        # find the key in the saveDict that has the longest list
-        key_max_sequential = max(saveDict, key=lambda k: len(saveDict[k]))
-
-        # create the equation
+    for choiceSet in find_boolean_choice_sets(connectionGraph, booleanIntervals):
         eq = '1 == '
-        for interval in saveDict[key_max_sequential]:
-            boolVar = DFconnectionMatrix[interval][interval]
+        for interval in choiceSet:
+            boolVar = connectionGraph.boolean(interval)
             booleanVariables.append(boolVar)
             eq += "+ model.boolVar['{}'] ".format(boolVar)
         equationsSumOfBools.append(eq)
 
-        # now we need to drop the colums in the original dataframe that already form 1 set of equations
-        # the colunms that need to be droped are in saveDict[key_max_sequential]1
-        cols2drop = saveDict[key_max_sequential]
-        DFconnectionMatrix = DFconnectionMatrix.drop(labels=cols2drop, axis=1)
-
-        if DFconnectionMatrix.empty:  # once the DF is empty we can stop the while loop
-            switch = False
-
-        if iteration > 50:
-            raise Exception("50 iteration have passed to try and make the boolean equations, check to see if the "
-                            "connection matrix is correctly formulated or check the function 'make_boolean_equations'")
-
     # check that all the boolean variables have unique values
     uniqueSet = set(booleanVariables)
     if len(uniqueSet) != len(booleanVariables):
@@ -2010,6 +2340,96 @@ def make_boolean_equations(DFconnectionMatrix, processIntervalnames):
     return booleanVariables, equationsSumOfBools
 
 
+def presolve_connection_graph(ExcelDict):
+    """ Removes the dead intervals from the superstructure before the interval objects are made. An interval is dead if
+    it can not be reached from an input interval (forward reachability over the connection matrix) or if it can not
+    reach a priced output interval (backward reachability). The booleans of the dead intervals (the diagonal of the
+    connection matrix) are removed with them. Dead intervals that are the only destination of a separated stream of an
+    interval that stays in the superstructure are kept (with the intervals after them), that stream has to go
+    somewhere. The waste interval is always kept.
+
+    Parameters:
+        ExcelDict (Dict): Dictionary containing all info on the superstructure in the form of dataframes
+
+    Returns:
+        ExcelDict (Dict): the same dictionary without the dead intervals (the dataframes are copies)
+        presolveReport (Dict): the removed intervals ('unreachable_from_inputs', 'not_reaching_outputs'), the removed
+                               booleans ('removed_booleans') and the dead intervals that are kept ('kept_dead_intervals')
+    """
+    connectionMatrix = ExcelDict['connection_DF']
+    DFInOutIntervals = ExcelDict['input_output_DF']
+    ioNames = remove_spaces(DFInOutIntervals.process_intervals.to_list())
+    inputIntervals = [name for name, price in zip(ioNames, DFInOutIntervals.input_price) if price != 0]
+    outputIntervals = [name for name, price in zip(ioNames, DFInOutIntervals.output_price) if price != 0]
+
+    # the connection graph without the waste interval: {interval: {next interval: edge}}
+    connectionGraph = get_connection_graph(ExcelDict)
+    intervalNames = [name for name in connectionGraph.intervals if name != 'waste']
+    graph = {name: {} for name in intervalNames}
+    reverseGraph = {name: [] for name in intervalNames}
+    wasteEdges = {}  # {interval: edge to the waste interval}
+    for edge in connectionGraph.edges:
+        if edge.source == 'waste':
+            continue
+        if edge.target == 'waste':
+            wasteEdges[edge.source] = edge
+            continue
+        graph[edge.source].update({edge.target: edge})
+        reverseGraph[edge.target].append(edge.source)
+
+    def reachable(startIntervals, edges):
+        visited = set(startIntervals)
+        stack = list(startIntervals)
+        while stack:
+            for nextInterval in edges[stack.pop()]:
+                if nextInterval not in visited:
+                    visited.add(nextInterval)
+                    stack.append(nextInterval)
+        return visited
+
+    fedIntervals = reachable(inputIntervals, graph)
+    productiveIntervals = reachable(outputIntervals, reverseGraph)
+    alive = fedIntervals & productiveIntervals
+
+    # a separated stream of a living interval that only goes to dead intervals forces these intervals to stay
+    keptIntervals = set()
+    changed = True
+    while changed:
+        changed = False
+        for interval in sorted(alive | keptIntervals):
+            destinationsPerStream = {}
+            for toInterval, edge in graph[interval].items():
+                destinationsPerStream.setdefault(edge.sepKey, []).append(toInterval)
+            for sepKey, destinations in destinationsPerStream.items():
+                wasteCell = wasteEdges[interval].info if interval in wasteEdges else 0
+                streamToWaste = isinstance(wasteCell, str) and sepKey and sepKey in wasteCell
+                if interval in keptIntervals or (not streamToWaste and not alive.intersection(destinations)):
+                    for toInterval in destinations:
+                        if toInterval not in alive and toInterval not in keptIntervals:
+                            keptIntervals.add(toInterval)
+                            changed = True
+
+    deadIntervals = [name for name in intervalNames if name not in alive and name not in keptIntervals]
+    presolveReport = {'unreachable_from_inputs': [name for name in deadIntervals if name not in fedIntervals],
+                      'not_reaching_outputs': [name for name in deadIntervals if name in fedIntervals],
+                      'removed_booleans': [connectionGraph.boolean(name) for name in deadIntervals
+                                           if connectionGraph.boolean(name) is not None],
+                      'kept_dead_intervals': [name for name in intervalNames if name in keptIntervals]}
+    if not deadIntervals:
+        return ExcelDict, presolveReport
+    if not alive.intersection(inputIntervals):
+        raise Exception('None of the input intervals can reach a priced output interval, check the connection matrix')
+
+    reducedExcelDict = dict(ExcelDict)
+    reducedExcelDict['connection_DF'] = connectionMatrix.drop(index=deadIntervals, columns=deadIntervals)
+    reducedExcelDict['input_output_DF'] = DFInOutIntervals[[name not in deadIntervals for name in ioNames]] \
+        .reset_index(drop=True)
+    for sheetDF in ['process_interval_DF', 'economic_parameters_DF']:
+        DF = ExcelDict[sheetDF]
+        reducedExcelDict[sheetDF] = DF.drop(index=[name for name in deadIntervals if name in DF.index])
+    return reducedExcelDict, presolveReport
+
+
 # functions to automate making the interval class objects
 def make_input_intervals(ExcelDict, clusterDict):
     """ Makes the process intervals of inputs.
@@ -2022,7 +2442,7 @@ def make_input_intervals(ExcelDict, clusterDict):
     """
 
     DFIntervals = ExcelDict['input_output_DF']
-    DFconnectionMatrix = ExcelDict['connection_DF']
+    connectionGraph = get_connection_graph(ExcelDict)
 
     # inputs
     inputPrices = DFIntervals.input_price.to_numpy()
@@ -2049,10 +2469,7 @@ def make_input_intervals(ExcelDict, clusterDict):
     objectDictionary = {}
     for i, intervalName in enumerate(InputIntervalNames):
         # pass the bool variable responsible for activating an input if present
-        diagonalInputInfo = DFconnectionMatrix[intervalName][intervalName]
-        booleanVar = None
-        if isinstance(diagonalInputInfo, str):
-            booleanVar = diagonalInputInfo
+        booleanVar = connectionGraph.boolean(intervalName)
 
         inputPrice = inputPriceDict[intervalName]
         boundryInput = boundryDict[intervalName]
@@ -2100,7 +2517,7 @@ def make_process_intervals(ExcelDict):
         """
 
     # DFInOutIntervals = ExcelDict['input_output_DF']
-    DFconnectionMatrix = ExcelDict['connection_DF']
+    connectionGraph = get_connection_graph(ExcelDict)
     DFprocessIntervals = ExcelDict['process_interval_DF']
     DFeconomicParameters = ExcelDict['economic_parameters_DF']
     DFmodels = ExcelDict['models_DF']
@@ -2175,10 +2592,7 @@ def make_process_intervals(ExcelDict):
                         ' for reactor {}'.format(intervalName))
 
         # find if the interval is dependent on a boolean variable
-        boolVar = None
-        boolInformation = DFconnectionMatrix[intervalName][intervalName]
-        if isinstance(boolInformation, str):
-            boolVar = boolInformation
+        boolVar = connectionGraph.boolean(intervalName)
 
         # find special component bounds like that for pH
         boundsComponentStr = DFprocessIntervals.input_bounds[intervalName]
@@ -2217,7 +2631,7 @@ def make_process_intervals(ExcelDict):
         coefStr = DFprocessIntervals.seperation_coef[intervalName]
         coefList = split_remove_spaces(coefStr, ';')
         amountOfSeperations = len(coefList)
-        check_seperation_coef(coefStr, intervalName, amountOfSeperations, DFconnectionMatrix)
+        check_seperation_coef(coefStr, intervalName, amountOfSeperations, connectionGraph)
 
         if DFprocessIntervals.seperation_coef[intervalName] != 0:  # and DFprocessIntervals.has_seperation[i] < 2 :
             for j in range(amountOfSeperations):
@@ -2231,26 +2645,17 @@ def make_process_intervals(ExcelDict):
             # objectReactor.separation = seperationDict
 
         # check if it is mixed with other reactors
-        mixDict = make_mix_dictionary(intervalName=intervalName, DFconnectionMatrix=DFconnectionMatrix)
+        mixDict = connectionGraph.mix_dictionary(intervalName)
 
         # find to which interval the stream is split to (indicated in the connection matrix)
-        intervalRow = DFconnectionMatrix.loc[intervalName]
-        splitList = []  # find the reactor or separation stream to split
-        for j, info in enumerate(intervalRow):
-            if isinstance(info, str) and 'split' in info and 'sep' in info:
-                indexSep = info.find('sep')
-                separationStream = info[indexSep:indexSep + 4]
-                splitList.append('{}_{}'.format(intervalName, separationStream))
-
-            elif isinstance(info, str) and 'split' in info and not 'sep' in info:
-                splitList.append(intervalName)
+        splitList = connectionGraph.split_streams(intervalName)  # find the reactor or separation stream to split
 
         # trick to get unique values
         setSplits = set(splitList)
         listSplits = list(setSplits)
 
         # pass on the connection information
-        connectedIntervals = get_connected_intervals(intervalName=intervalName, conectionMatrix=DFconnectionMatrix)
+        connectedIntervals = connectionGraph.connected_intervals(intervalName)
 
         # pass on the operational variables if there are any
         operationalVars = DFprocessIntervals.operation_bounds.loc[intervalName]
@@ -2290,7 +2695,7 @@ def make_output_intervals(ExcelDict):
         """
 
     # read excel info
-    DFconnectionMatrix = ExcelDict['connection_DF']
+    connectionGraph = get_connection_graph(ExcelDict)
     DFIntervals = ExcelDict['input_output_DF']
 
     # find the output interval names and information in one step
@@ -2310,7 +2715,7 @@ def make_output_intervals(ExcelDict):
         outputVariable = row.components.replace(' ', '')
 
         # check if it is mixed with other reactors
-        mixDict = make_mix_dictionary(intervalName=intervalName, DFconnectionMatrix=DFconnectionMatrix)
+        mixDict = connectionGraph.mix_dictionary(intervalName)
 
         # make initial interval object
         objectReactor = OutputIntervalClass(outputName=intervalName, outputBound=outputBound,
@@ -2332,19 +2737,18 @@ def make_waste_interval(ExcelDict):
             """
 
     # retrive data
-    DFconnectionMatrix = ExcelDict['connection_DF']
+    connectionGraph = get_connection_graph(ExcelDict)
     DFprocessIntervals = ExcelDict['process_interval_DF']
     DFeconomicParameters = ExcelDict['economic_parameters_DF']
     intervalName = 'waste'
 
     # find the prices of waste per interval
-    priceWasteDF, wasteVariables = DFeconomicParameters.loc[DFconnectionMatrix.waste[
-                                                                DFconnectionMatrix.waste != 0].dropna().index, "waste_price"], \
-                                   DFprocessIntervals.loc[DFconnectionMatrix.waste[
-                                                              DFconnectionMatrix.waste != 0].dropna().index, "outputs"]
+    wasteIntervals = [edge.source for edge in connectionGraph.in_edges(intervalName)]
+    priceWasteDF = DFeconomicParameters.loc[wasteIntervals, "waste_price"]
+    wasteVariables = DFprocessIntervals.loc[wasteIntervals, "outputs"]
 
     # check if it is mixed with other reactors
-    mixDict = make_mix_dictionary(intervalName=intervalName, DFconnectionMatrix=DFconnectionMatrix)
+    mixDict = connectionGraph.mix_dictionary(intervalName)
 
     # make initial interval object
     objectWaste = WastIntervalClass(mixDict=mixDict, wastePrice=priceWasteDF, wasteVariables=wasteVariables)
@@ -2370,26 +2774,26 @@ def update_intervals(allIntervalObjectsDict, ExcelDict):
 
         """
 
-    connectionMatrix = ExcelDict['connection_DF']
+    connectionGraph = get_connection_graph(ExcelDict)
     # DFprocessIntervals = ExcelDict['process_interval_DF']
     for intervalName in allIntervalObjectsDict:
         intervalObject = allIntervalObjectsDict[intervalName]
         label = intervalObject.label
-        connectedIntervals = get_connected_intervals(intervalName=intervalName, conectionMatrix=connectionMatrix)
+        connectedIntervals = connectionGraph.connected_intervals(intervalName)
 
         if label == 'process_interval':
             # get the connection info if there is only one connecting interval (is there mixing or not)
-            try:
-                connectInfo = list(connectedIntervals.values())[0]
-            except:
+            enteringEdges = connectionGraph.in_edges(intervalName)
+            if not enteringEdges:
                 raise Exception('The interval {} is not connected to any previous interval, '
                                 'check the connection matrix'.format(intervalName))
 
-            simpleConcention, sepKey, splitKey, boolKey = define_connect_info(connectInfo)
+            firstEdge = enteringEdges[0]
+            simpleConcention, sepKey, splitKey = firstEdge.connectKey, firstEdge.sepKey, firstEdge.splitKey
             # simpleConcention = True  # just connecting from one reactor to the next with the connection possibly being a bool
 
             # get the previous interval object (if there is mixing these variables are ignored)
-            previousIntervalName = list(connectedIntervals.keys())[0]
+            previousIntervalName = firstEdge.source
             previousIntervalObject = allIntervalObjectsDict[previousIntervalName]
             enteringVariables = previousIntervalObject.leavingInterval
 
@@ -2557,11 +2961,384 @@ def get_vars_eqs_bounds(objectDict):
     return variables, equations, boundsContinousVars
 
 
+def get_symbolic_equations(objectDict):
+    """ Returns all the symbolic equations of the superstructure (same order as the string equations of
+    get_vars_eqs_bounds)
+
+    Params:
+        objectDict (dict) : a dictionary holding all the objects of the superstructure
+
+    Returns:
+        equations (list) : all SymbolicEquation objects of the superstructure
+    """
+    equations = []
+    for objName in objectDict:
+        equations += objectDict[objName].symbolicEquations
+    return equations
+
+
+def get_parameters(objectDict):
+    """ Returns all the (mutable) parameters of the superstructure i.e., the prices of the inputs, outputs, utilities
+    and waste. The name of a price is the name of the variable it multiplies e.g., model.var['glu'] * model.price['glu']
+
+    Params:
+        objectDict (dict) : a dictionary holding all the objects of the superstructure
+
+    Returns:
+        parameters (dict) : {name of the parameter: value}
+    """
+    parameters = {}
+    for objName in objectDict:
+        parameters.update(objectDict[objName].parameters)
+    return parameters
+
+
+def get_symbolic_equation_groups(obj):
+    """ Groups the symbolic equations of an interval object per type of equation (used to make the constraints of
+    the pyomo block of the interval)
+
+    Params:
+        obj (interval object): input, process, output, waste, boolean or cost object
+
+    Returns:
+        equationGroups (dict): {name of the group: list of symbolic equations}
+    """
+    if obj.label != 'process_interval':
+        return {'constraints': obj.symbolicEquations}
+
+    equationGroups = {'mix': getattr(obj, 'mixEquationsSymbolic', []),
+                      'mass_balance': getattr(obj, 'incomingFlowEquationSymbolic', []),
+                      'reaction': getattr(obj, 'reactionEquationsSymbolic', []),
+                      'separation': getattr(obj, 'separationEquationsSymbolic', []),
+                      'split': getattr(obj, 'splitEquationsSymbolic', []),
+                      'utility_chemicals': getattr(obj, 'utilityEquationsSymbolic', []),
+                      'utility_energy': getattr(obj, 'utilityEnergyEquationsSymbolic', [])}
+
+    # make sure no equation is lost or counted twice
+    nEquations = sum(len(eqs) for eqs in equationGroups.values())
+    if nEquations != len(obj.symbolicEquations):
+        raise Exception("The equations of interval '{}' could not be grouped for its pyomo block, {} equations were "
+                        "grouped out of {}".format(obj.intervalName, nEquations, len(obj.symbolicEquations)))
+    return equationGroups
+
+
+def make_interval_blocks(model, objectDict, varBounds, varMap=None, constraintPairs=None):
+    """ Makes one pyomo block per interval (model.interval['name']) holding the variables declared by that interval
+    and its constraints grouped per type (mix, mass_balance, reaction, separation, split, utility_chemicals,
+    utility_energy; or just 'constraints' for the other objects). A whole interval can then be (de)activated with
+    model.interval['name'].deactivate()
+
+    Params:
+        model (pyomo model): the (empty) concrete model
+        objectDict (dict): all objects of the superstructure
+        varBounds (dict): {name of the continuous variable: (lower bound, upper bound)}
+        varMap (dict): components that are already declared in the model e.g., {('price', 'glu'): model.price['glu']}
+        constraintPairs (list): if given, the tuples (pyomo constraint, symbolic equation) are added to this list
+
+    Returns:
+        varMap (dict): {variable key: pyomo variable} e.g., {('var', 'glu'): model.interval['carbon_source'].var['glu']}
+    """
+    model.interval = pe.Block(list(objectDict.keys()))
+
+    # declare the variables in the block of the first interval that uses them
+    if varMap is None:
+        varMap = {}
+    else:
+        varMap = dict(varMap)
+    for objName, obj in objectDict.items():
+        block = model.interval[objName]
+        for component, varType, domain in [('var', 'continuous', pe.Reals), ('boolVar', 'boolean', pe.Boolean),
+                                           ('fractionVar', 'fraction', pe.PercentFraction)]:
+            ownVariables = [v for v in OrderedDict.fromkeys(obj.allVariables[varType]) if (component, v) not in varMap]
+            if not ownVariables:
+                continue
+            if component == 'var':
+                block.add_component(component, pe.Var(ownVariables, domain=domain,
+                                                       bounds={v: varBounds[v] for v in ownVariables}))
+            else:
+                block.add_component(component, pe.Var(ownVariables, domain=domain))
+            for v in ownVariables:
+                varMap.update({(component, v): getattr(block, component)[v]})
+
+    # make the constraints of each block
+    for objName, obj in objectDict.items():
+        block = model.interval[objName]
+        for groupName, groupEquations in get_symbolic_equation_groups(obj).items():
+            if not groupEquations:
+                continue
+            constraintList = pe.ConstraintList()
+            block.add_component(groupName, constraintList)
+            for eq in groupEquations:
+                constraint = constraintList.add(eq.to_pyomo(model, varMap=varMap))
+                if constraintPairs is not None:
+                    constraintPairs.append((constraint, eq))
+
+    return varMap
+
+
+def get_price_dependent_variables(model):
+    """ Finds the equations with a mutable price (model.price) and the cost and revenue variables that depend on the
+    prices: the variables these equations define (the variables without a price as coefficient, e.g., GREV in
+    GREV == price['ACETATE'] * ACETATE + ...) and the sums of these variables (e.g., OPEX == Raw_material_cost + ...)
+
+    Params:
+        model (pyomo model): the superstructure
+
+    Returns:
+        priceConstraints (list): the constraints with a price
+        priceVariables (ComponentSet): the variables of which the bounds depend on the prices
+    """
+    priceConstraints = []
+    priceVariables = ComponentSet()
+    otherConstraints = []
+    for constraint in model.component_data_objects(pe.Constraint, active=True, descend_into=True):
+        if not any(True for _ in identify_mutable_parameters(constraint.body)):
+            otherConstraints.append(constraint)
+            continue
+        priceConstraints.append(constraint)
+        repn = generate_standard_repn(constraint.body, compute_values=False)
+        for var, coef in zip(repn.linear_vars, repn.linear_coefs):
+            if not any(True for _ in identify_mutable_parameters(coef)):
+                priceVariables.add(var)
+
+    # the sums of the cost and revenue variables depend on the prices as well
+    changed = True
+    while changed:
+        changed = False
+        for constraint in otherConstraints:
+            variables = list(identify_variables(constraint.body))
+            notPriceDependent = [var for var in variables if var not in priceVariables]
+            if len(notPriceDependent) == 1 and len(variables) > 1:
+                priceVariables.add(notPriceDependent[0])
+                changed = True
+    return priceConstraints, priceVariables
+
+
+def tighten_bounds(model, boundTolerance=1e-8):
+    """ Feasibility based bounds tightening (pyomo fbbt) of all the variables of the superstructure. The bounds of the
+    inputs (lower_bound/upper_bound in the sheet input_output_intervals) are propagated forward through the yields,
+    separation coefficients, split fractions and mixing equations and the bounds of the outputs and intervals
+    backward, until the bounds do not improve anymore. The tightened bounds are written on the variables.
+    The equations with a price and the cost and revenue variables are left out (see get_price_dependent_variables),
+    their bounds would only hold for the prices of the moment the model is made, not after update_prices.
+
+    Params:
+        model (pyomo model): the superstructure
+        boundTolerance (float): the tightened bounds are widened with this relative tolerance so round off errors
+                                of the propagation do not cut off feasible solutions (the original bounds are kept if
+                                they are tighter)
+
+    Returns:
+        nBounded (int): amount of continuous variables with finite lower and upper bounds
+    """
+    variables = [var for var in model.component_data_objects(pe.Var, descend_into=True) if not var.is_integer()]
+    originalBounds = [(var.lb, var.ub) for var in variables]
+    priceConstraints, priceVariables = get_price_dependent_variables(model)
+    for constraint in priceConstraints:
+        constraint.deactivate()
+    try:
+        with np.errstate(invalid='ignore'):  # 0 * inf of the intervals of unbounded variables
+            fbbt(model)
+    except Exception as e:
+        raise Exception('The bounds of the superstructure could not be tightened, the superstructure is infeasible: '
+                        '{}'.format(e))
+    finally:
+        for constraint in priceConstraints:
+            constraint.activate()
+
+    for var, (lowerBound, upperBound) in zip(variables, originalBounds):
+        if var in priceVariables:  # put back the bounds of the cost and revenue variables
+            var.setlb(lowerBound)
+            var.setub(upperBound)
+            continue
+        if var.lb is not None and var.lb != lowerBound:
+            newLowerBound = var.lb - boundTolerance * max(1, abs(var.lb))
+            var.setlb(newLowerBound if lowerBound is None else max(lowerBound, newLowerBound))
+        if var.ub is not None and var.ub != upperBound:
+            newUpperBound = var.ub + boundTolerance * max(1, abs(var.ub))
+            var.setub(newUpperBound if upperBound is None else min(upperBound, newUpperBound))
+
+    return sum(1 for var in variables if var.lb is not None and var.ub is not None)
+
+
+def reformulate_bool_products(model, constraintPairs, method='hull', bigM=None, varMap=None):
+    """ Rewrites the equations of the form: otherSide == (expression) * y, with y a boolean variable (all the equations
+    made boolean dependent), as linear constraints. If the expression is bounded, L <= expression <= U, the product is
+    exactly described by:
+        L*y <= otherSide <= U*y
+        L*(1-y) <= expression - otherSide <= U*(1-y)
+    So a superstructure with only linear yields becomes a MILP instead of a MINLP.
+
+    Every product of a boolean with a bounded expression is rewritten, the boolean then only appears in linear terms.
+    The rewritten constraints are linear if the expression and the other side are linear (parameters e.g., prices
+    count as constants): the mass balances, reactions with constant yields, separations and splits of the intervals
+    made boolean dependent. A nonlinear expression (e.g., the pH dependent yields of open_fermentation) stays in the
+    last two constraints, so the superstructure stays a MINLP and all its configurations are NLPs, also the ones in
+    which that interval is not chosen (see f_enumerate_configurations). Equations that are nonlinear without a boolean
+    are not changed. The result is a MILP only if all the nonlinear terms of the superstructure are products of
+    booleans with linear expressions.
+
+    The bounds of the expressions come from the bounds of the variables, so tighten these first (see tighten_bounds)
+
+    Params:
+        model (pyomo model): the superstructure
+        constraintPairs (list): tuples (pyomo constraint, symbolic equation) of the constraints of the model
+        method (str): 'hull' uses the bounds L and U of each expression (convex hull of the product)
+                      'bigm' uses one value M for both bounds: -M and M (M = bigM or the largest bound of the expression)
+        bigM (float): big M value, only used with method 'bigm' (needed when an expression is unbounded)
+        varMap (dict): {variable key: pyomo variable}, if None the variables of the flat model are used
+
+    Returns:
+        reformulated (list): the symbolic equations that are reformulated
+        notReformulated (list): the products with a boolean that stay nonlinear because the expression is unbounded
+    """
+    if method not in ('hull', 'bigm'):
+        raise Exception("The reformulation method '{}' is not valid, choose 'hull' or 'bigm'".format(method))
+
+    reformulated = []
+    notReformulated = []
+    for constraint, eq in constraintPairs:
+        boolProduct = eq.get_bool_product()
+        if boolProduct is None:
+            continue
+        boolKey, otherSide, productExpression = boolProduct
+        otherSidePyomo = otherSide.to_pyomo(model, varMap=varMap)
+        productPyomo = productExpression.to_pyomo(model, varMap=varMap)
+        boolPyomo = sym_bool(boolKey[1]).to_pyomo(model, varMap=varMap)
+
+        lowerBound, upperBound = compute_bounds_on_expr(productPyomo)
+        if method == 'bigm':
+            if bigM is None and lowerBound is not None and upperBound is not None:
+                M = max(abs(lowerBound), abs(upperBound))
+            else:
+                M = bigM
+            lowerBound, upperBound = (-M, M) if M is not None else (None, None)
+        if lowerBound is None or upperBound is None:
+            notReformulated.append(eq)
+            continue
+
+        # the linear constraints are placed in the same block as the original constraint
+        block = constraint.parent_block()
+        if not hasattr(block, 'bool_products'):
+            block.add_component('bool_products', pe.ConstraintList())
+        block.bool_products.add(otherSidePyomo >= lowerBound * boolPyomo)
+        block.bool_products.add(otherSidePyomo <= upperBound * boolPyomo)
+        block.bool_products.add(productPyomo - otherSidePyomo >= lowerBound * (1 - boolPyomo))
+        block.bool_products.add(productPyomo - otherSidePyomo <= upperBound * (1 - boolPyomo))
+        del constraint.parent_component()[constraint.index()]
+        reformulated.append(eq)
+
+    return reformulated, notReformulated
+
+
+def make_disjunctions(model, constraintPairs, varMap=None):
+    """ Generalized disjunctive programming (pyomo.gdp) formulation of the choice of the intervals. Every boolean of a
+    choice set (1 == y1 + y2 + ...) gets a Disjunct (model.interval_choice['y1']) holding the equations that depend on
+    the booleans of the set, with the booleans replaced by their value when that interval is chosen (y1 = 1, the
+    others 0). The disjuncts of each choice set form a Disjunction (model.choice_set[i]) of which exactly one is true.
+
+    The big-M and hull transformations need bounded variables, so tighten the bounds first (see tighten_bounds)
+
+    Params:
+        model (pyomo model): the superstructure
+        constraintPairs (list): tuples (pyomo constraint, symbolic equation) of the constraints of the model
+        varMap (dict): {variable key: pyomo variable}, if None the variables of the flat model are used
+
+    Returns:
+        choiceSets (list): the lists of the booleans of every choice set
+    """
+
+    choiceSets = []
+    setOfBool = {}  # {boolean: position of its choice set}
+    for constraint, eq in constraintPairs:
+        boolNames = eq.get_choice_set()
+        if boolNames is None:
+            continue
+        for boolName in boolNames:
+            if boolName in setOfBool:
+                raise Exception("The boolean '{}' is part of more than one choice set, the choice sets can not be "
+                                "made into disjunctions".format(boolName))
+            setOfBool.update({boolName: len(choiceSets)})
+        choiceSets.append(boolNames)
+    if not choiceSets:
+        raise Exception('The superstructure has no choice sets (1 == y1 + y2 + ...), there is nothing to make '
+                        'disjunctions of')
+
+    # move the equations that depend on the booleans of (only) one choice set to the disjuncts
+    disjunctEquations = {boolName: [] for boolName in setOfBool}
+    for constraint, eq in constraintPairs:
+        if eq.get_choice_set() is not None:
+            continue  # the choice sets stay as constraints, they tighten the big-M relaxation
+        boolNames = {varKey[1] for varKey in eq.variables() if varKey[0] == 'boolVar'}
+        sets = {setOfBool.get(boolName) for boolName in boolNames}
+        if len(sets) != 1 or None in sets:
+            continue
+        boolsOfSet = choiceSets[sets.pop()]
+        for chosenBool in boolsOfSet:
+            boolValues = {('boolVar', boolName): int(boolName == chosenBool) for boolName in boolsOfSet}
+            disjunctEq = eq.substitute(boolValues)
+            if disjunctEq.variables():
+                disjunctEquations[chosenBool].append(disjunctEq)
+        del constraint.parent_component()[constraint.index()]
+
+    model.interval_choice = Disjunct(list(setOfBool.keys()))
+    for chosenBool, equations in disjunctEquations.items():
+        disjunct = model.interval_choice[chosenBool]
+        disjunct.constraints = pe.ConstraintList()
+        # the boolean variables keep the choice (used in the other equations and to read the results)
+        for boolName in choiceSets[setOfBool[chosenBool]]:
+            disjunct.constraints.add(sym_bool(boolName).to_pyomo(model, varMap=varMap) == int(boolName == chosenBool))
+        for eq in equations:
+            disjunct.constraints.add(eq.to_pyomo(model, varMap=varMap))
+
+    # the disjunctions are added one by one (a rule can not be pickled)
+    model.choice_set = Disjunction(range(len(choiceSets)))
+    for i, boolsOfSet in enumerate(choiceSets):
+        model.choice_set[i] = [model.interval_choice[boolName] for boolName in boolsOfSet]
+
+    return choiceSets
+
+
+def get_variable_bounds(boundVar):
+    """ translates the bound of a variable of the Excel file into a tuple (lower bound, upper bound)
+
+    Params:
+        boundVar (list, tuple, str): bounds [lower, upper] or 'positiveReals', 'Reals', 'bool'
+
+    Returns:
+        bounds (tuple): (lower bound, upper bound), None if there is no bound
+    """
+    if isinstance(boundVar, list) or isinstance(boundVar, tuple):
+        lowerBound = boundVar[0]
+        upperBound = boundVar[1]
+
+    elif boundVar == 'positiveReals':  # including 0
+        lowerBound = 0  # 0.0001
+        upperBound = None
+
+    elif boundVar == 'Reals':
+        lowerBound = None
+        upperBound = None
+
+    else:  # elif isinstance(boundVar, str):  # 'bool' or 'positiveReal' in boundVar
+        lowerBound = 0
+        upperBound = None
+
+    # empty cells of the Excel file are read as NaN, these are not bounds
+    if lowerBound is not None and pd.isna(lowerBound):
+        lowerBound = None
+    if upperBound is not None and pd.isna(upperBound):
+        upperBound = None
+    return (lowerBound, upperBound)
+
+
 # ============================================================================================================
 # Master function: generates the superstructure
 # ============================================================================================================
 
-def make_super_structure(excelFile, printPyomoEq=False):
+def make_super_structure(excelFile, printPyomoEq=False, equationMode='string', modelStructure='flat',
+                         boolReformulation=None, bigM=None, gdpTransformation=None, presolve=True,
+                         printPresolve=False, tightenBounds=False, useExcelCache=True):
     """ Master function: calls all other functions to make the superstructure
 
     Declare all interval variables (capital letters) and component variables (small letters)
@@ -2571,15 +3348,71 @@ def make_super_structure(excelFile, printPyomoEq=False):
     make the objective
 
     params:
-        excelFile (str): name of the Excel file saved in the file location 'excel files'
+        excelFile (str): name of the Excel file saved in the file location 'excel files' (or a json, yaml or toml
+                         file, see f_superstructure_file)
+        printPyomoEq (bool): if True the pyomo model is printed
+        equationMode (str): 'string' the equations are read with eval() from the string equations
+                            'symbolic' the equations are made directly from the symbolic equations (no eval)
+        modelStructure (str): 'flat' all variables in model.var and all equations in model.constraints
+                              'blocks' one pyomo block per interval (model.interval['name']), always made with the
+                              symbolic equations
+        boolReformulation (str): None the products of the boolean variables with the equations stay nonlinear
+                                 'hull' or 'bigm' the products are rewritten as linear constraints using the bounds of
+                                 the intervals (see reformulate_bool_products), always made with the symbolic equations.
+                                 Products with nonlinear equations (e.g., pH dependent yields) keep these nonlinear
+                                 terms, the superstructure is only a MILP if all its nonlinear terms are products of
+                                 booleans with linear equations
+        bigM (float): big M value used if boolReformulation is 'bigm'
+        gdpTransformation (str): None the choice of the intervals is made with the products of the booleans
+                                 'bigm' or 'hull' the choice sets are disjunctions (see make_disjunctions) transformed
+                                 to a MI(N)LP with the big-M or hull transformation of pyomo.gdp
+                                 'loa' the disjunctions are not transformed, the model is solved with the logic-based
+                                 outer approximation of GDPopt (solve_model picks the 'gdpopt' backend)
+        presolve (bool): if True the intervals that can not be reached from an input or can not reach a priced output
+                         are removed with their booleans before the interval objects are made (see
+                         presolve_connection_graph)
+        printPresolve (bool): if True the intervals and booleans removed (or kept) by the presolve are printed, off by
+                              default so the models build by the workers of a sweep or an enumeration stay silent
+        tightenBounds (bool): if True the bounds of the inputs and outputs are propagated through the equations to get
+                              finite bounds on the variables (see tighten_bounds), always done for the boolReformulation
+                              and the gdpTransformation. The bounds of the cost and revenue variables are not
+                              tightened, so the model stays valid after update_prices
+        useExcelCache (bool): if True the Excel file is only parsed again if it has changed (see
+                              load_excel_superstructure)
 
     returns:
         model (pyomo structure): the model of the super structure
     """
+    if equationMode not in ('string', 'symbolic'):
+        raise Exception("The equationMode '{}' is not valid, choose 'string' or 'symbolic'".format(equationMode))
+    if modelStructure not in ('flat', 'blocks'):
+        raise Exception("The modelStructure '{}' is not valid, choose 'flat' or 'blocks'".format(modelStructure))
+    if boolReformulation not in (None, 'hull', 'bigm'):
+        raise Exception("The boolReformulation '{}' is not valid, choose None, 'hull' or 'bigm'"
+                        .format(boolReformulation))
+    if gdpTransformation not in (None, 'bigm', 'hull', 'loa'):
+        raise Exception("The gdpTransformation '{}' is not valid, choose None, 'bigm', 'hull' or 'loa'"
+                        .format(gdpTransformation))
+    if boolReformulation is not None and gdpTransformation is not None:
+        raise Exception('Choose either a boolReformulation or a gdpTransformation, not both')
+    useSymbolic = equationMode == 'symbolic' or modelStructure == 'blocks' or boolReformulation is not None \
+                  or gdpTransformation is not None
 
     model = pe.ConcreteModel()
-    check_excel_file(excelName=excelFile)
-    excelDict = read_excel_sheets4_superstructure(excelName=excelFile)
+    excelDict = load_excel_superstructure(excelName=excelFile, useCache=useExcelCache)
+    if presolve:
+        excelDict, presolveReport = presolve_connection_graph(excelDict)
+        removedIntervals = presolveReport['unreachable_from_inputs'] + presolveReport['not_reaching_outputs']
+        if printPresolve and removedIntervals:
+            print('presolve: the following intervals are removed because they can not be reached from an input: {}'
+                  .format(presolveReport['unreachable_from_inputs']))
+            print('presolve: the following intervals are removed because they can not reach a priced output: {}'
+                  .format(presolveReport['not_reaching_outputs']))
+            print('presolve: the following boolean variables are removed: {}'
+                  .format(presolveReport['removed_booleans']))
+        if printPresolve and presolveReport['kept_dead_intervals']:
+            print('presolve: the following intervals can not reach a priced output but are kept, a separated stream '
+                  'has to go there: {}'.format(presolveReport['kept_dead_intervals']))
 
     boolObject = BooleanClass(ExcelDict=excelDict)
     clusterDict = boolObject.clusterDict # the cluster dictionary is already made in the boolean object
@@ -2604,56 +3437,84 @@ def make_super_structure(excelFile, printPyomoEq=False):
 
     allObjects = boolObjectDict | allObjectsDict | CostModelDict  # add the logic model and the cost model to the object list
     variables, equations, bounds = get_vars_eqs_bounds(allObjects)
+    parameters = get_parameters(allObjects)
+    if useSymbolic:
+        equations = get_symbolic_equations(allObjects)
 
-    def boundsRule(model, i):
-        boudVar = bounds[i]
-        if isinstance(boudVar, list) or isinstance(boudVar, tuple):
-            lowerBound = boudVar[0]
-            upperBound = boudVar[1]
-
-        elif boudVar == 'positiveReals':  # including 0
-            lowerBound = 0  # 0.0001
-            upperBound = None
-
-        elif boudVar == 'Reals':
-            lowerBound = None
-            upperBound = None
-
-        else:  # elif isinstance(boudVar, str):  # 'bool' or 'positiveReal' in boudVar
-            lowerBound = 0
-            upperBound = None
-        return (lowerBound, upperBound)
-
-    model.var = pe.Var(variables['continuous'], domain=pe.Reals, bounds=boundsRule)
-    if variables['boolean']:
-        # noinspection PyUnresolvedReferences
-        model.boolVar = pe.Var(variables['boolean'], domain=pe.Boolean)
-    if variables['fraction']:
-        # noinspection PyUnresolvedReferences
-        model.fractionVar = pe.Var(variables['fraction'], domain=pe.PercentFraction)
-
-    # introduce the equations to pyomo
-    model.constraints = pe.ConstraintList()
-    for eq in equations:
-        # print(eq) # printing of equation is now in the function get_vars_eq_bounds
-        # expresion = eval(eq)
-        # model.constraints.add(expresion)
-        try:
-            expresion = eval(eq)
-        except:
-            raise Exception('The following equation can not be read by eval: {}'.format(eq))
+    # explicit bounds (not a rule) so the model can be pickled e.g., to send it to the workers of a sweep
+    varBounds = {name: get_variable_bounds(bounds[name]) for name in variables['continuous']}
 
-        try:
-            model.constraints.add(expresion)
-        except:
-            raise Exception('The following equation can not be read by pyomo: {}'.format(eq))
+    # the prices are mutable parameters so they can be changed without rebuilding the model (see update_prices)
+    model.price = pe.Param(list(parameters.keys()), initialize=parameters, mutable=True, within=pe.Any)
+
+    varMap = None  # only needed when the variables are declared in the blocks of the intervals
+    constraintPairs = []  # (pyomo constraint, symbolic equation) used to reformulate the boolean products
+    if modelStructure == 'blocks':
+        # each interval gets its own block with its variables and constraints
+        varMap = {('price', name): model.price[name] for name in parameters}
+        varMap.update(make_interval_blocks(model, allObjects, varBounds, varMap=varMap,
+                                           constraintPairs=constraintPairs))
+
+    else:
+        model.var = pe.Var(variables['continuous'], domain=pe.Reals, bounds=varBounds)
+        if variables['boolean']:
+            # noinspection PyUnresolvedReferences
+            model.boolVar = pe.Var(variables['boolean'], domain=pe.Boolean)
+        if variables['fraction']:
+            # noinspection PyUnresolvedReferences
+            model.fractionVar = pe.Var(variables['fraction'], domain=pe.PercentFraction)
+
+        # introduce the equations to pyomo
+        model.constraints = pe.ConstraintList()
+        for eq in equations:
+            # print(eq) # printing of equation is now in the function get_vars_eq_bounds
+            # expresion = eval(eq)
+            # model.constraints.add(expresion)
+            if useSymbolic:
+                expresion = eq.to_pyomo(model)
+            else:
+                try:
+                    expresion = eval(eq)
+                except:
+                    raise Exception('The following equation can not be read by eval: {}'.format(eq))
+
+            try:
+                constraint = model.constraints.add(expresion)
+            except:
+                raise Exception('The following equation can not be read by pyomo: {}'.format(eq))
+            if useSymbolic:
+                constraintPairs.append((constraint, eq))
+
+    if tightenBounds or boolReformulation is not None or gdpTransformation is not None:
+        nVariables = sum(1 for var in model.component_data_objects(pe.Var, descend_into=True) if not var.is_integer())
+        nBounded = tighten_bounds(model)
+        print('bounds tightening: {} of the {} continuous variables have finite bounds'.format(nBounded, nVariables))
+
+    if boolReformulation is not None:
+        problemClass = get_problem_class(model)
+        reformulated, notReformulated = reformulate_bool_products(model, constraintPairs, method=boolReformulation,
+                                                                  bigM=bigM, varMap=varMap)
+        print('{} products with boolean variables are reformulated ({}), the {} superstructure is now a {}'
+              .format(len(reformulated), boolReformulation, problemClass, get_problem_class(model)))
+        for eq in notReformulated:
+            print('the following equation stays nonlinear, the bounds of its variables are unknown: {}'.format(eq))
+
+    if gdpTransformation is not None:
+        choiceSets = make_disjunctions(model, constraintPairs, varMap=varMap)
+        print('{} choice sets are made into disjunctions: {}'.format(len(choiceSets), choiceSets))
+        if gdpTransformation in ('bigm', 'hull'):
+            pe.TransformationFactory('gdp.{}'.format(gdpTransformation)).apply_to(model)
 
     # define the objective
     # EBIT
     objectiveExpr = CostModelObj.EBIT
     print("the objective of the model is to maximise the EBIT: ")
     print(objectiveExpr)
-    model.objectiveValue = pe.Objective(expr=eval(objectiveExpr), sense=pe.maximize)  # sense=pe.maximize
+    if useSymbolic:
+        objectivePyomo = CostModelObj.EBITSymbolic.to_pyomo(model, varMap=varMap)
+    else:
+        objectivePyomo = eval(objectiveExpr)
+    model.objectiveValue = pe.Objective(expr=objectivePyomo, sense=pe.maximize)  # sense=pe.maximize
 
     # model.pprint()
     if printPyomoEq:
@@ -2661,58 +3522,96 @@ def make_super_structure(excelFile, printPyomoEq=False):
 
     return model
 
-def solve_model(superstructure, operatingDays, saveName = None, solverType = None):
+def update_prices(model, priceDict):
+    """ Changes the prices of the superstructure in place, the model does not need to be rebuilt to solve a new
+    economic scenario. The name of a price is the name of the variable it multiplies (see model.price.keys()) e.g.,
+    the substrates (D-Glucose), the outputs (ACETATE), the chemical utilities (NaOH_liq_liq_ext), the energy
+    consumption (energy_consumption_P_acidi) or the waste (waste_P_acidi)
+
+    Params:
+        model (pyomo model): the superstructure made with make_super_structure
+        priceDict (dict): {name of the price: new price}
+
+    Returns:
+        model (pyomo model): the same model with the updated prices
+    """
+    for name, price in priceDict.items():
+        if name not in model.price:
+            raise Exception("'{}' is not a price of the superstructure, the prices that can be changed are: "
+                            "{}".format(name, list(model.price.keys())))
+        model.price[name] = price
+    return model
+
+
+def solve_model(superstructure, operatingDays, saveName = None, solverType = None, printResults=True, backend=None,
+                timeLimit=None, gap=None, solverOptions=None):
     """ Prints the results of the superstructure optimisation
      Params:
         superstructure (pyomo-model): model containing all equations
-        solverType (str): string variable defining the preferred solver. if None the solver is automatically choosen .
+        solverType (str): string variable defining the preferred GAMS solver. if None the solver is automatically choosen .
         Possible solver are: 'BARON', 'ANTIGONE', 'CPLEX', 'DICOPT'
+        printResults (bool): if False the solver log and the results are not printed (e.g., when running sweeps)
+        backend (str): solver backend 'gams', 'highs', 'glpk', 'cbc', 'ipopt', 'bonmin' or 'couenne' (see f_solvers).
+                       if None GAMS is used when a solverType is given, otherwise the fastest installed backend for the
+                       problem class (LP, MILP, NLP, MINLP) of the superstructure is chosen
+        timeLimit (float): maximum solve time in seconds
+        gap (float): relative optimality gap
+        solverOptions (dict): extra options passed on to the solver
 
      Return:
           prints the results of the optimisation
+          results (SolverResults): results of the solver, check results.solver.termination_condition before reading
+                                   the values of the model (they are not read if there is no solution)
      """
     operatingHours = operatingDays * 24 # 24 hours in a day
 
     start_time = time.time()
-    solvername = 'gams'
-    pathGams = r"C:\Program Files\GAMS\44\gams.exe"
-    opt = po.SolverFactory(solvername, executable=pathGams)
+    if backend is None:
+        if solverType is not None:
+            backend = 'gams'  # the solverType refers to a solver of GAMS
+        else:
+            backend = select_backend(superstructure)
+    if printResults:
+        print('solving the superstructure with the solver backend: {}'.format(backend))
 
+    results = solve_with_backend(superstructure, backend, solverType=solverType, timeLimit=timeLimit, gap=gap,
+                                 solverOptions=solverOptions, tee=printResults)
 
-    if solverType is None:
-        results = opt.solve(superstructure, keepfiles=True, tee=True)
-    else:
-        try:
-            results = opt.solve(superstructure, solver=solverType, keepfiles=True, tee=True)
-        except:
-            raise Exception("The solverType '{}' is invalid, check the spelling \n possible solvers are: "
-                            "'BARON', 'ANTIGONE', 'CPLEX', 'DICOPT'".format(solverType))
+    # without a solution (e.g., an infeasible model) there are no values to read
+    if not has_solution(results):
+        if printResults:
+            print('No solution is found, the termination condition of the solver is: {}'.format(
+                results.solver.termination_condition))
+        return results
 
     allValues = []
     valueNames = []
     for v in superstructure.component_objects(ctype=pe.Var):
         for index in v:
             # get value and name
-            val = pe.value(v[index])
+            val = pe.value(v[index], exception=False)
             nameVal = v[index].local_name
 
             # find value > 0
-            if val >= 1e-10:
+            if val is not None and val >= 1e-10:
                 valueNames.append(nameVal)
 
                 # check if it's a boolean variable or contious variable and print the results
                 if 'y_' in nameVal and val == 1:
                     # don't multiply for the boolean variables
                     valueVariableBool = pe.value(v[index])
-                    print('{0} = {1}'.format(v[index],valueVariableBool))
+                    if printResults:
+                        print('{0} = {1}'.format(v[index],valueVariableBool))
                     allValues.append(valueVariableBool)
                 else:
                     valueVariableContious =  pe.value(v[index]) * operatingHours
-                    print('{0} = {1}'.format(v[index], valueVariableContious))
+                    if printResults:
+                        print('{0} = {1}'.format(v[index], valueVariableContious))
                     allValues.append(valueVariableContious)
 
 
-    print('')
+    if printResults:
+        print('')
     for v2 in superstructure.component_objects(ctype=pe.Objective):
         for index2 in v2:
             # get value and name
@@ -2724,14 +3623,16 @@ def solve_model(superstructure, operatingDays, saveName = None, solverType = Non
             allValues.append(valueObjective)
 
             # print result
-            print('The objective value is:')
-            print('{0} = {1}'.format(v2[index2],valueObjective))
+            if printResults:
+                print('The objective value is:')
+                print('{0} = {1}'.format(v2[index2],valueObjective))
 
     end_time = time.time()
     run_time = end_time - start_time
-    print('')
-    print('The run time is: {} seconds'.format(run_time))
-    print('')
+    if printResults:
+        print('')
+        print('The run time is: {} seconds'.format(run_time))
+        print('')
 
     if saveName:
         # Convert the list of variables to a pandas DataFrame
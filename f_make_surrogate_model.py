@@ -20,7 +20,8 @@ from sklearn.metrics import r2_score, mean_squared_error
 import json
 import math
 from f_usefull_functions import get_location, save_2_json, transform_dictionary
-from f_screen_SBML import count_atom_in_formula, carbon_balance_in_out, find_yield, is_protein_met
+from f_screen_SBML import count_atom_in_formula, carbon_balance_in_out, find_yield, find_yields, is_protein_met, \
+    get_candidate_substrates, yields_above_tolerance, load_sbml_model, reduce_model
 
 # --------------------------------------------------------------------------------------
 # Surogate model class
@@ -433,8 +434,7 @@ def SBML_2_json(modelName, substrate_exchange_rnx, product_exchange_rnx, case='c
     """
 
     #  read in the SBML model
-    modelLocation = get_location(modelName)
-    model = cobra.io.read_sbml_model(modelLocation)
+    model = load_sbml_model(modelName)
 
     # make sure the right objective is set
     if newObjectiveReaction:
@@ -537,7 +537,7 @@ def SBML_2_json(modelName, substrate_exchange_rnx, product_exchange_rnx, case='c
 
 def SBML_2_json_v2(modelName, substrate_exchange_rnx, product_exchange_rnx, maxConcentration=None,
                    newObjectiveReaction=None, saveName=None, exchRnx2zero='Ex_S_cpd00027_ext', yieldTol=None,
-                   save=False, toIgnore=None, alreadyConsidered=None):
+                   save=False, toIgnore=None, alreadyConsidered=None, yieldDF=None, reduceModel=False):
     """ Starting from the SBML model a json file is created so that the equations can be quickly constructed in pyomo
     Params:
         * modelName(str): the name of the model
@@ -552,6 +552,9 @@ def SBML_2_json_v2(modelName, substrate_exchange_rnx, product_exchange_rnx, maxC
         * yieldTol (array): yield tolerances to accept an exchange metabolite as a potential substrate
         * toIgnore (list): names of potential substrates that can be ignored
         * alreadyConsidered (list): names of potential substrates that can be automatically considered
+        * yieldDF (DF): yields of the substrates that are already screened (see screen_substrates in
+        f_parallel_screening)
+        * reduceModel (bool): screen the substrates on the model without its blocked reactions (see reduce_model)
     returns:
         a json file save in 'json models'
         allEquations
@@ -559,8 +562,7 @@ def SBML_2_json_v2(modelName, substrate_exchange_rnx, product_exchange_rnx, maxC
     """
 
     #  read in the SBML model
-    modelLocation = get_location(modelName)
-    model = cobra.io.read_sbml_model(modelLocation)
+    model = load_sbml_model(modelName)
 
     # make sure the right objective is set
     if newObjectiveReaction:
@@ -579,7 +581,9 @@ def SBML_2_json_v2(modelName, substrate_exchange_rnx, product_exchange_rnx, maxC
                                                                  substrateExchRxnIDs=substrate_exchange_rnx,
                                                                  productExchRxnIDs=product_exchange_rnx,
                                                                  yieldTol=yieldTol, exchRnx2zero=exchRnx2zero,
-                                                                 ignore=toIgnore, include=alreadyConsidered)
+                                                                 ignore=toIgnore, include=alreadyConsidered,
+                                                                 yieldDF=yieldDF, reduceModel=reduceModel,
+                                                                 sbmlFile=modelName)
     outputNames = list(coefDict.keys())
     surrogateModel = SurrogateModel(name=modelName, inputs= considered ,outputs=outputNames, coef=coefDict,
                                     lable='SBML', maxConcentration=maxConcentration)
@@ -596,7 +600,8 @@ def SBML_2_json_v2(modelName, substrate_exchange_rnx, product_exchange_rnx, maxC
 
 
 def get_coef_all_substrates_SBML(modelName, substrateExchRxnIDs, productExchRxnIDs, yieldTol,
-                                 exchRnx2zero='Ex_S_cpd00027_ext', ignore=None, include=None):
+                                 exchRnx2zero='Ex_S_cpd00027_ext', ignore=None, include=None, yieldDF=None,
+                                 reduceModel=False, sbmlFile=None):
     """ Get the list of possible substrates from a model: Substrates have at least 3 carbons and produce a yield which is
     at least as big as the yield tolerance and is not a protein
 
@@ -609,6 +614,12 @@ def get_coef_all_substrates_SBML(modelName, substrateExchRxnIDs, productExchRxnI
         yieldTol (array): yield tolerances to accept an exchange metabolite as a potential substrate
         ignore (list): list of substrate names to ignore
         include (list): list of substrate names to automatically include
+        yieldDF (DF): yields of the substrates that are already screened (see screen_substrates in
+                      f_parallel_screening), if None the substrates are screened here
+        reduceModel (bool): if True the substrates are screened on the model without the reactions that are blocked
+                            when all the candidate substrates are available (see reduce_model), the yields are the same
+        sbmlFile (str): name of the SBML file of the model, the reduced model is saved next to it (if modelName is a
+                        string this is the default)
 
     Returns:
         substrateList (list): list of possible substrates
@@ -617,10 +628,9 @@ def get_coef_all_substrates_SBML(modelName, substrateExchRxnIDs, productExchRxnI
 
     # read in the model if necessary
     if isinstance(modelName, str):
-        modelLocation = get_location(modelName)
         modelStrName = modelName
         #  read in the SBML model
-        model = cobra.io.read_sbml_model(modelLocation)
+        model = load_sbml_model(modelName)
     else:
         model = modelName
         modelStrName = model.name
@@ -640,62 +650,27 @@ def get_coef_all_substrates_SBML(modelName, substrateExchRxnIDs, productExchRxnI
 
 
 #####################################################################################################################
-    # preallocate variables
-    substrateLists = []
-    yieldDict = {}
-
-    for rxnExch in allExchRxn: # loop through all the exchange reactions (i.e., possible substrates)
-        if isinstance(rxnExch, str):
-            rxnExch = model.reactions.get_by_id(rxnExch)  # get rxn object from the model if a list of strings
-        substrateMetabolite = rxnExch.reactants[0]
-        substrateName = substrateMetabolite.name
-        nCarbon = count_atom_in_formula(substrateMetabolite, atom='C')
-        proteinCheck = is_protein_met(metabolite=substrateMetabolite)
-        # save the original bounds
-        originalReactionBounds = rxnExch.bounds
-
+    if yieldDF is None:
         # filter out the substrates that aren't carbon based or are proteins
-        if nCarbon >= 2 and not proteinCheck and substrateName.lower() != 'biomass':
-            # preallocate variables
-            yields = []
-            substrateNames = []
-            productCoefDict = {}
-
-            # change bound of new desired substrate to -10 mol/h/gDW
-            rxnExch.bounds = -10, 1000
-
-            # check if all products are above the tolerance
-            allAboveTol = True
-            for i, prodId in enumerate(productExchRxnIDs): # loop over all the products
-                productName = model.reactions.get_by_id(prodId).reactants[0].name
-                FBA_yield = find_yield(model, substrateExchangeRxnID=rxnExch.id, productExchangeRxnID=prodId,
-                                       printResults=False)
-
-                # get the tolarance for this product if given
-                try:
-                    tolerance = yieldTol[prodId]
-                except:
-                    tolerance = 0
-
-                # check if the yield is above the given tolerance
-                if FBA_yield >= tolerance and FBA_yield < 1:  # bigger than the tolerance and smaller then 1
-                    yields.append(FBA_yield)  # already in g/g
-                    substrateNames.append(substrateName)
-                    productCoefDict.update({productName: FBA_yield})
-                else:
-                    allAboveTol = False
-
-                    #print(productCoefDict)
-                    #print('')
-
-            # if all the products are above the tolerance then add the substrate to the list
-            if allAboveTol:
-                yieldDict.update({substrateName: productCoefDict})
-                #substrateLists.append(substrateNames)
-
-        # reset the bounds to the original bounds again
-        rxnExch.bounds = originalReactionBounds
-
+        candidateRxnIDs = get_candidate_substrates(model, allExchRxn)
+
+        screeningModel = model
+        if reduceModel:
+            if sbmlFile is None and isinstance(modelName, str):
+                sbmlFile = modelName
+            keepReactionIDs = candidateRxnIDs + list(productExchRxnIDs) + [exchRnx2zero]
+            screeningModel, reductionInfo = reduce_model(model, openExchangeRxnIDs=candidateRxnIDs,
+                                                         openBounds=(-10, 1000), keepReactionIDs=keepReactionIDs,
+                                                         sbmlFile=sbmlFile)
+            print('the reduced model of {} has {} of the {} reactions'.format(modelStrName, reductionInfo['reactions'],
+                                                                            reductionInfo['reactions_full_model']))
+
+        # one pFBA per substrate (bound of the substrate set to -10 mol/h/gDW) gives the yields of all the products
+        yieldDF = find_yields(screeningModel, substrateExchangeRxnIDs=candidateRxnIDs,
+                              productExchangeRxnIDs=productExchRxnIDs, substrateBounds=(-10, 1000))
+
+    # keep the substrates of which all the products are above the tolerance
+    yieldDict = yields_above_tolerance(model, yieldDF, productExchRxnIDs=productExchRxnIDs, yieldTol=yieldTol)
 
     yieldDict = transform_dictionary(input_dict = yieldDict)
 
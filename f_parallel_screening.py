@@ -0,0 +1,129 @@
+"""
+Functions to screen the substrates of several GEMs in parallel
+
+Every substrate test (one pFBA with the exchange reaction of the substrate opened, see find_yields) is independent of
+the others. The (model, substrates) jobs are distributed over a process pool: a worker reads a SBML model only the
+first time it gets a job of that model and keeps it for the following jobs. The jobs are chunks of substrates of one
+model, the results are collected in the order of the jobs, so the yield matrices are the same as the serial ones.
+Optionally the substrates are screened on the reduced models (without their blocked reactions, see reduce_model).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from f_screen_SBML import find_yields, get_candidate_substrates, load_sbml_model, reduce_model
+
+# the models read by a worker process {(model name, exchange reaction set to zero, objective): model}
+_workerModels = {}
+
+
+def _get_worker_model(modelName, exchRnx2zero, newObjectiveReaction, reduceArgs=None):
+    key = (modelName, exchRnx2zero, newObjectiveReaction, reduceArgs)
+    if key not in _workerModels:
+        if reduceArgs is None:
+            model = load_sbml_model(modelName)
+            if newObjectiveReaction:
+                model.objective = newObjectiveReaction
+            # change the original substrate to zero
+            if exchRnx2zero:
+                model.reactions.get_by_id(exchRnx2zero).bounds = 0.0, 1000
+        else:
+            # the reduced model is made by screen_substrates before the jobs start, so here it is read from disk
+            openExchangeRxnIDs, keepReactionIDs, openBounds = reduceArgs
+            fullModel = _get_worker_model(modelName, exchRnx2zero, newObjectiveReaction)
+            model, _ = reduce_model(fullModel, openExchangeRxnIDs=list(openExchangeRxnIDs), openBounds=openBounds,
+                                    keepReactionIDs=list(keepReactionIDs), sbmlFile=modelName)
+        _workerModels[key] = model
+    return _workerModels[key]
+
+
+def _candidate_substrates_worker(jobInfo):
+    modelName, substrateExchRxnIDs, exchRnx2zero, newObjectiveReaction = jobInfo
+    model = _get_worker_model(modelName, exchRnx2zero, newObjectiveReaction)
+    if isinstance(substrateExchRxnIDs, str) and substrateExchRxnIDs == 'select':
+        substrateExchRxnIDs = model.exchanges
+    return get_candidate_substrates(model, substrateExchRxnIDs)
+
+
+def _find_yields_worker(jobInfo):
+    (modelName, substrateIDs, productExchRxnIDs, exchRnx2zero, newObjectiveReaction, substrateBounds, warmStart,
+     reduceArgs) = jobInfo
+    model = _get_worker_model(modelName, exchRnx2zero, newObjectiveReaction, reduceArgs)
+    return find_yields(model, substrateExchangeRxnIDs=substrateIDs, productExchangeRxnIDs=productExchRxnIDs,
+                       substrateBounds=substrateBounds, warmStart=warmStart)
+
+
+def screen_substrates(modelNames, substrateExchRxnIDs, productExchRxnIDs, nWorkers=None, chunkSize=20,
+                      exchRnx2zero='Ex_S_cpd00027_ext', newObjectiveReaction=None, substrateBounds=(-10, 1000),
+                      warmStart=False, reduceModel=False):
+    """ Finds the yields of the products for all the candidate substrates (see get_candidate_substrates) of a list of
+    SBML models in parallel.
+
+    REMARK: on Windows the worker processes are spawned, call this function from within
+    if __name__ == '__main__':
+
+    Params:
+        modelNames (list or str): names of the SBML models (files in 'SBML models')
+        substrateExchRxnIDs (list or str): list of id strings of the desired substrates or str: 'select' to test all the
+                                           exchange reactions of the model
+        productExchRxnIDs (list): list of id strings of the desired products (and biomass)
+        nWorkers (int): amount of worker processes, if None the amount of cores. If 1 the substrates are screened in
+                        this process
+        chunkSize (int): amount of substrates of one model in a job
+        exchRnx2zero (str): the original substrate exchange reaction that needs to be set to zero
+        newObjectiveReaction (str): ID of the reaction you maximise (default is the objective of the model)
+        substrateBounds (tuple): bounds of the exchange reaction of the substrate during its pFBA
+        warmStart (bool): solve the substrates of a chunk on the same LP (see find_yields), faster but the last digits
+                          of the yields depend on how the substrates are divided over the chunks
+        reduceModel (bool): screen the substrates on the models without the reactions that are blocked when all the
+                            candidate substrates are available (see reduce_model). The reduced models are made once
+                            (FVA with nWorkers processes) and saved next to the xml files
+
+    Returns:
+        yieldDFs (dict): {model name: yield matrix (DF), rows are the substrates, columns the products}
+    """
+    if isinstance(modelNames, str):
+        modelNames = [modelNames]
+    if nWorkers is None:
+        nWorkers = os.cpu_count()
+
+    candidateJobs = [(modelName, substrateExchRxnIDs, exchRnx2zero, newObjectiveReaction) for modelName in modelNames]
+
+    def make_yield_jobs(candidates):
+        jobs = []
+        for modelName, candidateIDs in zip(modelNames, candidates):
+            reduceArgs = None
+            if reduceModel:
+                keepReactionIDs = candidateIDs + list(productExchRxnIDs) + ([exchRnx2zero] if exchRnx2zero else [])
+                reduceArgs = (tuple(candidateIDs), tuple(keepReactionIDs), tuple(substrateBounds))
+                # reduce the model here, so the workers only read it from the disk
+                fullModel = _get_worker_model(modelName, exchRnx2zero, newObjectiveReaction)
+                _, reductionInfo = reduce_model(fullModel, openExchangeRxnIDs=candidateIDs, openBounds=substrateBounds,
+                                                keepReactionIDs=keepReactionIDs, processes=nWorkers,
+                                                sbmlFile=modelName)
+                print('the reduced model of {} has {} of the {} reactions'.format(
+                    modelName, reductionInfo['reactions'], reductionInfo['reactions_full_model']))
+            for i in range(0, len(candidateIDs), chunkSize):
+                jobs.append((modelName, candidateIDs[i:i + chunkSize], productExchRxnIDs, exchRnx2zero,
+                             newObjectiveReaction, substrateBounds, warmStart, reduceArgs))
+        return jobs
+
+    if nWorkers == 1:
+        candidates = [_candidate_substrates_worker(job) for job in candidateJobs]
+        yieldJobs = make_yield_jobs(candidates)
+        chunkDFs = [_find_yields_worker(job) for job in yieldJobs]
+    else:
+        with ProcessPoolExecutor(max_workers=nWorkers) as executor:
+            candidates = list(executor.map(_candidate_substrates_worker, candidateJobs))
+            yieldJobs = make_yield_jobs(candidates)
+            chunkDFs = list(executor.map(_find_yields_worker, yieldJobs))
+
+    # merge the chunks of every model (executor.map keeps the order of the jobs)
+    yieldDFs = {}
+    for modelName in modelNames:
+        modelChunks = [chunkDF for job, chunkDF in zip(yieldJobs, chunkDFs) if job[0] == modelName]
+        if modelChunks:
+            yieldDFs.update({modelName: pd.concat(modelChunks)})
+        else:
+            yieldDFs.update({modelName: pd.DataFrame(columns=list(productExchRxnIDs), dtype=float)})
+    return yieldDFs
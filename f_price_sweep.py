@@ -0,0 +1,167 @@
+"""
+Functions to run price (sensitivity) sweeps of the superstructure
+
+The superstructure is build only once, each worker process gets a copy of the model and for every scenario only the
+mutable price parameters are changed (see update_prices) before solving the model again.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import pyomo.environ as pe
+from f_make_super_structure import make_super_structure, update_prices, solve_model
+from f_solvers import get_solve_status, has_solution
+
+# superstructure of a worker process (it is passed once to every worker when the pool starts)
+_workerModel = None
+
+
+def _init_sweep_worker(model):
+    global _workerModel
+    _workerModel = model
+
+
+def _solve_scenario_worker(scenarioInfo):
+    scenarioName, prices, operatingDays, solveOptions, keyFlows = scenarioInfo
+    return solve_price_scenario(_workerModel, scenarioName, prices, operatingDays, solveOptions, keyFlows)
+
+
+def get_model_variables(model, component='var'):
+    """ returns a dictionary {index: pyomo variable} of a component of the model e.g., 'var', 'boolVar'.
+    Works for the flat model as well as for the model made of blocks (see make_super_structure) """
+    variables = {}
+    for var in model.component_data_objects(pe.Var, descend_into=True):
+        if var.parent_component().local_name == component:
+            variables.update({var.index(): var})
+    return variables
+
+
+def scenarios_2_dict(scenarios):
+    """ transforms the scenario table into a dictionary {scenario name: {price name: price}}
+
+    Params:
+        scenarios (DF or dict): a dataframe (rows are the scenarios, columns the names of the prices) or a dictionary
+                                {scenario name: {price name: price}}. Empty cells (NaN) keep the price of the Excel file
+    """
+    if isinstance(scenarios, pd.DataFrame):
+        scenarioDict = {}
+        for scenarioName, row in scenarios.iterrows():
+            scenarioDict.update({scenarioName: row.dropna().to_dict()})
+        return scenarioDict
+    elif isinstance(scenarios, dict):
+        return scenarios
+    else:
+        raise Exception('The scenarios should be a pandas DataFrame or a dictionary {scenario: {price name: price}}, '
+                        'not a {}'.format(type(scenarios)))
+
+
+def solve_price_scenario(model, scenarioName, prices, operatingDays, solveOptions=None, keyFlows=None):
+    """ changes the prices of the model, solves it and collects the results of one scenario
+
+    Params:
+        model (pyomo model): the superstructure
+        scenarioName (str): name of the scenario
+        prices (dict): {price name: price} prices to change
+        operatingDays (int): operating days (the flows and the objective are multiplied by the operating hours)
+        solveOptions (dict): options passed on to solve_model e.g., {'backend': 'highs', 'timeLimit': 60}
+        keyFlows (list): names of the variables (model.var) to report
+
+    Returns:
+        row (dict): the results of the scenario: status, objective, booleans and key flows
+    """
+    operatingHours = operatingDays * 24
+    if keyFlows is None:
+        keyFlows = []
+    if solveOptions is None:
+        solveOptions = {}
+    update_prices(model, prices)
+
+    row = {'scenario': scenarioName}
+    startTime = time.time()
+    try:
+        results = solve_model(model, operatingDays=operatingDays, printResults=False, **solveOptions)
+        row.update({'status': get_solve_status(results)})
+    except Exception as e:
+        # a failed scenario should not stop the sweep
+        row.update({'status': 'error: {}'.format(e)})
+        row.update({'solve_time': time.time() - startTime})
+        return row
+    row.update({'solve_time': time.time() - startTime})
+
+    # without a solution the model still holds the values of the previous scenario
+    if not has_solution(results):
+        row.update({'objective': None})
+        return row
+
+    objectiveValue = pe.value(model.objectiveValue, exception=False)
+    row.update({'objective': objectiveValue * operatingHours if objectiveValue is not None else None})
+
+    # the chosen booleans
+    for name, var in get_model_variables(model, 'boolVar').items():
+        value = pe.value(var, exception=False)
+        row.update({name: round(value) if value is not None else None})
+
+    # the key flows
+    continuousVars = get_model_variables(model, 'var')
+    for name in keyFlows:
+        value = pe.value(continuousVars[name], exception=False)
+        row.update({name: value * operatingHours if value is not None else None})
+
+    return row
+
+
+def run_price_sweep(excelFile, scenarios, nWorkers=None, operatingDays=1, solveOptions=None, keyFlows=None,
+                    saveName=None, chunkSize=1, **buildOptions):
+    """ Solves the superstructure for a table of price scenarios in parallel. The model is build once, every worker
+    gets a copy of it and only changes the prices of the scenarios it solves.
+
+    REMARK: on Windows the worker processes are spawned, call this function from within
+    if __name__ == '__main__':
+
+    Params:
+        excelFile (str): name of the Excel file of the superstructure
+        scenarios (DF or dict): rows are the scenarios, columns the names of the prices to change (see model.price)
+        nWorkers (int): amount of worker processes, if None the amount of cores. If 1 the scenarios are solved in this
+                        process
+        operatingDays (int): operating days used to report the results
+        solveOptions (dict): options passed on to solve_model e.g., {'backend': 'highs', 'timeLimit': 60, 'gap': 0.01}
+                             or {'solverType': 'BARON'} to use GAMS
+        keyFlows (list): names of the variables to report, if None the flows that have a price are reported (inputs,
+                         outputs, utilities, energy and waste)
+        saveName (str): if given the results are saved to this Excel file
+        chunkSize (int): amount of scenarios send to a worker at once
+        buildOptions: extra arguments of make_super_structure (e.g., equationMode='symbolic')
+
+    Returns:
+        resultsDF (DF): one row per scenario with the status, objective value, booleans and key flows
+    """
+    scenarioDict = scenarios_2_dict(scenarios)
+    model = make_super_structure(excelFile=excelFile, **buildOptions)
+
+    # check the scenarios before starting the workers
+    for scenarioName, prices in scenarioDict.items():
+        for priceName in prices:
+            if priceName not in model.price:
+                raise Exception("The price '{}' of scenario '{}' is not a price of the superstructure, the prices "
+                                "that can be changed are: {}".format(priceName, scenarioName, list(model.price.keys())))
+
+    if keyFlows is None:
+        continuousVars = get_model_variables(model, 'var')
+        keyFlows = [name for name in model.price.keys() if name in continuousVars]
+
+    # the workers reuse their model, so every scenario starts from the prices of the Excel file
+    basePrices = {name: pe.value(model.price[name]) for name in model.price}
+    jobs = [(scenarioName, basePrices | prices, operatingDays, solveOptions, keyFlows)
+            for scenarioName, prices in scenarioDict.items()]
+
+    if nWorkers == 1:
+        _init_sweep_worker(model)
+        rows = [_solve_scenario_worker(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=nWorkers, initializer=_init_sweep_worker, initargs=(model,)) as executor:
+            rows = list(executor.map(_solve_scenario_worker, jobs, chunksize=chunkSize))
+
+    resultsDF = pd.DataFrame(rows).set_index('scenario')
+    if saveName:
+        resultsDF.to_excel(saveName)
+    return resultsDF
@@ -1,13 +1,32 @@
 import re
 import warnings
+import os
+import hashlib
+import weakref
+from collections import OrderedDict
 
 import cobra
 import cobra.io
+from cobra.core.solution import get_solution
+from cobra.exceptions import OptimizationError
+from cobra.util.solver import assert_optimal
+from optlang import symbolics
 import numpy as np
 import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
 
 from f_usefull_functions import *
 
+# element composition of the metabolites of the models {model: composition index}, see get_composition_index
+_compositionIndexes = weakref.WeakKeyDictionary()
+
+# producing and consuming reactions of the metabolites of the models {model: reaction index}, see get_reaction_index
+_reactionIndexes = weakref.WeakKeyDictionary()
+
+# molar mass of the elements (g/mol) to calculate the mass imbalance of a reaction, the charge ('e-') is not weighted
+ELEMENT_MOLAR_MASS = {'C': 12, 'O': 15.99, 'H': 1, 'N': 14.01, 'e-': 1}
+
 
 ########################################################################################################################
 # ============================================================================================================
@@ -15,8 +34,65 @@ from f_usefull_functions import *
 # ============================================================================================================
 ########################################################################################################################
 
+# models that are already read in this process {file location: (file stamp, model)}, the last used model is at the end
+_loadedModels = OrderedDict()
+
+
+def get_sbml_location(modelName):
+    """ location of the xml file of a SBML model, modelName is the name of a model in 'SBML models' or a location """
+    if os.path.isfile(modelName):
+        location = modelName
+    else:
+        location = get_location(modelName)
+    if not os.path.isfile(location):
+        raise Exception("The SBML model '{}' is not found, looked for it at: {}".format(modelName, location))
+    return location
+
+
+def load_sbml_model(modelName, useCache=True, maxModelsInMemory=5):
+    """ reads a SBML model, parsing the xml file is slow so the parsed model is saved next to the xml file (.pkl) and
+    the models that are already read are kept in memory. The cache is not used if the xml file has changed (size,
+    modification time and hash of the file)
+
+    Params:
+        modelName (str): name of the model in 'SBML models' or the location of the xml file
+        useCache (bool): if False the xml file is always parsed (and the cache is not updated)
+        maxModelsInMemory (int): amount of models kept in memory, the least recently used model is removed first
+
+    Returns:
+        model (model): a copy of the COBRA model, so changing it (e.g., bounds) does not change the cached model
+    """
+    location = get_sbml_location(modelName)
+    if not useCache:
+        return cobra.io.read_sbml_model(location)
+
+    fileStamp = get_file_stamp(location)
+
+    # the model is already read in this process
+    if location in _loadedModels and _loadedModels[location][0] == fileStamp:
+        _loadedModels.move_to_end(location)
+        return _loadedModels[location][1].copy()
+
+    # the model is parsed before and saved next to the xml file
+    cacheLocation = os.path.splitext(location)[0] + '.pkl'
+    model = load_pickle_cache(cacheLocation, location, fileStamp)
+    if model is None:
+        model = cobra.io.read_sbml_model(location)
+        save_pickle_cache(cacheLocation, model, location, fileStamp)
+
+    _loadedModels.update({location: (fileStamp, model)})
+    _loadedModels.move_to_end(location)
+    while len(_loadedModels) > maxModelsInMemory:
+        _loadedModels.popitem(last=False)
+    return model.copy()
+
+
 # originaly from the file f_find_carbons
-def find_Carbons_Missing_Metabolite(model, metID):
+def find_Carbons_Missing_Metabolite(model, metID, carbonMemo=None):
+    # the carbons of a metabolite are only estimated once per carbon balance (see carbon_balance_in_out)
+    if carbonMemo is not None and ('metabolite', metID) in carbonMemo:
+        return carbonMemo[('metabolite', metID)]
+
     met = model.metabolites.get_by_id(metID)
     ProducingRct = get_Producing_Reactions(model, metID)
     reaction = ProducingRct[0]  # just need one producing reaction so you can stop at the first one
@@ -31,6 +107,8 @@ def find_Carbons_Missing_Metabolite(model, metID):
     carbonInProducts = count_element_in_list(reaction, reactionList=reaction_products, element='C')
 
     CarbonsMissingMet = (carbonInReactants - carbonInProducts) / stoiCoef_rct
+    if carbonMemo is not None:
+        carbonMemo[('metabolite', metID)] = CarbonsMissingMet
     return CarbonsMissingMet
 
 
@@ -63,14 +141,98 @@ def count_carbon_in_formula(metFormula):
     return allCarbons
 
 
+def get_composition_index(model, checkMetabolites=False):
+    """ element composition of all the metabolites of the model, the formulas are parsed only once per model. The index
+    is made again if the amount of metabolites changed. A row of the index belongs to the id of its metabolite, so a
+    look-up by id (see count_atom_in_formula) stays valid when metabolites are replaced, as long as the formula of the
+    metabolite is checked: a metabolite of which the formula changed (e.g., by fix_missing_formulas) is updated when it
+    is looked up. The arrays in the order of model.metabolites (see get_element_counts) need checkMetabolites
+
+    Params:
+        model (model): GEM model
+        checkMetabolites (bool): if True the index is also made again if the metabolites (id's in the order of
+                                 model.metabolites) are not the ones of the index, e.g., the same amount of metabolites
+                                 is added and removed
+
+    Returns:
+        compositionIndex (dict): 'metIndex' {metabolite id: row}, 'elementIndex' {element: column}, 'counts' (array
+                                 metabolites x elements), 'charges' (array, 0 if the charge is not known), 'formulas'
+                                 (the formulas the counts are made from) and 'metIDs' (the id's of the rows)
+    """
+    compositionIndex = _compositionIndexes.get(model)
+    if compositionIndex is not None and len(compositionIndex['formulas']) == len(model.metabolites):
+        if not checkMetabolites or compositionIndex['metIDs'] == [met.id for met in model.metabolites]:
+            return compositionIndex
+
+    allElements = [met.elements for met in model.metabolites]
+    elements = sorted(set(['C', 'H', 'O', 'N']).union(*allElements))
+    elementIndex = {element: j for j, element in enumerate(elements)}
+    integerCounts = all(float(count).is_integer() for metElements in allElements for count in metElements.values())
+    counts = np.zeros((len(allElements), len(elements)), dtype=int if integerCounts else float)
+    for i, metElements in enumerate(allElements):
+        for element, count in metElements.items():
+            counts[i, elementIndex[element]] = count
+
+    compositionIndex = {'metIndex': {met.id: i for i, met in enumerate(model.metabolites)},
+                        'elementIndex': elementIndex, 'counts': counts,
+                        'charges': np.array([met.charge or 0 for met in model.metabolites], dtype=float),
+                        'formulas': [met.formula for met in model.metabolites],
+                        'metIDs': [met.id for met in model.metabolites]}
+    _compositionIndexes[model] = compositionIndex
+    return compositionIndex
+
+
+def update_composition_index(model, compositionIndex, metabolite, row):
+    """ updates the counts of a metabolite of which the formula changed, the index is made again if the formula has an
+    element that is not in the index yet """
+    metElements = metabolite.elements
+    if not set(metElements).issubset(compositionIndex['elementIndex']) or \
+            not all(float(count).is_integer() for count in metElements.values()):
+        del _compositionIndexes[model]
+        return get_composition_index(model)
+
+    compositionIndex['counts'][row, :] = 0
+    for element, count in metElements.items():
+        compositionIndex['counts'][row, compositionIndex['elementIndex'][element]] = count
+    compositionIndex['charges'][row] = metabolite.charge or 0
+    compositionIndex['formulas'][row] = metabolite.formula
+    return compositionIndex
+
+
+def get_element_counts(model, element):
+    """ array with the amount of atoms of an element (or the charge for 'e-') of every metabolite of the model, in the
+    order of model.metabolites """
+    compositionIndex = get_composition_index(model, checkMetabolites=True)
+    # update the metabolites of which the formula changed
+    for i, met in enumerate(model.metabolites):
+        if compositionIndex['formulas'][i] != met.formula or compositionIndex['charges'][i] != (met.charge or 0):
+            compositionIndex = update_composition_index(model, compositionIndex, met, i)
+    if element == 'e-':
+        return compositionIndex['charges'].copy()
+    if element not in compositionIndex['elementIndex']:
+        return np.zeros(len(model.metabolites), dtype=compositionIndex['counts'].dtype)
+    return compositionIndex['counts'][:, compositionIndex['elementIndex'][element]].copy()
+
+
 def count_atom_in_formula(metabolite, atom):
     if atom == 'e-':
-        count = metabolite.charge
-    else:
-        try:
-            count = metabolite.elements[atom]
-        except:
-            count = 0  # if the atom is not a key, it is not in the formula and therefore zero
+        return metabolite.charge
+
+    # look the count up in the composition index of the model
+    model = metabolite.model
+    if model is not None:
+        compositionIndex = get_composition_index(model)
+        row = compositionIndex['metIndex'].get(metabolite.id)
+        if row is not None:
+            if compositionIndex['formulas'][row] != metabolite.formula:
+                compositionIndex = update_composition_index(model, compositionIndex, metabolite, row)
+            column = compositionIndex['elementIndex'].get(atom)
+            return compositionIndex['counts'][row, column].item() if column is not None else 0
+
+    try:
+        count = metabolite.elements[atom]
+    except:
+        count = 0  # if the atom is not a key, it is not in the formula and therefore zero
     return count
 
 
@@ -100,24 +262,68 @@ def get_IDlist_Of_Producing_Metabolties(model, metID):
     return ids, coef, coefProduct
 
 
+def get_reaction_index(model, rebuild=False):
+    """ index of the reactions that produce and consume each metabolite of the model (the stoichiometric matrix split on
+    the sign of the coefficients), made once per model. It is made again if the amount of metabolites or reactions
+    changes or if a reaction no longer has the metabolite it is indexed for, use rebuild=True after other changes to
+    the stoichiometry
+
+    Params:
+        model (model): GEM model
+        rebuild (bool): if True the index is always made again
+
+    Returns:
+        reactionIndex (dict): 'metIndex' {metabolite id: row}, 'producing' (sparse metabolites x reactions with the
+                              positive coefficients), 'consuming' (sparse, the absolute value of the negative
+                              coefficients) and 'shape'
+    """
+    shape = (len(model.metabolites), len(model.reactions))
+    reactionIndex = _reactionIndexes.get(model)
+    if not rebuild and reactionIndex is not None and reactionIndex['shape'] == shape:
+        return reactionIndex
+
+    stoiMatrix = get_stoichiometric_matrix(model).tocsr()
+    producing = stoiMatrix.multiply(stoiMatrix > 0).tocsr()
+    consuming = (-stoiMatrix).multiply(stoiMatrix < 0).tocsr()
+    producing.sort_indices()
+    consuming.sort_indices()
+    reactionIndex = {'metIndex': {met.id: i for i, met in enumerate(model.metabolites)}, 'producing': producing,
+                     'consuming': consuming, 'shape': shape}
+    _reactionIndexes[model] = reactionIndex
+    return reactionIndex
+
+
+def get_metabolite_reactions(model, metID, direction='producing'):
+    """ reactions that produce (direction='producing') or consume (direction='consuming') a metabolite according to
+    the sign of its coefficient, in the order of model.reactions """
+    if direction not in ('producing', 'consuming'):
+        raise Exception("direction should be 'producing' or 'consuming', not '{}'".format(direction))
+
+    for rebuild in (False, True):
+        reactionIndex = get_reaction_index(model, rebuild=rebuild)
+        matrix = reactionIndex[direction]
+        row = reactionIndex['metIndex'][metID]
+        columns = matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]
+        reactions = [model.reactions[j] for j in columns]
+        # check that the index is not outdated
+        met = model.metabolites.get_by_id(metID)
+        sign = 1 if direction == 'producing' else -1
+        if all(rxn.metabolites.get(met, 0) * sign > 0 for rxn in reactions):
+            return reactions
+    return reactions
+
+
 def get_Producing_Reactions(model, metID):
-    met = model.metabolites.get_by_id(metID)
-    frozenRct = met.reactions
-
-    # get the reaction that produces the metabolite
-    rcts = list(frozenRct)
-    ProducingRct = []
-    for rct in rcts:
-        products = rct.products
-        for prod in products:
-            if prod == model.metabolites.get_by_id(metID):
-                ProducingRct.append(rct)
-
-    reaction = ProducingRct[0]
+    ProducingRct = get_metabolite_reactions(model, metID, direction='producing')
+    if not ProducingRct:
+        raise Exception('The metabolite {} is not produced by any reaction'.format(metID))
     return ProducingRct
 
 
-def find_carbons_of_reaction(model, reactionID):
+def find_carbons_of_reaction(model, reactionID, carbonMemo=None):
+    if carbonMemo is not None and ('reaction', reactionID) in carbonMemo:
+        return carbonMemo[('reaction', reactionID)]
+
     reaction = model.reactions.get_by_id(reactionID)
     reactantList = reaction.reactants
     product = reaction.products
@@ -133,7 +339,7 @@ def find_carbons_of_reaction(model, reactionID):
             carbonOfEachMolecule.append(nCarbon)
         else:  # else go one reaction deeper to find the amount of carbons
             metID = met.id
-            nCarbon = find_Carbons_Missing_Metabolite(model=model, metID=metID)
+            nCarbon = find_Carbons_Missing_Metabolite(model=model, metID=metID, carbonMemo=carbonMemo)
             if nCarbon > 0:
                 carbonOfEachMolecule.append(nCarbon)
             else:
@@ -144,7 +350,7 @@ def find_carbons_of_reaction(model, reactionID):
                 carbonSubReactions = []
                 for subMetID in subMetabolites:
                     namesubMet = model.metabolites.get_by_id(subMetID).name
-                    nSubCarbon = find_Carbons_Missing_Metabolite(model=model, metID=subMetID)
+                    nSubCarbon = find_Carbons_Missing_Metabolite(model=model, metID=subMetID, carbonMemo=carbonMemo)
                     carbonSubReactions.append(nSubCarbon)
 
                 control = [carbonSubReactions[i] >= 0 for i in range(len(carbonSubReactions))]
@@ -166,10 +372,12 @@ def find_carbons_of_reaction(model, reactionID):
     carbonsHeadReaction = np.transpose(np.array(carbonOfEachMolecule))
     sumOfCarbons = np.matmul(coefficientsHeadReaction, carbonsHeadReaction)
     carbonProduct = sumOfCarbons / coefOfProduct
+    if carbonMemo is not None:
+        carbonMemo[('reaction', reactionID)] = (carbonProduct[0], carbonOfEachMolecule, coefOfReactants)
     return carbonProduct[0], carbonOfEachMolecule, coefOfReactants
 
 
-def carbon_balance(model, reactionDF, missingCarbonDict, tol=0.0001):
+def carbon_balance(model, reactionDF, missingCarbonDict, tol=0.0001, carbonMemo=None):
     metNamesAll = []
     carbonNrAll = []
     gramsCAll = []
@@ -186,7 +394,7 @@ def carbon_balance(model, reactionDF, missingCarbonDict, tol=0.0001):
             if metID in missingCarbonDict.keys():
                 rct = missingCarbonDict[metID]
                 rctID = rct.id
-                c = find_carbons_of_reaction(model=model, reactionID=rctID)
+                c = find_carbons_of_reaction(model=model, reactionID=rctID, carbonMemo=carbonMemo)
                 nrOfCarbons = c[0]
             else:
                 nrOfCarbons = count_atom_in_formula(metabolite=met, atom='C')
@@ -206,7 +414,7 @@ def carbon_balance(model, reactionDF, missingCarbonDict, tol=0.0001):
 
 def carbon_balance_in_out(modelLocation, metIDsMissingCarbon=None, tol=0.0001):
     if isinstance(modelLocation, str):
-        model = cobra.io.read_sbml_model(modelLocation)
+        model = load_sbml_model(modelLocation)
         modelName = modelLocation.split("\\")[-1]
         modelName = modelName.replace(".xml", "")
     else:
@@ -216,24 +424,31 @@ def carbon_balance_in_out(modelLocation, metIDsMissingCarbon=None, tol=0.0001):
     if metIDsMissingCarbon is None:
         metIDsMissingCarbon = []
 
+    # the producing reactions are looked up in the index of the model and the carbons of every metabolite are only
+    # estimated once
+    get_reaction_index(model, rebuild=True)
+    carbonMemo = {}
+
     allRctIDMissingCarbon = []
     missingCarbonDict = {}
     if not isinstance(metIDsMissingCarbon, list):
         metIDsMissingCarbon = [metIDsMissingCarbon]  # change ito a list if it is not
-        if metIDsMissingCarbon:  # if it is not empty
-            for metID in metIDsMissingCarbon:  # write a for loop to go over all the missing metabolites and find the producing reaction
-                reactions = get_Producing_Reactions(model=model, metID=metID)
-                rctIDMissingCarbon = reactions[0]  # only want the first reaction
-                allRctIDMissingCarbon.append(rctIDMissingCarbon)
-                missingCarbonDict.update({metID: rctIDMissingCarbon})
+    if metIDsMissingCarbon:  # if it is not empty
+        for metID in metIDsMissingCarbon:  # write a for loop to go over all the missing metabolites and find the producing reaction
+            reactions = get_Producing_Reactions(model=model, metID=metID)
+            rctIDMissingCarbon = reactions[0]  # only want the first reaction
+            allRctIDMissingCarbon.append(rctIDMissingCarbon)
+            missingCarbonDict.update({metID: rctIDMissingCarbon})
 
     df = model.summary()
     # exchangeRxn = model.exchanges
     uptake = df.uptake_flux
     secretion = df.secretion_flux
 
-    dfUptake = carbon_balance(model=model, reactionDF=uptake, missingCarbonDict=missingCarbonDict, tol=tol)
-    dfSecretion = carbon_balance(model=model, reactionDF=secretion, missingCarbonDict=missingCarbonDict, tol=tol)
+    dfUptake = carbon_balance(model=model, reactionDF=uptake, missingCarbonDict=missingCarbonDict, tol=tol,
+                              carbonMemo=carbonMemo)
+    dfSecretion = carbon_balance(model=model, reactionDF=secretion, missingCarbonDict=missingCarbonDict, tol=tol,
+                                 carbonMemo=carbonMemo)
     totalCarbonIn = sum(dfUptake['flux (gram-C/g-DW/h)'])
     CgramsOut = sum(dfSecretion['flux (gram-C/g-DW/h)'])
     CarbonBalance = abs(CgramsOut / totalCarbonIn) * 100
@@ -336,45 +551,87 @@ def find_maintanace_reaction(metabolite, case='names', printFlux=False):
                       'the compartment(s) of the reactions are {} \n'.format(rxn.id, flux, rxn.bounds, rxn.compartments))
     return  listRxn
 
+def get_stoichiometric_matrix(model):
+    """ sparse stoichiometric matrix of the model (metabolites x reactions, in the order of model.metabolites and
+    model.reactions) """
+    metIndex = {met.id: i for i, met in enumerate(model.metabolites)}
+    rows, columns, coefficients = [], [], []
+    for j, rxn in enumerate(model.reactions):
+        for met, coef in rxn.metabolites.items():
+            rows.append(metIndex[met.id])
+            columns.append(j)
+            coefficients.append(coef)
+    return sparse.csc_matrix((coefficients, (rows, columns)), shape=(len(model.metabolites), len(model.reactions)))
+
+
+def get_composition_matrix(model, elements=('C', 'O', 'H', 'e-')):
+    """ elements x metabolites matrix with the amount of atoms of each element in the metabolites, 'e-' is the charge
+    (metabolites without a formula or charge count as 0) """
+    return np.array([get_element_counts(model, element) for element in elements], dtype=float)
+
+
+def find_element_imbalances(model, fluxArray, elements=('C', 'O', 'H', 'e-'), excludeReactions=None):
+    """ finds the imbalance of the elements of all the reactions at once: the composition matrix (elements x
+    metabolites) times the sparse stoichiometric matrix gives the elements x reactions imbalance
+
+    Params:
+        model: COBRA model
+        fluxArray (Series): flux of the reactions (index are the reaction ids)
+        elements (list): elements to balance 'C', 'O', 'H', 'N' or 'e-' (charge)
+        excludeReactions (list): ids of reactions to leave out (e.g., the exchange reactions, which are never balanced)
+
+    Returns:
+        imbalanceDF (DF): elements x reactions, the imbalance in mol element per mol reaction
+        massImbalanceDF (DF): elements x reactions, the imbalance in g element (mass times flux of the reaction)
+    """
+    rxnIds = [rxn.id for rxn in model.reactions]
+    keep = np.ones(len(rxnIds), dtype=bool)
+    if excludeReactions is not None:
+        excludeReactions = set(excludeReactions)
+        keep = np.array([rxnId not in excludeReactions for rxnId in rxnIds])
+    rxnIds = list(np.array(rxnIds)[keep])
+
+    stoiMatrix = get_stoichiometric_matrix(model)[:, np.flatnonzero(keep)]
+    composition = get_composition_matrix(model, elements=elements)
+    imbalance = np.asarray((stoiMatrix.T @ composition.T).T)  # in mols of element
+
+    molarMass = np.array([ELEMENT_MOLAR_MASS[element] for element in elements]).reshape(-1, 1)
+    fluxes = fluxArray.reindex(rxnIds).fillna(0).to_numpy().reshape(1, -1)
+    massImbalance = imbalance * molarMass * fluxes
+
+    imbalanceDF = pd.DataFrame(imbalance, index=list(elements), columns=rxnIds)
+    massImbalanceDF = pd.DataFrame(massImbalance, index=list(elements), columns=rxnIds)
+    return imbalanceDF, massImbalanceDF
+
+
+def unbalanced_reactions_table(model, massImbalance, element):
+    """ table of the reactions of which the mass imbalance (see find_element_imbalances) of an element is not 0 """
+    unbalancedId = list(massImbalance.index[massImbalance.abs().to_numpy() > 0])
+    unbalanced = list(massImbalance[unbalancedId])
+    rxnUnblanaced = [string_reactions(model.reactions.get_by_id(rxnId)) for rxnId in unbalancedId]
+    DictMissingElementInRxn = {'Reaction Id': unbalancedId, '{}(g{})'.format(element, element): unbalanced,
+                               'reaction': rxnUnblanaced}
+    return pd.DataFrame(DictMissingElementInRxn)
+
+
 def find_unbalanced_rxn_of_element(model, stoiMatrix, fluxArray, element, elementCount):
     """ finds the reactions where the given element is unbalanced
     Params:
         model: COBRA model
         stoiMatrix (DF): Pandas Dataframe of the stoichiometric matrix
         fluxArray (Series): Pandas series with the flux of all reactions'
-        element (str): can either be 'C', 'O', 'H' or 'e-'
+        element (str): can either be 'C', 'O', 'H', 'N' or 'e-'
         elementCount (list): list of # carbons per metabolite of the model
 
     Returns:
           DFUnbalancedElementReactions (DF): A dataframe with all the unbalanced reactions
     """
-
-    MM = {'C': 12, 'O': 15.99, 'H': 1, 'e-': 1}
-    fluxArrayNp = np.array(fluxArray).reshape(-1, 1)  # reshape the flux array
-    elementArray = np.array(elementCount)
-    elementArray = elementArray.reshape(-1, 1)
-    StoiMatrixTranspose = np.transpose(stoiMatrix)
-
-    elementBalance = np.dot(StoiMatrixTranspose, elementArray)  # in mols of element
+    elementArray = np.array(elementCount, dtype=float)
+    elementBalance = sparse.csc_matrix(stoiMatrix.to_numpy()).T @ elementArray  # in mols of element
     # multiply by MM g[C,O,H]/mol
-    elementMassBalance = elementBalance * MM[element]
-    elementMissing = elementMassBalance * fluxArrayNp
-    rxnIDreduced = list(fluxArray.index)
-
-    unbalancedId = []
-    unbalanced = []
-    rxnUnblanaced = []
-    for i, c in enumerate((elementMissing)):
-        if abs(c) > 0:
-            unbalancedId.append(rxnIDreduced[i])
-            unbalanced.append(c[0])
-            reactionStr = string_reactions(model.reactions.get_by_id(rxnIDreduced[i]))
-            rxnUnblanaced.append(reactionStr)
-    DictMissingElementInRxn = {'Reaction Id': unbalancedId, '{}(g{})'.format(element, element): unbalanced,
-                               'reaction': rxnUnblanaced}
-    DFUnbalancedElementReactions = pd.DataFrame(DictMissingElementInRxn)
-
-    return DFUnbalancedElementReactions
+    elementMissing = elementBalance * ELEMENT_MOLAR_MASS[element] * fluxArray.to_numpy()
+    massImbalance = pd.Series(elementMissing, index=list(fluxArray.index))
+    return unbalanced_reactions_table(model, massImbalance, element)
 
 
 def get_list_metabolite_ids_names(model):
@@ -395,8 +652,72 @@ def get_list_metabolite_ids_names(model):
     return DFidName
 
 
+# formats of the tables exported by print_SBML_info_2_excel
+EXPORT_FORMATS = ('csv', 'parquet')
+
+
+def get_analysis_folder(saveName):
+    """ folder in 'SBML screening/Excel analysis' to export the tables of the analysis of a model to (see
+    print_SBML_info_2_excel), the folder has the name of saveName without its extension """
+    folderName = os.path.splitext(os.path.basename(saveName))[0]
+    return get_location(folderName, case='analysis')
+
+
+def export_analysis_table(table, tableName, exportFolder, exportFormat='csv'):
+    """ writes a table of the analysis of a model to exportFolder/tableName.csv (or .parquet)
+
+    Returns:
+        location (str): location of the file
+    """
+    if exportFormat not in EXPORT_FORMATS:
+        raise Exception("the export format should be one of {}, not '{}'".format(EXPORT_FORMATS, exportFormat))
+    location = os.path.join(exportFolder, '{}.{}'.format(tableName, exportFormat))
+    if exportFormat == 'csv':
+        table.to_csv(location, index=False)
+    else:
+        table.to_parquet(location, index=False)
+    return location
+
+
+def export_stoichiometric_triplets(model, exportFolder, exportFormat='csv', chunkSize=5000):
+    """ writes the stoichiometric matrix as a sparse table (metabolite id, reaction id, coefficient), the reactions are
+    written in chunks of chunkSize so the dense matrix is never made
+
+    Returns:
+        location (str): location of the file
+    """
+    if exportFormat not in EXPORT_FORMATS:
+        raise Exception("the export format should be one of {}, not '{}'".format(EXPORT_FORMATS, exportFormat))
+    location = os.path.join(exportFolder, 'Stoichiometric_matrix.{}'.format(exportFormat))
+    stoiMatrix = get_stoichiometric_matrix(model)
+    metIDs = np.array([met.id for met in model.metabolites], dtype=object)
+    rxnIDs = np.array([rxn.id for rxn in model.reactions], dtype=object)
+
+    writer = None
+    for start in range(0, max(len(rxnIDs), 1), chunkSize):
+        chunk = stoiMatrix[:, start:start + chunkSize].tocoo()
+        chunkDF = pd.DataFrame({'metabolite id': metIDs[chunk.row], 'reaction id': rxnIDs[chunk.col + start],
+                                'coefficient': chunk.data.astype(float)})
+        if exportFormat == 'csv':
+            chunkDF.to_csv(location, index=False, mode='w' if start == 0 else 'a', header=start == 0)
+        else:
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise Exception('pyarrow is needed to export the tables to parquet files, install it or use '
+                                "exportFormat='csv'")
+            chunkTable = pyarrow.Table.from_pandas(chunkDF, preserve_index=False)
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(location, chunkTable.schema)
+            writer.write_table(chunkTable)
+    if writer is not None:
+        writer.close()
+    return location
+
+
 def print_SBML_info_2_excel(modelName, idMissingCarbon=None, saveName=None, tolerance=0.0001,
-                            print2Excel=True):
+                            print2Excel=None, exportFormat=None, exportFolder=None):
     """
     This function imports information of the model to an Excel file to check the missing carbon in the metabolic reactions
     the percent of missing carbon can also  be attributed to the reactions to check on their importants of the reactions to
@@ -410,12 +731,20 @@ def print_SBML_info_2_excel(modelName, idMissingCarbon=None, saveName=None, tole
 
     blanace elements: list of elements to balance. default = ['C', 'O', 'H']
 
+    print2Excel: write the Excel file (saveName). default = None (only if there is no exportFormat)
+
+    exportFormat: 'csv' or 'parquet', the tables are written to separate files as soon as they are made and the
+    stoichiometric matrix as a sparse table (metabolite id, reaction id, coefficient). The Excel file is then an opt-in
+    summary (print2Excel=True) with only the small sheets (exchange reactions, missing formulas and the balances),
+    written to the exportFolder. default = None (only the Excel file with all the sheets)
+
+    exportFolder: folder to write the tables to. default = None ('SBML screening/Excel analysis/<saveName>')
+
     output:
     Excel files with info
     """
     if isinstance(modelName, str):  # the model still needs to be retrived from the file
-        modelLocation = get_location(modelName)
-        model = cobra.io.read_sbml_model(modelLocation)
+        model = load_sbml_model(modelName)
         name = modelName
     else:  # the COBRA model is given as the input
         model = modelName
@@ -426,8 +755,20 @@ def print_SBML_info_2_excel(modelName, idMissingCarbon=None, saveName=None, tole
         saveName = saveName.replace('.xml', '')
         saveName = '{}_analysis.xlsx'.format(saveName)
 
-    StoiMatrixDF = cobra.util.create_stoichiometric_matrix(model, array_type='DataFrame')  # [:,0:posExchangeRxn]
-    # print(StoiMatrixDF)
+    if print2Excel is None:
+        print2Excel = exportFormat is None
+
+    def export(table, tableName):
+        if exportFormat is not None:
+            export_analysis_table(table, tableName, exportFolder, exportFormat)
+
+    if exportFormat is not None:
+        if exportFormat not in EXPORT_FORMATS:
+            raise Exception("the export format should be one of {}, not '{}'".format(EXPORT_FORMATS, exportFormat))
+        if exportFolder is None:
+            exportFolder = get_analysis_folder(saveName)
+        os.makedirs(exportFolder, exist_ok=True)
+        export_stoichiometric_triplets(model, exportFolder, exportFormat)
 
     FBA = model.optimize()
     fluxArray = FBA.fluxes  # [0:posExchangeRxn] #.to_numpy()
@@ -446,22 +787,10 @@ def print_SBML_info_2_excel(modelName, idMissingCarbon=None, saveName=None, tole
     idRxns = []
     fluxRxn = []
     stoiMetMissingFormula = []
-    carbonCount = []
-    oxygenCount = []
-    hydrogenCount = []
-    chargeCount = []
+    carbonCount = list(get_element_counts(model, 'C'))
 
     for met in metabolites:
         formula = met.formula
-        carbon = count_atom_in_formula(metabolite=met, atom='C')
-        oxygen = count_atom_in_formula(metabolite=met, atom='O')
-        hydrogen = count_atom_in_formula(metabolite=met, atom='H')
-        charge = count_atom_in_formula(metabolite= met, atom='e-')
-
-        carbonCount.append(carbon)
-        oxygenCount.append(oxygen)
-        hydrogenCount.append(hydrogen)
-        chargeCount.append(charge)
 
         if not formula:
             metID.append(met.id)
@@ -489,8 +818,9 @@ def print_SBML_info_2_excel(modelName, idMissingCarbon=None, saveName=None, tole
                 stoiFactor = rxn.metabolites
                 stoiMetMissingFormula.append(stoiFactor[met])
 
-    DictCarbons = {'ID metabolite': list(StoiMatrixDF.index), '# Carbons': carbonCount}
+    DictCarbons = {'ID metabolite': [met.id for met in metabolites], '# Carbons': carbonCount}
     CarbonsDF = pd.DataFrame(DictCarbons)
+    export(CarbonsDF, 'Carbons_Per_Metbolite')
 
     # DictMetabolites = {'ID': metID, 'Name': metName}
     # DFmetabolites = pd.DataFrame(DictMetabolites)
@@ -500,10 +830,13 @@ def print_SBML_info_2_excel(modelName, idMissingCarbon=None, saveName=None, tole
                   'Flux': fluxRxn,
                   'Stoichiometry': stoiMetMissingFormula}
     DFmetRnx = pd.DataFrame(DictMetRnx)
+    export(DFmetRnx, 'Missing_Formula_Reactions')
     # print(DFmetRnx)
 
     # find the ingoing and outgoing fluxes
     inputDF, outputDF = carbon_balance_in_out(modelLocation=model, metIDsMissingCarbon=idMissingCarbon, tol=tolerance)
+    export(inputDF, 'Carbon_Input')
+    export(outputDF, 'Carbon_Output')
 
     # calculate the mass of carbon at goes missing in each reaction (excluded the exchange reactions?)
     # exclude the transfer (exchange reactions) reactions
@@ -513,21 +846,22 @@ def print_SBML_info_2_excel(modelName, idMissingCarbon=None, saveName=None, tole
 
     #  drop the exchange reactions, they are never balanced so don't bother looking at them
     fluxArray.drop(keysListExRxn, inplace=True)
-    st = StoiMatrixDF.drop(keysListExRxn, axis='columns')  # ,inplace=False)
-
-    DFcarbon = find_unbalanced_rxn_of_element(model=model, stoiMatrix=st, fluxArray=fluxArray,
-                                              element='C', elementCount=carbonCount)
-
-    DFoxygen = find_unbalanced_rxn_of_element(model=model, stoiMatrix=st, fluxArray=fluxArray,
-                                              element='O', elementCount=oxygenCount)
-
-    DFhydrogen = find_unbalanced_rxn_of_element(model=model, stoiMatrix=st, fluxArray=fluxArray,
-                                                element='H', elementCount=hydrogenCount)
-
-    DFcharge =  find_unbalanced_rxn_of_element(model=model, stoiMatrix=st, fluxArray=fluxArray,
-                                                element='e-', elementCount=chargeCount)
+    export(pd.DataFrame({'Reaction Id': fluxArray.index, 'flux': fluxArray.to_numpy()}), 'Reaction_fluxes')
+
+    # the imbalance of all the elements of all the reactions at once (sparse stoichiometric matrix)
+    _, massImbalanceDF = find_element_imbalances(model, fluxArray=fluxArray, elements=('C', 'O', 'H', 'e-'),
+                                                 excludeReactions=keysListExRxn)
+    DFcarbon = unbalanced_reactions_table(model, massImbalanceDF.loc['C'], element='C')
+    DFoxygen = unbalanced_reactions_table(model, massImbalanceDF.loc['O'], element='O')
+    DFhydrogen = unbalanced_reactions_table(model, massImbalanceDF.loc['H'], element='H')
+    DFcharge = unbalanced_reactions_table(model, massImbalanceDF.loc['e-'], element='e-')
+    export(DFcarbon, 'Carbon_Balance')
+    export(DFoxygen, 'Oxygen_Balance')
+    export(DFhydrogen, 'Hydrogen_Balance')
+    export(DFcharge, 'Electron_Balance')
 
     DFMetIdNames = get_list_metabolite_ids_names(model)
+    export(DFMetIdNames, 'ID_2_name')
 
     # get a list of metabolites that can be exchanged (ids and names)
     exchangeMetID = []
@@ -545,16 +879,26 @@ def print_SBML_info_2_excel(modelName, idMissingCarbon=None, saveName=None, tole
     exchangeDict = {'Name': exchangeName, 'metabolite id': exchangeMetID, 'reaction id': exchangeRxnID,
                     'flux': exchangeFLux}
     DFexchange = pd.DataFrame(data=exchangeDict)
+    export(DFexchange, 'Exchange_reactions')
 
     if print2Excel:
-        saveLocation = r'C:\Users\lucas\PycharmProjects\Alquimia\SBML screening\Excel analysis\{}'.format(saveName)
+        if exportFormat is None:
+            saveLocation = os.path.join(os.path.dirname(get_analysis_folder(saveName)), saveName)
+        else:  # the summary goes with the exported tables
+            saveLocation = os.path.join(exportFolder, os.path.basename(saveName))
         with pd.ExcelWriter(saveLocation) as writer:
-            StoiMatrixDF.to_excel(writer, sheet_name='Stoichiometric_matrix')
-            fluxArray.to_excel(writer, sheet_name='Reaction_fluxes')
+            # the big sheets are already exported to separate files, the Excel file is only a summary
+            if exportFormat is None:
+                # the dense stoichiometric matrix is only made for the Excel file
+                StoiMatrixDF = cobra.util.create_stoichiometric_matrix(model, array_type='DataFrame')
+                StoiMatrixDF.to_excel(writer, sheet_name='Stoichiometric_matrix')
+                fluxArray.to_excel(writer, sheet_name='Reaction_fluxes')
             DFexchange.to_excel(writer, sheet_name='Exchange_reactions')
-            CarbonsDF.to_excel(writer, sheet_name='Carbons_Per_Metbolite')
+            if exportFormat is None:
+                CarbonsDF.to_excel(writer, sheet_name='Carbons_Per_Metbolite')
             DFmetRnx.to_excel(writer, sheet_name='Missing_Formula_Reactions')
-            DFMetIdNames.to_excel(writer, sheet_name='ID_2_name')
+            if exportFormat is None:
+                DFMetIdNames.to_excel(writer, sheet_name='ID_2_name')
             DFcarbon.to_excel(writer, sheet_name='Carbon_Balance')
             DFoxygen.to_excel(writer, sheet_name='Oxygen_Balance')
             DFhydrogen.to_excel(writer, sheet_name='Hydrogen_Balance')
@@ -570,23 +914,13 @@ def balance_element(reaction, element):
 
     Cproducts = 0
     for prod in products:
-        if element in prod.elements:
-            nC = prod.elements[element]
-        elif element == 'e-':
-            nC = prod.charge
-        else:
-            nC = 0
+        nC = count_atom_in_formula(metabolite=prod, atom=element)
         stoiFactor = reaction.metabolites[prod]
         Cproducts += nC * stoiFactor
 
     Creactants = 0
     for react in reactants:
-        if element in react.elements:
-            nC = react.elements[element]
-        elif element == 'e-':
-            nC = react.charge
-        else:
-            nC = 0
+        nC = count_atom_in_formula(metabolite=react, atom=element)
         stoiFactor = reaction.metabolites[react]
         Creactants += nC * stoiFactor
     return Creactants, Cproducts
@@ -788,7 +1122,80 @@ def count_missing_formulas_in_rxn(rxnId, model):
     return countMissingFormulas
 
 
-def fix_missing_formulas(model, fixDict, maxIterations=10):
+def estimate_formulas_least_squares(model, reactionIDs, elements=('C', 'H', 'O'), roundFormulas=True, tol=1e-6):
+    """ estimates the formulas of all the metabolites without a formula in the given reactions at once. For every
+    element the balances of the reactions (sparse stoichiometric matrix) give a linear system: the coefficients of the
+    unknown metabolites times their amount of atoms = minus the atoms of the metabolites with a formula. The unknown
+    metabolites are split into independent groups (connected by the reactions) and every group is solved by least
+    squares. The amount of atoms of a metabolite is only determined if the reactions fix it (the metabolite is not part
+    of the null space of the group), the others are reported as under-determined.
+
+    Params:
+        model (COBRA model): model
+        reactionIDs (list): ids of the reactions that should be balanced
+        elements (tuple): elements to estimate
+        roundFormulas (bool): round the amount of atoms to integers, else rounded to 2 decimals
+        tol (float): tolerance on the singular values and the residual of the balances
+
+    Returns:
+        formulaDict (dict): {metabolite id: estimated formula} of the determined metabolites
+        underDetermined (list): ids of the metabolites of which the amount of atoms cannot be found with these reactions
+        inconsistentReactions (list): ids of the reactions that stay unbalanced with the estimated formulas (e.g., an
+                                      element is overproduced)
+    """
+    reactionIDs = list(dict.fromkeys(reactionIDs))  # remove duplicates, keep the order
+    rxnIndex = [model.reactions.index(rxnID) for rxnID in reactionIDs]
+    stoiMatrix = get_stoichiometric_matrix(model)[:, rxnIndex].tocsr()
+
+    # the metabolites without a formula that take part in the reactions are the unknowns
+    unknownRows = [i for i in np.unique(stoiMatrix.nonzero()[0]) if not model.metabolites[i].formula]
+    unknownIDs = [model.metabolites[i].id for i in unknownRows]
+    if not unknownIDs:
+        return {}, [], []
+    knownRows = np.setdiff1d(np.arange(len(model.metabolites)), unknownRows)
+    A = stoiMatrix[unknownRows, :].T.tocsr()  # reactions x unknown metabolites
+    B = np.column_stack([-(stoiMatrix[knownRows, :].T @ get_element_counts(model, element)[knownRows])
+                         for element in elements])  # reactions x elements
+
+    # the groups of unknown metabolites that share reactions are independent of each other
+    connection = (abs(A.T) @ abs(A)).tocsr()
+    nGroups, groupOfUnknown = connected_components(connection, directed=False)
+
+    estimates = np.zeros((len(unknownIDs), len(elements)))
+    determined = np.ones(len(unknownIDs), dtype=bool)
+    residuals = np.zeros(B.shape)
+    for group in range(nGroups):
+        columns = np.flatnonzero(groupOfUnknown == group)
+        rows = np.unique(A[:, columns].nonzero()[0])
+        groupMatrix = A[rows, :][:, columns].toarray()
+        solution, _, rank, singularValues = np.linalg.lstsq(groupMatrix, B[rows, :], rcond=None)
+        estimates[columns, :] = solution
+        residuals[rows, :] = groupMatrix @ solution - B[rows, :]
+        # a metabolite is under-determined if it is part of the null space of the group
+        rank = np.sum(singularValues > tol * max(singularValues[0], 1))
+        if rank < len(columns):
+            nullSpace = np.linalg.svd(groupMatrix)[2][rank:, :]
+            determined[columns] = np.linalg.norm(nullSpace, axis=0) < tol
+
+    inconsistentReactions = [reactionIDs[i] for i in np.flatnonzero(np.abs(residuals).max(axis=1) > tol)]
+    formulaDict = {}
+    for i, metID in enumerate(unknownIDs):
+        if not determined[i]:
+            continue
+        formula = ''
+        for j, ele in enumerate(elements):
+            nAtoms = estimates[i, j]
+            if nAtoms < -tol:
+                warnings.warn('the element {} is overproduced in the reactions of {} plz check it '
+                              'out'.format(ele, metID), category=UserWarning)
+            nAtoms = max(nAtoms, 0)
+            formula += '{}{}'.format(ele, round(nAtoms) if roundFormulas else round(nAtoms, 2))
+        formulaDict.update({metID: formula})
+    underDetermined = [metID for i, metID in enumerate(unknownIDs) if not determined[i]]
+    return formulaDict, underDetermined, inconsistentReactions
+
+
+def fix_missing_formulas(model, fixDict, maxIterations=10, method='iterative'):
     '''
     fixes metaboliets that don't have a formula by looking at the reaction and counting the missing elements C H and O
     this is a very rough estimation!!
@@ -796,9 +1203,32 @@ def fix_missing_formulas(model, fixDict, maxIterations=10):
     Inputs:
     model (COBRA model): model
     fixDict (Dict): dictionary with metabolites as keys and rxn IDs as values (the reaction id you want to fix the metabolite with)
+    maxIterations (int): maximum amount of passes of the iterative method
+    method (str): 'iterative' estimates the metabolites of reactions with one missing formula per pass,
+                  'least_squares' estimates all the metabolites at once with the balances of all the reactions in
+                  fixDict (see estimate_formulas_least_squares)
 
     output: model (COBRA model)
     '''
+    if method == 'least_squares':
+        estimateFormulas, underDetermined, inconsistentReactions = \
+            estimate_formulas_least_squares(model=model, reactionIDs=list(fixDict.values()))
+        if inconsistentReactions:
+            warnings.warn('the reactions {} cannot be balanced with the estimated formulas plz check them '
+                          'out'.format(inconsistentReactions), category=UserWarning)
+        notSolved = {metId: fixDict[metId] for metId in fixDict if metId in underDetermined}
+        if notSolved:
+            print(notSolved)
+            raise Exception(
+                'the above metabolite formulas could not be found, consider using a different reaction to find them')
+        # update the metabolites of the model
+        for metId in estimateFormulas:
+            model.metabolites.get_by_id(metId).formula = estimateFormulas[metId]
+        return model, estimateFormulas
+    elif method != 'iterative':
+        raise Exception("the method to fix the formulas should be 'iterative' or 'least_squares', not "
+                        "'{}'".format(method))
+
     estimateFormulas = {}
     stopCriteria = True
     iteration = 0
@@ -927,35 +1357,16 @@ def find_yield(model, substrateExchangeRxnID, productExchangeRxnID, printResults
         #solutionFVA = cobra.flux_analysis.flux_variability_analysis(model,processes= 1)
         #print(solutionFVA)
 
-
-        # get the molecular weight
-        mwSubstrate = metSubstrate.formula_weight
-        mwProduct = metProduct.formula_weight
-
-        # get the fluxes
-        fluxSubstrate = solution_pFBA[substrateExchangeRxnID] #RxnSubstrate.flux
-        fluxProduct = solution_pFBA[productExchangeRxnID] #RxnProduct.flux
-        #print(metProduct.name)
-
-        # calculate the yield of the biomass from the substrate
-        if biomass or 'biomass' in metProduct.name.lower():
-            MetabioliteName = 'Biomass'
-            if fluxSubstrate == 0 or mwSubstrate == 0:
-                ratio = 0 # if the substrate is not consumed return 0
-            else:
-                ratio = - (fluxProduct) / (fluxSubstrate * mwSubstrate * 0.001) # bio mass in g/g/h substrate in mmol/g/h
-
-        # calucalte the yield of the product from the substrate
-        else:
-            MetabioliteName = metProduct.name
-            if fluxSubstrate == 0 or mwSubstrate == 0:
-                ratio = 0 # if the substrate is not consumed return 0
-            else:
-                ratio = - (fluxProduct * mwProduct) / (fluxSubstrate * mwSubstrate)
+        ratio = yield_from_fluxes(model, fluxes=solution_pFBA.fluxes, substrateExchangeRxnID=substrateExchangeRxnID,
+                                  productExchangeRxnID=productExchangeRxnID, biomass=biomass)
 
         # print('the ratio is',ratio)
         # print('the flux of the substrate is', fluxSubstrate)
         if printResults:
+            if biomass or 'biomass' in metProduct.name.lower():
+                MetabioliteName = 'Biomass'
+            else:
+                MetabioliteName = metProduct.name
             print('the yield (g/g) of {} is: {} \n'.format(MetabioliteName, ratio))
 
     except:
@@ -965,6 +1376,323 @@ def find_yield(model, substrateExchangeRxnID, productExchangeRxnID, printResults
 
     return ratio
 
+
+def yield_from_fluxes(model, fluxes, substrateExchangeRxnID, productExchangeRxnID, biomass=False):
+    """ calculates the yield of a product from a substrate with the fluxes of a (pFBA) solution
+
+    Params:
+        model (model): GEM model
+        fluxes (pd.Series): fluxes of the solution, the index are the reaction id's
+        substrateExchangeRxnID (str): id of the exchange reaction of the substrate
+        productExchangeRxnID (str): id of the exchange reaction of the product
+        biomass (bool): if True the product is biomass (the flux of biomass is in g/gDW/h)
+
+    Returns:
+        ratio (float): the yield of the product in g/g substrate, 0 if the substrate is not consumed
+    """
+    metSubstrate = model.reactions.get_by_id(substrateExchangeRxnID).reactants[0]
+    metProduct = model.reactions.get_by_id(productExchangeRxnID).reactants[0]
+
+    # get the molecular weight
+    mwSubstrate = metSubstrate.formula_weight
+    mwProduct = metProduct.formula_weight
+
+    # get the fluxes
+    fluxSubstrate = fluxes[substrateExchangeRxnID]
+    fluxProduct = fluxes[productExchangeRxnID]
+
+    if fluxSubstrate == 0 or mwSubstrate == 0:
+        ratio = 0  # if the substrate is not consumed return 0
+    # calculate the yield of the biomass from the substrate
+    elif biomass or 'biomass' in metProduct.name.lower():
+        ratio = - (fluxProduct) / (fluxSubstrate * mwSubstrate * 0.001)  # bio mass in g/g/h substrate in mmol/g/h
+    # calucalte the yield of the product from the substrate
+    else:
+        ratio = - (fluxProduct * mwProduct) / (fluxSubstrate * mwSubstrate)
+    return ratio
+
+
+def reset_basis(model):
+    """ sets the standard (slack) basis of the GLPK problem of the model, so the next solve does not start from the
+    basis of the previous solve and its solution does not depend on the solves done before """
+    if model.solver.interface.__name__ == 'optlang.glpk_interface':
+        import swiglpk
+        swiglpk.glp_std_basis(model.solver.problem)
+
+
+def add_screening_pfba(model):
+    """ adds what pFBA needs to the model only once, so the pFBA's of many substrates can be solved on the same LP
+    (see screening_pfba): a constraint on the original objective and the objective that minimises the total flux.
+    Call it from within a model context (with model:), the constraint is removed when leaving the context
+
+    Params:
+        model (model): GEM model
+
+    Returns:
+        pfbaInfo (dict): the original objective, the constraint on the original objective and the minimal flux
+                         objective
+    """
+    originalObjective = model.solver.objective
+    fixedObjective = model.problem.Constraint(originalObjective.expression, name='fixed_objective_screening')
+    model.add_cons_vars(fixedObjective, sloppy=True)
+
+    reactionVariables = [variable for rxn in model.reactions
+                         for variable in (rxn.forward_variable, rxn.reverse_variable)]
+    minFluxObjective = model.problem.Objective(symbolics.add(reactionVariables), direction='min', sloppy=True,
+                                               name='_pfba_objective')
+    return {'originalObjective': originalObjective, 'fixedObjective': fixedObjective,
+            'minFluxObjective': minFluxObjective}
+
+
+def screening_pfba(model, pfbaInfo, reactions):
+    """ solves a pFBA on the LP of add_screening_pfba, only the bound of the original objective changes. Every LP starts
+    from the basis of the previous solve
+
+    Params:
+        model (model): GEM model
+        pfbaInfo (dict): see add_screening_pfba
+        reactions (list): the reactions of which the fluxes are returned
+
+    Returns:
+        fluxes (pd.Series): the fluxes of the reactions, raises an OptimizationError (e.g., cobra's Infeasible) if one
+                            of the two LP's is not solved to optimality
+    """
+    originalObjective = pfbaInfo['originalObjective']
+    fixedObjective = pfbaInfo['fixedObjective']
+    fixedObjective.lb, fixedObjective.ub = None, None
+    try:
+        optimum = model.slim_optimize(error_value=None, message='The objective of the pFBA can not be optimised')
+        # without an optimum the constraint on the objective would be removed and the fluxes would not be a pFBA
+        if optimum is None:
+            raise OptimizationError('The objective of the pFBA can not be optimised ({})'.format(model.solver.status))
+        if originalObjective.direction == 'max':
+            fixedObjective.lb = optimum
+        else:
+            fixedObjective.ub = optimum
+        model.solver.objective = pfbaInfo['minFluxObjective']
+        model.slim_optimize(error_value=None, message='The minimal total flux of the pFBA can not be found')
+        assert_optimal(model, message='The minimal total flux of the pFBA can not be found')
+        fluxes = get_solution(model, reactions=reactions).fluxes
+    finally:
+        model.solver.objective = originalObjective
+    return fluxes
+
+
+def find_yields(model, substrateExchangeRxnIDs, productExchangeRxnIDs, substrateBounds=None, printResults=False,
+                warmStart=False):
+    """ Finds the yields of all the products (and biomass) for a list of substrates. Only one pFBA is solved per
+    substrate, the yields of all the products are calculated from the fluxes of that solution (see find_yield to
+    get the yield of one product)
+
+    Params:
+        model (model): GEM model
+        substrateExchangeRxnIDs (list): id's of the exchange reactions of the substrates
+        productExchangeRxnIDs (list): id's of the exchange reactions of the products (biomass is recognised by its name)
+        substrateBounds (tuple): if given, the bounds of the exchange reaction of the substrate during its pFBA
+                                 (e.g., (-10, 1000)), afterwards the original bounds are set again
+        printResults (bool): prints the substrates for which no feasible solution is found
+        warmStart (bool): if True the pFBA's of all the substrates are solved on the same LP, only the bounds change
+                          and a solve starts from the basis of the previous one (see screening_pfba). Faster, but the
+                          last digits of the yields depend on the order of the substrates
+
+    Returns:
+        yieldDF (DF): yields in g/g, the rows are the substrates, the columns the products (id's of the exchange
+                      reactions). The yields are 0 if there is no feasible solution
+    """
+    yieldMatrix = np.zeros((len(substrateExchangeRxnIDs), len(productExchangeRxnIDs)))
+    # the changes to the model are undone when leaving the context
+    with model:
+        if warmStart:
+            pfbaInfo = add_screening_pfba(model)
+            fluxReactions = model.reactions.get_by_any(list(set(substrateExchangeRxnIDs) | set(productExchangeRxnIDs)))
+
+        for i, substrateID in enumerate(substrateExchangeRxnIDs):
+            rxnSubstrate = model.reactions.get_by_id(substrateID)
+            with model:
+                if substrateBounds is not None:
+                    rxnSubstrate.bounds = substrateBounds
+                try:
+                    if warmStart:
+                        fluxes = screening_pfba(model, pfbaInfo, reactions=fluxReactions)
+                    else:
+                        reset_basis(model)
+                        fluxes = cobra.flux_analysis.pfba(model).fluxes
+                    for j, productID in enumerate(productExchangeRxnIDs):
+                        yieldMatrix[i, j] = yield_from_fluxes(model, fluxes=fluxes, substrateExchangeRxnID=substrateID,
+                                                              productExchangeRxnID=productID)
+                except OptimizationError:  # e.g., an infeasible or unbounded pFBA, the yields stay 0
+                    if printResults:
+                        print('No feasible solution found for the substrate {} \n'.format(
+                            rxnSubstrate.reactants[0].name))
+
+    yieldDF = pd.DataFrame(yieldMatrix, index=list(substrateExchangeRxnIDs), columns=list(productExchangeRxnIDs))
+    return yieldDF
+
+
+def find_dead_end_metabolites(model):
+    """ finds the metabolites that can only be produced or only be consumed (given the bounds of the reactions), the
+    reactions of these metabolites can not carry flux. This is repeated until no new dead-end metabolites are found
+
+    Params:
+        model (model): GEM model
+
+    Returns:
+        deadEndMetabolites (list): id's of the dead-end metabolites
+        blockedReactions (list): id's of the reactions of the dead-end metabolites and the reactions with bounds (0, 0)
+    """
+    blockedReactions = {rxn.id for rxn in model.reactions if rxn.lower_bound == 0 and rxn.upper_bound == 0}
+    deadEndMetabolites = []
+    newDeadEnds = True
+    while newDeadEnds:
+        newDeadEnds = False
+        for met in model.metabolites:
+            if met.id in deadEndMetabolites:
+                continue
+            canBeProduced = False
+            canBeConsumed = False
+            for rxn in met.reactions:
+                if rxn.id in blockedReactions:
+                    continue
+                coef = rxn.metabolites[met]
+                if (coef > 0 and rxn.upper_bound > 0) or (coef < 0 and rxn.lower_bound < 0):
+                    canBeProduced = True
+                if (coef < 0 and rxn.upper_bound > 0) or (coef > 0 and rxn.lower_bound < 0):
+                    canBeConsumed = True
+            if not (canBeProduced and canBeConsumed):
+                deadEndMetabolites.append(met.id)
+                blockedReactions.update(rxn.id for rxn in met.reactions)
+                newDeadEnds = True
+    return deadEndMetabolites, sorted(blockedReactions)
+
+
+def reduce_model(model, openExchangeRxnIDs=None, openBounds=(-10, 1000), keepReactionIDs=None, processes=None,
+                 sbmlFile=None):
+    """ removes the reactions that can not carry flux for a given medium: the current bounds of the model with the
+    exchange reactions of openExchangeRxnIDs opened. First the dead-end metabolites are removed (see
+    find_dead_end_metabolites), then the other blocked reactions are found with FVA (in parallel). The fluxes of the
+    remaining reactions can be the same as in the full model, so the yields of the reduced model are the same for every
+    medium that is part of the given medium (e.g., one substrate of openExchangeRxnIDs opened at a time)
+
+    Params:
+        model (model): GEM model (it is not changed)
+        openExchangeRxnIDs (list): id's of the exchange reactions that are opened (e.g., all the candidate substrates)
+        openBounds (tuple): bounds of the opened exchange reactions
+        keepReactionIDs (list): id's of reactions that are never removed (e.g., the exchange reactions of the products)
+        processes (int): amount of processes of the FVA, if None the amount of cores
+        sbmlFile (str): name or location of the SBML file of the model, if given the reduced model is saved next to
+                        it. It is used again while the xml file, the bounds of the reactions, the objective and the
+                        arguments are the same
+
+    Returns:
+        reducedModel (model): copy of the model without the blocked reactions and the metabolites that are left over
+        reductionInfo (dict): the blocked reactions and the dead-end metabolites
+    """
+    if openExchangeRxnIDs is None:
+        openExchangeRxnIDs = []
+    if keepReactionIDs is None:
+        keepReactionIDs = []
+
+    cacheLocation = None
+    if sbmlFile is not None:
+        # the reduced model is only valid for the same full model (xml file, objective and bounds) and arguments
+        location = get_sbml_location(sbmlFile)
+        fileStamp = get_file_stamp(location)
+        cacheInputs = {'objective': str(model.objective.expression), 'direction': model.objective.direction,
+                       'bounds': [(rxn.id, rxn.lower_bound, rxn.upper_bound) for rxn in model.reactions],
+                       'openExchangeRxnIDs': sorted(openExchangeRxnIDs), 'openBounds': tuple(openBounds),
+                       'keepReactionIDs': sorted(keepReactionIDs)}
+        cacheKey = hashlib.sha256(repr(cacheInputs).encode()).hexdigest()[:16]
+        cacheLocation = '{}_reduced_{}.pkl'.format(os.path.splitext(location)[0], cacheKey)
+        cache = load_pickle_cache(cacheLocation, location, fileStamp, inputs=cacheInputs)
+        if cache is not None:
+            return cache['model'], cache['info']
+
+    with model:
+        for rxnId in openExchangeRxnIDs:
+            model.reactions.get_by_id(rxnId).bounds = openBounds
+        deadEndMetabolites, deadEndReactions = find_dead_end_metabolites(model)
+        deadEndReactions = set(deadEndReactions)
+        otherReactions = [rxn for rxn in model.reactions if rxn.id not in deadEndReactions]
+        fvaBlocked = cobra.flux_analysis.find_blocked_reactions(model, reaction_list=otherReactions,
+                                                                 processes=processes)
+
+    blockedReactions = sorted((deadEndReactions | set(fvaBlocked)) - set(keepReactionIDs))
+    reducedModel = model.copy()
+    reducedModel.remove_reactions(blockedReactions, remove_orphans=True)
+    reductionInfo = {'blocked_reactions': blockedReactions, 'dead_end_metabolites': deadEndMetabolites,
+                     'reactions': len(reducedModel.reactions), 'reactions_full_model': len(model.reactions),
+                     'metabolites': len(reducedModel.metabolites), 'metabolites_full_model': len(model.metabolites)}
+
+    if cacheLocation is not None:
+        save_pickle_cache(cacheLocation, {'model': reducedModel, 'info': reductionInfo}, location, fileStamp,
+                          inputs=cacheInputs)
+    return reducedModel, reductionInfo
+
+
+def get_candidate_substrates(model, exchangeRxns):
+    """ filters the exchange reactions of which the metabolite can be a substrate: the metabolite has at least 2
+    carbons, is not a protein and is not biomass
+
+    Params:
+        model (model): GEM model
+        exchangeRxns (list): exchange reactions (objects or id's)
+
+    Returns:
+        candidateRxnIDs (list): id's of the exchange reactions of the candidate substrates
+    """
+    candidateRxnIDs = []
+    for rxnExch in exchangeRxns:
+        if isinstance(rxnExch, str):
+            rxnExch = model.reactions.get_by_id(rxnExch)  # get rxn object from the model if a list of strings
+        substrateMetabolite = rxnExch.reactants[0]
+        nCarbon = count_atom_in_formula(substrateMetabolite, atom='C')
+        proteinCheck = is_protein_met(metabolite=substrateMetabolite)
+        if nCarbon >= 2 and not proteinCheck and substrateMetabolite.name.lower() != 'biomass':
+            candidateRxnIDs.append(rxnExch.id)
+    return candidateRxnIDs
+
+
+def yields_above_tolerance(model, yieldDF, productExchRxnIDs, yieldTol=None):
+    """ selects the substrates of the yield matrix (see find_yields) of which the yields of all the products are above
+    their tolerance (and smaller than 1)
+
+    Params:
+        model (model): GEM model
+        yieldDF (DF): yields in g/g, the rows are the substrates, the columns the products
+        productExchRxnIDs (list): id's of the exchange reactions of the products
+        yieldTol (dict): {product exchange reaction id: minimum yield}, products that are not given have a tolerance
+                         of 0
+
+    Returns:
+        yieldDict (dict): {substrate name: {product name: yield}}
+    """
+    if yieldTol is None:
+        yieldTol = {}
+
+    yieldDict = {}
+    for rxnId, productYields in yieldDF.iterrows():
+        substrateName = model.reactions.get_by_id(rxnId).reactants[0].name
+        productCoefDict = {}
+
+        # check if all products are above the tolerance
+        allAboveTol = True
+        for prodId in productExchRxnIDs:  # loop over all the products
+            productName = model.reactions.get_by_id(prodId).reactants[0].name
+            FBA_yield = productYields[prodId]
+            tolerance = yieldTol.get(prodId, 0)
+
+            # check if the yield is above the given tolerance
+            if FBA_yield >= tolerance and FBA_yield < 1:  # bigger than the tolerance and smaller then 1
+                productCoefDict.update({productName: float(FBA_yield)})  # already in g/g
+            else:
+                allAboveTol = False
+
+        # if all the products are above the tolerance then add the substrate to the list
+        if allAboveTol:
+            yieldDict.update({substrateName: productCoefDict})
+    return yieldDict
+
+
 def is_protein_met(metabolite):
     """ checks if the given metaboltie is a protein base on the chemical formula"""
     elements = ['C', 'N', 'H', 'O']
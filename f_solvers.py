@@ -0,0 +1,467 @@
+"""
+Solver backends to solve the superstructure
+
+The superstructure can be solved with GAMS (as before) or with locally installed (open-source) solvers: HiGHS, CBC,
+GLPK (through swiglpk), Ipopt, Bonmin and Couenne. Models with (untransformed) disjunctions are solved with GDPopt. Each backend has its own mapping of the general options (time limit
+and optimality gap), and the fastest available backend for the problem class (LP, MILP, NLP or MINLP) of a model can be
+chosen automatically.
+"""
+
+import os
+import shutil
+import time
+import pyomo.environ as pe
+import pyomo.opt as po
+from pyomo.opt import SolverResults, SolverStatus, TerminationCondition, Solution
+from pyomo.repn import generate_standard_repn
+from pyomo.gdp import Disjunction
+
+GAMS_PATH = r"C:\Program Files\GAMS\44\gams.exe"
+
+# capabilities and option names of every backend
+# pyomoName: name of the solver in the pyomo SolverFactory
+# executable: executable that needs to be found for the backend to be available (None if it is a python package)
+# problemClasses: problem classes the backend can solve
+# timeLimit / gap: name of the option of the solver for the time limit (s) and the relative optimality gap
+SOLVER_BACKENDS = {
+    'highs': {'pyomoName': 'appsi_highs', 'executable': None, 'problemClasses': ['LP', 'MILP'],
+              'timeLimit': None, 'gap': 'mip_rel_gap'},  # the time limit is passed on as argument of solve
+    'glpk': {'pyomoName': None, 'executable': None, 'problemClasses': ['LP', 'MILP'],
+             'timeLimit': 'tm_lim', 'gap': 'mip_gap'},  # solved with swiglpk (see solve_with_swiglpk)
+    'cbc': {'pyomoName': 'cbc', 'executable': 'cbc', 'problemClasses': ['LP', 'MILP'],
+            'timeLimit': 'sec', 'gap': 'ratio'},
+    'ipopt': {'pyomoName': 'ipopt', 'executable': 'ipopt', 'problemClasses': ['LP', 'NLP'],
+              'timeLimit': 'max_cpu_time', 'gap': None},
+    'bonmin': {'pyomoName': 'bonmin', 'executable': 'bonmin', 'problemClasses': ['LP', 'MILP', 'NLP', 'MINLP'],
+               'timeLimit': 'bonmin.time_limit', 'gap': 'bonmin.allowable_fraction_gap'},
+    'couenne': {'pyomoName': 'couenne', 'executable': 'couenne', 'problemClasses': ['LP', 'MILP', 'NLP', 'MINLP'],
+                'timeLimit': 'time_limit', 'gap': 'allowable_fraction_gap'},
+    'gams': {'pyomoName': 'gams', 'executable': 'gams', 'problemClasses': ['LP', 'MILP', 'NLP', 'MINLP'],
+             'timeLimit': 'reslim', 'gap': 'optcr'},
+    'gdpopt': {'pyomoName': 'gdpopt.loa', 'executable': None, 'problemClasses': ['GDP'],
+               'timeLimit': 'time_limit', 'gap': None},  # logic-based outer approximation, uses a MILP and NLP solver
+}
+
+# order in which the backends are chosen for each problem class (fastest first)
+SOLVER_PREFERENCE = {
+    'LP': ['highs', 'glpk', 'cbc', 'gams', 'ipopt', 'bonmin', 'couenne'],
+    'MILP': ['highs', 'cbc', 'gams', 'glpk', 'bonmin', 'couenne'],
+    'NLP': ['ipopt', 'gams', 'bonmin', 'couenne'],
+    'MINLP': ['gams', 'bonmin', 'couenne'],
+    'GDP': ['gdpopt'],
+}
+
+
+# ============================================================================================================
+# Capability probe
+# ============================================================================================================
+
+def get_gams_executable():
+    """ returns the GAMS executable, the default installation path on windows or the one found in the PATH """
+    if os.path.isfile(GAMS_PATH):
+        return GAMS_PATH
+    return shutil.which('gams')
+
+
+def is_backend_available(backend):
+    """ checks if a solver backend is installed
+
+    Params:
+        backend (str): name of the backend (see SOLVER_BACKENDS)
+
+    Returns:
+        available (bool)
+    """
+    if backend not in SOLVER_BACKENDS:
+        raise Exception("The solver backend '{}' does not exist, choose one of: {}".format(backend,
+                                                                                         list(SOLVER_BACKENDS.keys())))
+    if backend == 'glpk':
+        try:
+            import swiglpk
+            return True
+        except ImportError:
+            return False
+    if backend == 'gams':
+        return get_gams_executable() is not None
+
+    backendInfo = SOLVER_BACKENDS[backend]
+    # avoid creating solvers of which the executable does not exist (pyomo prints warnings)
+    if backendInfo['executable'] and shutil.which(backendInfo['executable']) is None:
+        return False
+    try:
+        return bool(po.SolverFactory(backendInfo['pyomoName']).available(exception_flag=False))
+    except Exception:
+        return False
+
+
+def get_available_backends():
+    """ returns a dictionary {backend: problem classes it can solve} of all the installed solver backends """
+    return {backend: SOLVER_BACKENDS[backend]['problemClasses'] for backend in SOLVER_BACKENDS
+            if is_backend_available(backend)}
+
+
+def get_problem_class(model):
+    """ determines the problem class of a pyomo model by looking at the active constraints and objective
+
+    Params:
+        model (pyomo model): the model
+
+    Returns:
+        problemClass (str): 'LP', 'MILP', 'NLP', 'MINLP' or 'GDP' (if the model has disjunctions)
+    """
+    for _ in model.component_data_objects(Disjunction, active=True, descend_into=True):
+        return 'GDP'
+
+    nonlinear = False
+    discrete = False
+    expressions = [c.body for c in model.component_data_objects(pe.Constraint, active=True, descend_into=True)]
+    expressions += [o.expr for o in model.component_data_objects(pe.Objective, active=True, descend_into=True)]
+    for expr in expressions:
+        degree = expr.polynomial_degree() if hasattr(expr, 'polynomial_degree') else 0
+        if degree is None or degree > 1:
+            nonlinear = True
+            break
+
+    for var in model.component_data_objects(pe.Var, descend_into=True):
+        if not var.fixed and var.is_integer():
+            discrete = True
+            break
+
+    if nonlinear:
+        return 'MINLP' if discrete else 'NLP'
+    return 'MILP' if discrete else 'LP'
+
+
+def select_backend(model=None, problemClass=None):
+    """ picks the fastest installed backend for the problem class of the model
+
+    Params:
+        model (pyomo model): the model to solve (used to determine the problem class)
+        problemClass (str): 'LP', 'MILP', 'NLP', 'MINLP' or 'GDP' (if not given it is determined from the model)
+
+    Returns:
+        backend (str): name of the backend
+    """
+    if problemClass is None:
+        if model is None:
+            raise Exception('Give a model or a problem class to select a solver backend')
+        problemClass = get_problem_class(model)
+    if problemClass not in SOLVER_PREFERENCE:
+        raise Exception("The problem class '{}' does not exist, choose 'LP', 'MILP', 'NLP', 'MINLP' or 'GDP'".format(
+            problemClass))
+
+    for backend in SOLVER_PREFERENCE[problemClass]:
+        if is_backend_available(backend):
+            return backend
+    raise Exception("No solver is installed that can solve a {} problem, install one of: {}".format(
+        problemClass, SOLVER_PREFERENCE[problemClass]))
+
+
+# ============================================================================================================
+# Solving
+# ============================================================================================================
+
+def map_solver_options(backend, timeLimit=None, gap=None, solverOptions=None):
+    """ translates the general options to the option names of the backend
+
+    Params:
+        backend (str): name of the backend
+        timeLimit (float): maximum solve time in seconds
+        gap (float): relative optimality gap
+        solverOptions (dict): extra options passed on to the solver as they are
+
+    Returns:
+        options (dict): options of the solver
+    """
+    backendInfo = SOLVER_BACKENDS[backend]
+    options = {}
+    if timeLimit is not None and backendInfo['timeLimit']:
+        options.update({backendInfo['timeLimit']: timeLimit})
+    if gap is not None and backendInfo['gap']:
+        options.update({backendInfo['gap']: gap})
+    if solverOptions:
+        options.update(solverOptions)
+    return options
+
+
+# termination conditions of a solve without a solution to read from the model
+NO_SOLUTION_CONDITIONS = (TerminationCondition.infeasible, TerminationCondition.infeasibleOrUnbounded,
+                          TerminationCondition.unbounded, TerminationCondition.invalidProblem,
+                          TerminationCondition.noSolution, TerminationCondition.solverFailure,
+                          TerminationCondition.internalSolverError, TerminationCondition.error,
+                          TerminationCondition.licensingProblems)
+
+
+def has_solution(results):
+    """ returns True if the solve found a solution (the values of the variables can be read from the model). A solver
+    stopped by a limit (e.g., maxTimeLimit) only has a solution if it found one before it stopped, the solutions that
+    are loaded in the model are kept in the results (see solve_with_backend) """
+    if results.solver.termination_condition in NO_SOLUTION_CONDITIONS:
+        return False
+    return len(results.solution) > 0
+
+
+def get_solve_status(results):
+    """ returns the status of a solve as a string (the termination condition). Only a problem that is proven to be
+    infeasible gets the status 'infeasible', a problem the solver could not tell apart from an unbounded one gets the
+    status 'infeasibleOrUnbounded' (e.g., a relaxation of the superstructure without its nonlinear constraints) """
+    return str(results.solver.termination_condition)
+
+
+def solve_with_backend(model, backend, solverType=None, timeLimit=None, gap=None, solverOptions=None, tee=False):
+    """ solves a model with one of the solver backends
+
+    Params:
+        model (pyomo model): the model to solve
+        backend (str): name of the backend (see SOLVER_BACKENDS)
+        solverType (str): only for GAMS, the solver GAMS should use e.g., 'BARON', 'ANTIGONE', 'CPLEX', 'DICOPT'
+        timeLimit (float): maximum solve time in seconds
+        gap (float): relative optimality gap
+        solverOptions (dict): extra options passed on to the solver
+        tee (bool): print the log of the solver
+
+    Returns:
+        results (SolverResults): results of the solver, results.solution holds the solution loaded in the model (empty
+                                 if there is none)
+    """
+    if not is_backend_available(backend):
+        raise Exception("The solver backend '{}' is not installed, the installed backends are: {}".format(
+            backend, list(get_available_backends().keys())))
+    options = map_solver_options(backend, timeLimit, gap, solverOptions)
+
+    if backend == 'glpk':
+        return solve_with_swiglpk(model, options=options, tee=tee)
+
+    elif backend == 'gams':
+        opt = po.SolverFactory('gams', executable=get_gams_executable())
+        addOptions = ['option {}={};'.format(key, value) for key, value in options.items()]
+        if solverType is None:
+            results = opt.solve(model, keepfiles=True, tee=tee, add_options=addOptions, load_solutions=False)
+        else:
+            try:
+                results = opt.solve(model, solver=solverType, keepfiles=True, tee=tee, add_options=addOptions,
+                                    load_solutions=False)
+            except:
+                raise Exception("The solverType '{}' is invalid, check the spelling \n possible solvers are: "
+                                "'BARON', 'ANTIGONE', 'CPLEX', 'DICOPT'".format(solverType))
+        return load_solution(model, results)
+
+    elif backend == 'highs':
+        opt = po.SolverFactory(SOLVER_BACKENDS[backend]['pyomoName'])
+        # HiGHS raises an error if there is no solution to load, an infeasible model should just give its status
+        results = opt.solve(model, tee=tee, timelimit=timeLimit, options=options, load_solutions=False)
+        return load_solution(model, results)
+
+    elif backend == 'gdpopt':
+        # the subproblems (MILP master problems and NLP subproblems) are solved by the other backends
+        subSolvers = {}
+        for problemClass, solverArgument in [('MILP', 'mip_solver'), ('NLP', 'nlp_solver')]:
+            for subBackend in SOLVER_PREFERENCE[problemClass]:
+                if SOLVER_BACKENDS[subBackend]['pyomoName'] and subBackend != 'gams' \
+                        and is_backend_available(subBackend):
+                    subSolvers.update({solverArgument: SOLVER_BACKENDS[subBackend]['pyomoName']})
+                    break
+        if 'mip_solver' not in subSolvers:
+            raise Exception('GDPopt needs a MILP solver, install one of: {}'.format(SOLVER_PREFERENCE['MILP']))
+        # the LOA of GDPopt returns the minimum of a maximisation problem, so the maximisation is solved as the
+        # minimisation of minus the objective
+        maximisedObjectives = [(objective, objective.expr) for objective in
+                               model.component_data_objects(pe.Objective, active=True)
+                               if objective.sense == pe.maximize]
+        for objective, expression in maximisedObjectives:
+            objective.set_value(-expression)
+            objective.sense = pe.minimize
+        try:
+            opt = po.SolverFactory(SOLVER_BACKENDS[backend]['pyomoName'])
+            results = opt.solve(model, tee=tee, **subSolvers, **options)
+            # GDPopt loads its best solution in the model, it has one if the (minimised) objective has a primal bound
+            upperBound = results.problem.upper_bound
+            if upperBound is not None and abs(upperBound) != float('inf'):
+                results.solution.insert(Solution())
+            return results
+        finally:
+            for objective, expression in maximisedObjectives:
+                objective.set_value(expression)
+                objective.sense = pe.maximize
+
+    else:  # solvers called through the command line (cbc, ipopt, bonmin, couenne)
+        opt = po.SolverFactory(SOLVER_BACKENDS[backend]['pyomoName'])
+        for key, value in options.items():
+            opt.options[key] = value
+        results = opt.solve(model, tee=tee, load_solutions=False)
+        return load_solution(model, results)
+
+
+def load_solution(model, results):
+    """ loads the solution of the results in the model (if the solver found one), the solution stays in the results
+    so has_solution can check that there is one """
+    if len(results.solution) > 0:
+        model.solutions.load_from(results)
+    return results
+
+
+def solve_with_swiglpk(model, options=None, tee=False):
+    """ solves a linear model (LP or MILP) with GLPK through its python bindings (swiglpk), the solution is loaded
+    in the model
+
+    Params:
+        model (pyomo model): linear model to solve
+        options (dict): tm_lim (s), mip_gap and any other field of the glpk control parameters
+        tee (bool): print the log of glpk
+
+    Returns:
+        results (SolverResults): results of the solver
+    """
+    import swiglpk as glp
+
+    if options is None:
+        options = {}
+    startTime = time.time()
+
+    # columns (variables)
+    columns = {}
+    variables = []
+
+    def get_column(var):
+        if id(var) not in columns:
+            variables.append(var)
+            columns.update({id(var): len(variables)})  # glpk is 1-based
+        return columns[id(var)]
+
+    # rows (constraints)
+    rows = []
+    for con in model.component_data_objects(pe.Constraint, active=True, descend_into=True):
+        repn = generate_standard_repn(con.body)
+        if not repn.is_linear():
+            raise Exception("The constraint '{}' is not linear, GLPK can only solve LP and MILP models".format(
+                con.name))
+        # swiglpk only takes python floats (not e.g., numpy.int64 of the integer stoichiometries)
+        coefs = [(get_column(v), float(c)) for v, c in zip(repn.linear_vars, repn.linear_coefs)]
+        lower = float(pe.value(con.lower) - repn.constant) if con.has_lb() else None
+        upper = float(pe.value(con.upper) - repn.constant) if con.has_ub() else None
+        rows.append((coefs, lower, upper))
+
+    objectives = list(model.component_data_objects(pe.Objective, active=True, descend_into=True))
+    if len(objectives) != 1:
+        raise Exception('The model should have exactly one active objective, not {}'.format(len(objectives)))
+    objective = objectives[0]
+    objectiveRepn = generate_standard_repn(objective.expr)
+    if not objectiveRepn.is_linear():
+        raise Exception('The objective is not linear, GLPK can only solve LP and MILP models')
+    objectiveCoefs = [(get_column(v), float(c)) for v, c in
+                      zip(objectiveRepn.linear_vars, objectiveRepn.linear_coefs)]
+
+    # build the glpk problem
+    lp = glp.glp_create_prob()
+    glp.glp_set_obj_dir(lp, glp.GLP_MAX if objective.sense == pe.maximize else glp.GLP_MIN)
+    glp.glp_add_cols(lp, len(variables))
+    isMIP = False
+    for j, var in enumerate(variables, start=1):
+        lb, ub = var.lb, var.ub
+        glp.glp_set_col_bnds(lp, j, *get_glpk_bounds(glp, lb, ub))
+        if var.is_integer():
+            isMIP = True
+            glp.glp_set_col_kind(lp, j, glp.GLP_IV)
+    for j, c in objectiveCoefs:
+        glp.glp_set_obj_coef(lp, j, glp.glp_get_obj_coef(lp, j) + c)
+    glp.glp_set_obj_coef(lp, 0, float(pe.value(objectiveRepn.constant)))
+
+    nonZeros = sum(len(coefs) for coefs, lower, upper in rows)
+    if rows:
+        glp.glp_add_rows(lp, len(rows))
+    ia = glp.intArray(nonZeros + 1)
+    ja = glp.intArray(nonZeros + 1)
+    ar = glp.doubleArray(nonZeros + 1)
+    k = 0
+    for i, (coefs, lower, upper) in enumerate(rows, start=1):
+        glp.glp_set_row_bnds(lp, i, *get_glpk_bounds(glp, lower, upper))
+        for j, c in coefs:
+            k += 1
+            ia[k], ja[k], ar[k] = i, j, c
+    glp.glp_load_matrix(lp, nonZeros, ia, ja, ar)
+
+    # solve
+    messageLevel = glp.GLP_MSG_ON if tee else glp.GLP_MSG_OFF
+    timeLimit = options.get('tm_lim')
+    if isMIP:
+        parm = glp.glp_iocp()
+        glp.glp_init_iocp(parm)
+        parm.presolve = glp.GLP_ON
+        parm.msg_lev = messageLevel
+        if timeLimit is not None:
+            parm.tm_lim = int(timeLimit * 1000)  # in ms
+        for key, value in options.items():
+            if key != 'tm_lim':
+                setattr(parm, key, value)
+        returnCode = glp.glp_intopt(lp, parm)
+        status = glp.glp_mip_status(lp)
+    else:
+        parm = glp.glp_smcp()
+        glp.glp_init_smcp(parm)
+        parm.presolve = glp.GLP_ON
+        parm.msg_lev = messageLevel
+        if timeLimit is not None:
+            parm.tm_lim = int(timeLimit * 1000)  # in ms
+        for key, value in options.items():
+            if key not in ('tm_lim', 'mip_gap'):
+                setattr(parm, key, value)
+        returnCode = glp.glp_simplex(lp, parm)
+        status = glp.glp_get_status(lp)
+
+    # translate the status
+    results = SolverResults()
+    results.solver.name = 'glpk (swiglpk)'
+    results.solver.wallclock_time = time.time() - startTime
+    solutionFound = status in (glp.GLP_OPT, glp.GLP_FEAS)
+    if status == glp.GLP_OPT:
+        results.solver.status = SolverStatus.ok
+        results.solver.termination_condition = TerminationCondition.optimal
+    elif returnCode == glp.GLP_ETMLIM:
+        results.solver.status = SolverStatus.aborted
+        results.solver.termination_condition = TerminationCondition.maxTimeLimit
+    elif status == glp.GLP_FEAS:
+        results.solver.status = SolverStatus.ok
+        results.solver.termination_condition = TerminationCondition.feasible
+    elif status == glp.GLP_NOFEAS or returnCode == glp.GLP_ENOPFS:
+        # the presolver of glpk detects an infeasible problem by its return code
+        results.solver.status = SolverStatus.warning
+        results.solver.termination_condition = TerminationCondition.infeasible
+    elif status == glp.GLP_UNBND:
+        results.solver.status = SolverStatus.warning
+        results.solver.termination_condition = TerminationCondition.unbounded
+    elif returnCode == glp.GLP_ENODFS:
+        # no dual feasible solution: the problem is unbounded or infeasible, the presolver does not tell which one
+        results.solver.status = SolverStatus.warning
+        results.solver.termination_condition = TerminationCondition.infeasibleOrUnbounded
+    else:
+        results.solver.status = SolverStatus.error
+        results.solver.termination_condition = TerminationCondition.error
+
+    # load the solution in the model
+    if solutionFound:
+        for j, var in enumerate(variables, start=1):
+            value = glp.glp_mip_col_val(lp, j) if isMIP else glp.glp_get_col_prim(lp, j)
+            var.set_value(value, skip_validation=True)
+        objectiveValue = glp.glp_mip_obj_val(lp) if isMIP else glp.glp_get_obj_val(lp)
+        results.problem.lower_bound = objectiveValue
+        results.problem.upper_bound = objectiveValue
+        results.solution.insert(Solution())  # the solution is loaded in the model (see has_solution)
+
+    glp.glp_delete_prob(lp)
+    return results
+
+
+def get_glpk_bounds(glp, lower, upper):
+    """ returns the type of bound of glpk and the bounds (glpk ignores the bounds that are not used) """
+    # swiglpk only takes python floats
+    lower = None if lower is None else float(lower)
+    upper = None if upper is None else float(upper)
+    if lower is None and upper is None:
+        return glp.GLP_FR, 0.0, 0.0
+    if upper is None:
+        return glp.GLP_LO, lower, 0.0
+    if lower is None:
+        return glp.GLP_UP, 0.0, upper
+    if lower == upper:
+        return glp.GLP_FX, lower, upper
+    return glp.GLP_DB, lower, upper
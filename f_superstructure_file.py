@@ -0,0 +1,502 @@
+"""
+Text files (json, yaml or toml) to define a superstructure instead of the Excel file
+
+The text file has the same information as the sheets of the Excel file, but the string formats inside the cells are
+written as typed fields: the interval bounds '[0,10e6]' as [0, 10000000.0], the operation bounds "{'pH':[5,8.5]}" as a
+dictionary, the separation coefficients '[1,0];[0,1]' as a list of lists, the comma separated names as lists and the
+codes of the connection matrix ('y_acidi', 'sep1', 'sep1_split') as connections. The file is checked with a compiled
+schema (see validate_superstructure_definition) and turned into the sheets of the Excel file, so the superstructure is
+built with the same functions (see load_excel_superstructure in f_make_super_structure).
+
+    {'format': 'alquimia superstructure', 'version': 1,
+     'input_output_intervals': [{'name': 'carbon_source', 'lower_bound': 1000, 'input_price': 'inputs_v2.json', ...}],
+     'process_intervals': [{'name': 'P_acidi', 'interval_bounds': [0, 10000000.0], 'inputs': 'inputs_v2.json',
+                            'outputs': ['ace', 'prop', 'water', 'bm'], 'seperation_coef': [[1, 1, 1, 0], [0, 0, 0, 1]],
+                            ...}],
+     'economic_parameters': [{'name': 'P_acidi', 'ut_energy_price': 0.22, ...}],
+     'models': [{'name': 'v2_PAC.json', 'SBML_output_ID': 'Ex_S_cpd00141_ext, Ex_S_cpd00029_ext', ...}],
+     'abbreviations': {'glu': 'glucose', ...},
+     'connection_matrix': {'intervals': ['carbon_source', 'P_acidi', ..., 'waste'],
+                           'booleans': {'P_acidi': 'y_acidi', ...},
+                           'connections': [{'from': 'P_acidi', 'to': 'liq_liq_ext', 'stream': 'sep1'}, ...]},
+     'layout': {'process_intervals': ['process_intervals', 'layer ', 'interval_bounds', ...], ...}}
+
+The layout (the columns of the sheets) is optional, it is written when an Excel file is converted so the Excel file can
+be made again with the same columns. Sheets of the Excel file that are not used for the superstructure are not kept.
+"""
+
+import ast
+import json
+import os
+import re
+import numpy as np
+import pandas as pd
+
+# extensions of the text files of a superstructure
+SUPERSTRUCTURE_FILE_EXTENSIONS = ('.json', '.yaml', '.yml', '.toml')
+
+# column with the name of the interval (or model) of every sheet, it is the field 'name' in the text file
+SHEET_NAME_COLUMNS = {'input_output_intervals': 'process_intervals',
+                      'process_intervals': 'process_intervals',
+                      'economic_parameters': 'process_intervals',
+                      'models': 'model_name'}
+
+# columns of the Excel file written as a string and their type in the text file
+TYPED_COLUMNS = {'input_output_intervals': {'components': 'names',
+                                            'composition': 'fractions'},
+                 'process_intervals': {'interval_bounds': 'bounds',
+                                       'inputs': 'names',
+                                       'outputs': 'names',
+                                       'ut_chemical': 'names',
+                                       'operation_bounds': 'bounds_dict',
+                                       'seperation_coef': 'coefficients',
+                                       'stream_reuse': 'names_dict',
+                                       'waste_fraction': 'numbers'}}
+
+# fields of the records of every section {section: {field: (type, required)}}, other fields are kept as they are
+# (numbers, strings or None)
+SUPERSTRUCTURE_SCHEMA = {
+    'input_output_intervals': {'name': ('name', True),
+                               'lower_bound': ('number', True),
+                               'upper_bound': ('number_or_none', False),
+                               'input_price': ('number_or_file', True),
+                               'output_price': ('number', True),
+                               'components': ('names', True),
+                               'composition': ('fractions', True)},
+    'process_intervals': {'name': ('name', True),
+                          'interval_bounds': ('bounds', True),
+                          'inputs': ('names', True),
+                          'outputs': ('names', True),
+                          'ut_chemical': ('names', False),
+                          'operation_bounds': ('bounds_dict', False),
+                          'seperation_coef': ('coefficients', False),
+                          'energy_consumption': ('number', True),
+                          'stream_reuse': ('names_dict', False),
+                          'waste_fraction': ('numbers', False)},
+    'economic_parameters': {'name': ('name', True),
+                            'ut_chem_price': ('number', True),
+                            'ut_energy_price': ('number', True),
+                            'waste_price': ('number', True)},
+    'models': {'name': ('name', True)}
+}
+
+# the codes of the connection matrix that are not a boolean: 'sep1', 'sep1_split' or 'split'
+CONNECTION_CODE = re.compile(r'^(sep\d+)?_?(split)?$')
+
+# validator made from SUPERSTRUCTURE_SCHEMA (see compile_superstructure_schema)
+_compiledSchema = None
+
+
+# ============================================================================================================
+# Schema of the text file
+# ============================================================================================================
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_name(value):
+    return isinstance(value, str) and bool(value.strip())
+
+
+# checks of the types of the fields {type: (check function, description for the error message)}
+FIELD_TYPES = {
+    'name': (is_name, 'a name'),
+    'number': (is_number, 'a number'),
+    'number_or_none': (lambda value: value is None or is_number(value), 'a number or empty'),
+    'number_or_file': (lambda value: is_number(value) or (is_name(value) and value.endswith('.json')),
+                       'a number or the name of a json file'),
+    'scalar': (lambda value: value is None or is_number(value) or isinstance(value, str),
+               'a number, a string or empty'),
+    'bounds': (lambda value: isinstance(value, list) and len(value) == 2 and all(is_number(v) for v in value),
+               'a list with the lower and upper bound'),
+    'bounds_dict': (lambda value: isinstance(value, dict) and all(
+        is_name(key) and (is_number(v) or isinstance(v, list) and all(is_number(b) for b in v))
+        for key, v in value.items()), "a dictionary {'var1': [lb, ub], ...}"),
+    'coefficients': (lambda value: isinstance(value, list) and bool(value) and all(
+        isinstance(row, list) and all(is_number(v) for v in row) for row in value),
+                     'a list of lists of separation coefficients'),
+    'names': (lambda value: (is_name(value) and value.endswith('.json'))
+                            or (isinstance(value, list) and bool(value) and all(is_name(v) for v in value)),
+              'a list of names or the name of a json file'),
+    'names_dict': (lambda value: isinstance(value, dict) and all(is_name(k) and is_name(v) for k, v in value.items()),
+                   "a dictionary {'name': 'name', ...}"),
+    'fractions': (lambda value: is_number(value) or (isinstance(value, list) and all(is_number(v) for v in value)),
+                  'a number or a list of fractions'),
+    'numbers': (lambda value: isinstance(value, list) and all(is_number(v) for v in value), 'a list of numbers'),
+}
+
+
+def compile_superstructure_schema(schema=None):
+    """ turns the schema into a list of checks per section, so the schema is only read once
+
+    Returns:
+        compiledSchema (dict): {section: (checks of the fields [(field, required, check, description)], check of the
+                               other fields)}
+    """
+    if schema is None:
+        schema = SUPERSTRUCTURE_SCHEMA
+    compiledSchema = {}
+    for section, fields in schema.items():
+        checks = []
+        for field, (fieldType, required) in fields.items():
+            check, description = FIELD_TYPES[fieldType]
+            checks.append((field, required, check, description))
+        compiledSchema.update({section: (checks, FIELD_TYPES['scalar'])})
+    return compiledSchema
+
+
+def validate_superstructure_definition(definition):
+    """ checks the fields of the text file of a superstructure (see SUPERSTRUCTURE_SCHEMA) and the names used in the
+    connection matrix, the checks of the Excel file are done after (see check_excel_sheets)
+    """
+    global _compiledSchema
+    if _compiledSchema is None:
+        _compiledSchema = compile_superstructure_schema()
+
+    if not isinstance(definition, dict):
+        raise Exception('The superstructure file should contain a dictionary, not a {}'.format(type(definition)))
+    missingSections = [section for section in list(_compiledSchema) + ['abbreviations', 'connection_matrix']
+                       if section not in definition]
+    if missingSections:
+        raise Exception('The superstructure file is missing the sections: {}'.format(missingSections))
+
+    for section, (checks, (checkOther, descriptionOther)) in _compiledSchema.items():
+        records = definition[section]
+        if not isinstance(records, list):
+            raise Exception("The section '{}' should be a list of records".format(section))
+        names = []
+        for i, record in enumerate(records):
+            if not isinstance(record, dict):
+                raise Exception("Record {} of the section '{}' is not a dictionary".format(i + 1, section))
+            name = record.get('name', 'record {}'.format(i + 1))
+            for field, required, check, description in checks:
+                value = record.get(field)
+                if value is None:
+                    if required:
+                        raise Exception("The field '{}' of {} in the section '{}' is missing".format(field, name,
+                                                                                                   section))
+                elif not check(value):
+                    raise Exception("The field '{}' of {} in the section '{}' should be {}, not {}"
+                                    .format(field, name, section, description, value))
+            for field, value in record.items():
+                if field not in SUPERSTRUCTURE_SCHEMA[section] and not checkOther(value):
+                    raise Exception("The field '{}' of {} in the section '{}' should be {}, not {}"
+                                    .format(field, name, section, descriptionOther, value))
+            names.append(name)
+        doubleNames = sorted({name for name in names if names.count(name) > 1})
+        if doubleNames:
+            raise Exception("The names {} are used more than once in the section '{}'".format(doubleNames, section))
+
+    abbreviations = definition['abbreviations']
+    if not isinstance(abbreviations, dict) or not all(is_name(k) and isinstance(v, str)
+                                                      for k, v in abbreviations.items()):
+        raise Exception("The section 'abbreviations' should be a dictionary {'abbreviation': 'compound', ...}")
+
+    connectionMatrix = definition['connection_matrix']
+    if not isinstance(connectionMatrix, dict) or not isinstance(connectionMatrix.get('intervals'), list):
+        raise Exception("The section 'connection_matrix' should be a dictionary with the list of 'intervals'")
+    intervals = connectionMatrix['intervals']
+    rows = connectionMatrix.get('rows', intervals)
+    unknownBooleans = [name for name in connectionMatrix.get('booleans', {}) if name not in intervals or name not in rows]
+    if unknownBooleans:
+        raise Exception('The booleans of the intervals {} are given, but these intervals are not in the connection '
+                        'matrix'.format(unknownBooleans))
+    for connection in connectionMatrix.get('connections', []):
+        if connection.get('from') not in rows or connection.get('to') not in intervals:
+            raise Exception('The connection {} is between intervals that are not in the connection '
+                            'matrix'.format(connection))
+        stream = connection.get('stream')
+        if stream is not None and not re.fullmatch(r'sep\d+', str(stream)):
+            raise Exception("The stream of the connection {} should be 'sep1', 'sep2', ...".format(connection))
+
+
+# ============================================================================================================
+# From the cells of the Excel file to the typed fields and back
+# ============================================================================================================
+def cell_2_value(cell):
+    """ value of a cell of the Excel file in the text file (empty cells are None) """
+    if isinstance(cell, np.generic):
+        cell = cell.item()
+    if isinstance(cell, float) and np.isnan(cell):
+        return None
+    return cell
+
+
+def cell_2_typed_value(cell, fieldType, fieldName):
+    """ reads the string format of a cell (e.g., '[0,10e6]'), 0 or an empty cell means there is no value """
+    cell = cell_2_value(cell)
+    if fieldType == 'fractions' and is_number(cell):
+        return cell
+    if cell is None or (is_number(cell) and cell == 0):
+        return None
+    if not isinstance(cell, str):
+        raise Exception("The column '{}' should contain text, not {}".format(fieldName, cell))
+    try:
+        if fieldType == 'names':
+            if cell.strip().endswith('.json'):
+                return cell.strip()
+            return [name.strip() for name in cell.split(',')]
+        elif fieldType == 'fractions':
+            return [ast.literal_eval(fraction.strip()) for fraction in cell.split(',')]
+        elif fieldType == 'coefficients':
+            return [list(ast.literal_eval(coefficients.strip())) for coefficients in cell.split(';')]
+        elif fieldType == 'bounds':
+            return list(ast.literal_eval(cell.strip()))
+        else:  # bounds_dict, names_dict and numbers are written as python
+            return ast.literal_eval(cell.strip())
+    except (ValueError, SyntaxError):
+        raise Exception("The value '{}' of the column '{}' can not be read".format(cell, fieldName))
+
+
+def typed_value_2_cell(value, fieldType):
+    """ writes a typed field in the string format of the Excel file """
+    if value is None:
+        return 0
+    if fieldType in ('names', 'fractions'):
+        if isinstance(value, list):
+            return ', '.join(str(v) for v in value)
+        return value
+    elif fieldType == 'coefficients':
+        return ' ; '.join('[{}]'.format(', '.join(str(v) for v in row)) for row in value)
+    elif fieldType in ('bounds', 'numbers'):
+        return '[{}]'.format(', '.join(str(v) for v in value))
+    else:  # bounds_dict and names_dict
+        return repr(value)
+
+
+def connection_2_cell(connection):
+    """ code of a connection in the connection matrix: 1, 'sep1', 'sep1_split' or 'split' """
+    stream = connection.get('stream')
+    split = connection.get('split', False)
+    if stream and split:
+        return '{}_split'.format(stream)
+    elif stream:
+        return stream
+    elif split:
+        return 'split'
+    return 1
+
+
+def sheets_2_definition(sheets):
+    """ turns the sheets of the Excel file of a superstructure (see read_excel_sheets) into the dictionary of the text
+    file
+
+    Params:
+        sheets (dict): {sheet name: DF} without index columns
+
+    Returns:
+        definition (dict): the content of the text file (see the top of this file)
+    """
+    definition = {'format': 'alquimia superstructure', 'version': 1}
+    layout = {}
+    for sheet, nameColumn in SHEET_NAME_COLUMNS.items():
+        DF = sheets[sheet]
+        layout.update({sheet: list(DF.columns)})
+        typedColumns = TYPED_COLUMNS.get(sheet, {})
+        records = []
+        for row in DF.to_dict('records'):
+            record = {'name': cell_2_value(row[nameColumn])}
+            for column, cell in row.items():
+                field = column.strip()
+                if column == nameColumn:
+                    continue
+                if field in record:
+                    raise Exception("The column '{}' of the sheet '{}' is used twice".format(field, sheet))
+                if field in typedColumns:
+                    record.update({field: cell_2_typed_value(cell, typedColumns[field], field)})
+                else:
+                    record.update({field: cell_2_value(cell)})
+            records.append(record)
+        definition.update({sheet: records})
+
+    abbreviations = {}
+    for abbreviation, compound in zip(sheets['abbreviations']['abbreviation'], sheets['abbreviations']['compound']):
+        if abbreviation in abbreviations:
+            raise Exception("The abbreviation '{}' is defined twice".format(abbreviation))
+        abbreviations.update({abbreviation: compound})
+    definition.update({'abbreviations': abbreviations})
+    layout.update({'abbreviations': list(sheets['abbreviations'].columns)})
+
+    DFconnection = sheets['connection_matrix']
+    intervals = [column for column in DFconnection.columns if column != 'process_intervals']
+    rows = list(DFconnection['process_intervals'])
+    booleans = {}
+    connections = []
+    for fromInterval, row in zip(rows, DFconnection[intervals].to_dict('records')):
+        for toInterval, cell in row.items():
+            cell = cell_2_value(cell)
+            if cell is None or cell == 0:
+                continue
+            if isinstance(cell, str) and fromInterval == toInterval:
+                booleans.update({fromInterval: cell.strip()})
+                continue
+            connection = {'from': fromInterval, 'to': toInterval}
+            if isinstance(cell, str):
+                code = CONNECTION_CODE.match(cell.strip())
+                if code is None or not cell.strip():
+                    raise Exception("The code '{}' from {} to {} in the connection matrix is not known, use 1, "
+                                    "'sep1', 'sep1_split' or 'split'".format(cell, fromInterval, toInterval))
+                if code.group(1):
+                    connection.update({'stream': code.group(1)})
+                if code.group(2):
+                    connection.update({'split': True})
+            elif cell != 1:
+                raise Exception("The code '{}' from {} to {} in the connection matrix is not known, use 1, 'sep1', "
+                                "'sep1_split' or 'split'".format(cell, fromInterval, toInterval))
+            connections.append(connection)
+    connectionMatrix = {'intervals': intervals}
+    if rows != intervals:
+        connectionMatrix.update({'rows': rows})
+    connectionMatrix.update({'booleans': booleans, 'connections': connections})
+    definition.update({'connection_matrix': connectionMatrix, 'layout': layout})
+    return definition
+
+
+def definition_2_sheets(definition, validate=True):
+    """ turns the dictionary of the text file into the sheets of the Excel file (see read_excel_sheets)
+
+    Params:
+        definition (dict): the content of the text file
+        validate (bool): check the definition first (see validate_superstructure_definition)
+
+    Returns:
+        sheets (dict): {sheet name: DF} without index columns
+    """
+    if validate:
+        validate_superstructure_definition(definition)
+    layout = definition.get('layout', {})
+
+    sheets = {}
+    for sheet, nameColumn in SHEET_NAME_COLUMNS.items():
+        records = definition[sheet]
+        typedColumns = TYPED_COLUMNS.get(sheet, {})
+        columns = layout.get(sheet)
+        if columns is None:
+            columns = [nameColumn] + list(dict.fromkeys(field for record in records for field in record
+                                                        if field != 'name'))
+        data = {}
+        for column in columns:
+            field = 'name' if column == nameColumn else column.strip()
+            if field in typedColumns:
+                data.update({column: [typed_value_2_cell(record.get(field), typedColumns[field])
+                                      for record in records]})
+            else:
+                data.update({column: [np.nan if record.get(field) is None else record.get(field)
+                                      for record in records]})
+        sheets.update({sheet: pd.DataFrame(data, columns=columns)})
+
+    abbreviationColumns = layout.get('abbreviations', ['abbreviation', 'compound'])
+    sheets.update({'abbreviations': pd.DataFrame({abbreviationColumns[0]: list(definition['abbreviations'].keys()),
+                                                  abbreviationColumns[1]: list(definition['abbreviations'].values())})})
+
+    connectionMatrix = definition['connection_matrix']
+    intervals = connectionMatrix['intervals']
+    rows = connectionMatrix.get('rows', intervals)
+    rowIndex = {name: i for i, name in enumerate(rows)}
+    cells = {toInterval: [0] * len(rows) for toInterval in intervals}
+    for fromInterval, boolean in connectionMatrix.get('booleans', {}).items():
+        cells[fromInterval][rowIndex[fromInterval]] = boolean
+    for connection in connectionMatrix.get('connections', []):
+        cells[connection['to']][rowIndex[connection['from']]] = connection_2_cell(connection)
+    sheets.update({'connection_matrix': pd.DataFrame({'process_intervals': rows, **cells},
+                                                     columns=['process_intervals'] + intervals)})
+    return sheets
+
+
+# ============================================================================================================
+# Reading and writing the text files
+# ============================================================================================================
+def read_superstructure_file(location):
+    """ reads the dictionary of a json, yaml or toml file of a superstructure """
+    extension = os.path.splitext(location)[1].lower()
+    if extension not in SUPERSTRUCTURE_FILE_EXTENSIONS:
+        raise Exception('The superstructure file should be one of {}, not {}'.format(SUPERSTRUCTURE_FILE_EXTENSIONS,
+                                                                                   location))
+    if extension == '.json':
+        with open(location, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    elif extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise Exception('PyYAML is needed to read yaml files, install it or use a json file')
+        with open(location, 'r', encoding='utf-8') as f:
+            return yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+    else:
+        try:
+            import tomllib
+        except ImportError:  # python < 3.11
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise Exception('tomli is needed to read toml files with python < 3.11, install it or use a json file')
+        with open(location, 'rb') as f:
+            return tomllib.load(f)
+
+
+def remove_none(value):
+    """ toml has no empty values, the fields that are None are left out (they are read as None) """
+    if isinstance(value, dict):
+        return {key: remove_none(v) for key, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [remove_none(v) for v in value]
+    return value
+
+
+def write_superstructure_file(definition, location):
+    """ writes the dictionary of a superstructure to a json, yaml or toml file """
+    extension = os.path.splitext(location)[1].lower()
+    if extension not in SUPERSTRUCTURE_FILE_EXTENSIONS:
+        raise Exception('The superstructure file should be one of {}, not {}'.format(SUPERSTRUCTURE_FILE_EXTENSIONS,
+                                                                                   location))
+    if extension == '.json':
+        with open(location, 'w', encoding='utf-8') as f:
+            json.dump(definition, f, ensure_ascii=False, indent=2)
+    elif extension in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise Exception('PyYAML is needed to write yaml files, install it or use a json file')
+        with open(location, 'w', encoding='utf-8') as f:
+            yaml.dump(definition, f, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper), sort_keys=False,
+                      allow_unicode=True)
+    else:
+        try:
+            import tomli_w
+        except ImportError:
+            raise Exception('tomli_w is needed to write toml files, install it or use a json file')
+        with open(location, 'wb') as f:
+            tomli_w.dump(remove_none(definition), f)
+
+
+def read_superstructure_file_sheets(location):
+    """ reads the text file of a superstructure and returns the sheets of the Excel file (see read_excel_sheets) """
+    return definition_2_sheets(read_superstructure_file(location))
+
+
+# ============================================================================================================
+# Converting the Excel files
+# ============================================================================================================
+def excel_2_superstructure_file(excelName, fileName):
+    """ converts the Excel file of a superstructure to a json, yaml or toml file (saved next to the Excel file if
+    fileName is not a location)
+
+    Returns:
+        definition (dict): the content of the text file
+    """
+    # imported here because f_make_super_structure reads the text files with this module
+    from f_make_super_structure import read_excel_sheets, get_superstructure_location
+    definition = sheets_2_definition(read_excel_sheets(excelName))
+    validate_superstructure_definition(definition)
+    write_superstructure_file(definition, get_superstructure_location(fileName, exists=False))
+    return definition
+
+
+def superstructure_file_2_excel(fileName, excelName):
+    """ converts the json, yaml or toml file of a superstructure to an Excel file with the sheets of the superstructure
+    (saved in 'excel files' if excelName is not a location) """
+    from f_make_super_structure import EXCEL_SHEETS, get_superstructure_location
+    sheets = read_superstructure_file_sheets(get_superstructure_location(fileName))
+    with pd.ExcelWriter(get_superstructure_location(excelName, exists=False)) as writer:
+        for sheet in EXCEL_SHEETS:
+            sheets[sheet].to_excel(writer, sheet_name=sheet, index=False)
@@ -0,0 +1,616 @@
+"""
+Lightweight symbolic representation of the superstructure equations
+
+Instead of writing the equations as python source strings (e.g., "model.var['x'] == 0.3 * model.var['y']") which
+then need to be evaluated with eval(), the interval objects can also emit the equations as sums of terms over variable
+keys. A variable key is a tuple (component, index) e.g., ('var', 'x'), ('boolVar', 'y_acidi') or
+('fractionVar', 'split_fraction_P_acidi'). These expressions are turned into pyomo expressions without eval.
+"""
+
+import functools
+import re
+import pyomo.environ as pe
+
+# components of the model that are parameters (not variables), e.g., model.price['glu'] is the (mutable) price of glu
+PARAMETER_COMPONENTS = ('price',)
+
+
+# ============================================================================================================
+# Symbolic expressions and equations
+# ============================================================================================================
+
+class SymbolicExpression:
+    def __init__(self, terms=None, denominator=None):
+        """ A polynomial over variable keys, optionally divided by another polynomial
+
+        Params:
+            terms (dict): {monomial: coefficient} where a monomial is a sorted tuple of (variable key, power) pairs.
+                          The empty tuple () is the monomial of the constant
+            denominator (SymbolicExpression): polynomial dividing the terms (None if there is no division)
+        """
+        if terms is None:
+            terms = {}
+        self.terms = {monomial: coef for monomial, coef in terms.items() if coef != 0}
+        self.denominator = denominator
+
+    # ------------------------------------------------------------------------------- arithmetic
+    def __add__(self, other):
+        other = to_symbolic(other)
+        if self.denominator is None and other.denominator is None:
+            terms = dict(self.terms)
+            for monomial, coef in other.terms.items():
+                terms[monomial] = terms.get(monomial, 0) + coef
+            return SymbolicExpression(terms)
+        # a/b + c/d = (a*d + c*b) / (b*d)
+        numerator = self.numerator() * other.get_denominator() + other.numerator() * self.get_denominator()
+        return numerator / (self.get_denominator() * other.get_denominator())
+
+    def __radd__(self, other):
+        return to_symbolic(other) + self
+
+    def __sub__(self, other):
+        return self + (-1) * to_symbolic(other)
+
+    def __rsub__(self, other):
+        return to_symbolic(other) + (-1) * self
+
+    def __neg__(self):
+        return (-1) * self
+
+    def __mul__(self, other):
+        other = to_symbolic(other)
+        terms = {}
+        for monomial1, coef1 in self.terms.items():
+            for monomial2, coef2 in other.terms.items():
+                monomial = multiply_monomials(monomial1, monomial2)
+                terms[monomial] = terms.get(monomial, 0) + coef1 * coef2
+        product = SymbolicExpression(terms)
+        if self.denominator is None and other.denominator is None:
+            return product
+        return product / (self.get_denominator() * other.get_denominator())
+
+    def __rmul__(self, other):
+        return to_symbolic(other) * self
+
+    def __truediv__(self, other):
+        other = to_symbolic(other)
+        if other.is_constant():
+            constant = other.constant_value()
+            if constant == 0:
+                raise Exception('Division by zero in the symbolic expression {}'.format(self))
+            numerator = SymbolicExpression({m: c / constant for m, c in self.numerator().terms.items()})
+            if self.denominator is None:
+                return numerator
+            return SymbolicExpression(numerator.terms, denominator=self.denominator)
+        denominator = self.get_denominator() * other.numerator()
+        numerator = self.numerator() * other.get_denominator()
+        return SymbolicExpression(numerator.terms, denominator=denominator)
+
+    def __rtruediv__(self, other):
+        return to_symbolic(other) / self
+
+    def __pow__(self, power):
+        if isinstance(power, SymbolicExpression):
+            if not power.is_constant():
+                raise Exception('Only constant powers can be used in symbolic expressions, not {}'.format(power))
+            power = power.constant_value()
+        if power != int(power):
+            raise Exception('Only integer powers can be used in symbolic expressions, not {}'.format(power))
+        power = int(power)
+        result = to_symbolic(1)
+        for _ in range(abs(power)):
+            result = result * self
+        if power < 0:
+            result = 1 / result
+        return result
+
+    # ------------------------------------------------------------------------------- helping functions
+    def numerator(self):
+        return SymbolicExpression(self.terms)
+
+    def get_denominator(self):
+        if self.denominator is None:
+            return to_symbolic(1)
+        return self.denominator
+
+    def is_constant(self):
+        return self.denominator is None and all(monomial == () for monomial in self.terms)
+
+    def constant_value(self):
+        return self.terms.get((), 0)
+
+    def is_linear(self):
+        """ True if there are only constant and linear terms (and no division), parameters count as constants """
+        if self.denominator is not None:
+            return False
+        for monomial in self.terms:
+            degree = sum(power for (component, index), power in monomial if component not in PARAMETER_COMPONENTS)
+            if degree > 1:
+                return False
+        return True
+
+    def variables(self):
+        """ returns the set of variable keys in the expression """
+        variableKeys = set()
+        for monomial in self.terms:
+            for varKey, power in monomial:
+                variableKeys.add(varKey)
+        if self.denominator is not None:
+            variableKeys |= self.denominator.variables()
+        return variableKeys
+
+    def substitute(self, substitutionDict):
+        """ replaces variable keys with other variable keys or expressions in one pass
+
+        Params:
+            substitutionDict (dict): {variable key: new variable key, SymbolicExpression or number}
+
+        Returns:
+            SymbolicExpression
+        """
+        if not any(varKey in substitutionDict for varKey in self.variables()):
+            return self
+        result = to_symbolic(0)
+        for monomial, coef in self.terms.items():
+            term = to_symbolic(coef)
+            for varKey, power in monomial:
+                if varKey in substitutionDict:
+                    factor = substitutionDict[varKey]
+                    if isinstance(factor, tuple):
+                        factor = sym_var(factor[1], component=factor[0])
+                    term = term * to_symbolic(factor) ** power
+                else:
+                    term = term * SymbolicExpression({((varKey, power),): 1})
+            result = result + term
+        if self.denominator is not None:
+            result = result / self.denominator.substitute(substitutionDict)
+        return result
+
+    def rename(self, replacementDict, component='var'):
+        """ renames the indexes of variables of one component e.g., {'glu': 'glu_P_acidi_mix'} """
+        substitutionDict = {(component, old): (component, new) for old, new in replacementDict.items()}
+        return self.substitute(substitutionDict)
+
+    # ------------------------------------------------------------------------------- conversion
+    def to_pyomo(self, model, varMap=None):
+        """ turns the expression into a pyomo expression of the components of the model
+
+        Params:
+            model (pyomo model): model holding the components (e.g., model.var)
+            varMap (dict): optional {variable key: pyomo variable}, used when the variables are not components of the
+                           model itself (e.g., when they are declared in the blocks of the intervals)
+        """
+        numerator = pe.quicksum(monomial_2_pyomo(model, monomial, coef, varMap) for monomial, coef in
+                                self.terms.items())
+        if self.denominator is None:
+            return numerator
+        return numerator / self.denominator.to_pyomo(model, varMap)
+
+    def to_string(self):
+        """ writes the expression in the same format as the string equations """
+        if not self.terms:
+            strExpr = '0'
+        else:
+            strExpr = ' + '.join(monomial_2_string(monomial, coef) for monomial, coef in self.terms.items())
+        if self.denominator is not None:
+            strExpr = '({}) / ({})'.format(strExpr, self.denominator.to_string())
+        return strExpr
+
+    def __str__(self):
+        return self.to_string()
+
+    def __repr__(self):
+        return 'SymbolicExpression({})'.format(self.to_string())
+
+
+class SymbolicEquation:
+    def __init__(self, lhs, rhs, sense='=='):
+        """ an equation (or inequality) between two symbolic expressions
+
+        Params:
+            lhs (SymbolicExpression, number): left hand side
+            rhs (SymbolicExpression, number): right hand side
+            sense (str): '==' or '<='
+        """
+        if sense not in ('==', '<='):
+            raise Exception("The sense of a symbolic equation can only be '==' or '<=', not '{}'".format(sense))
+        self.lhs = to_symbolic(lhs)
+        self.rhs = to_symbolic(rhs)
+        self.sense = sense
+
+    def make_bool_dependent(self, booleanVariable):
+        """ multiplies the right hand side with the boolean variable (same as make_eqation_bool_dependent) """
+        return SymbolicEquation(self.lhs, self.rhs * sym_bool(booleanVariable), self.sense)
+
+    def substitute(self, substitutionDict, side='both'):
+        """ substitutes variables in the equation, side can be 'both', 'lhs' or 'rhs' """
+        lhs = self.lhs.substitute(substitutionDict) if side in ('both', 'lhs') else self.lhs
+        rhs = self.rhs.substitute(substitutionDict) if side in ('both', 'rhs') else self.rhs
+        return SymbolicEquation(lhs, rhs, self.sense)
+
+    def rename(self, replacementDict, component='var', side='both'):
+        substitutionDict = {(component, old): (component, new) for old, new in replacementDict.items()}
+        return self.substitute(substitutionDict, side=side)
+
+    def variables(self):
+        return self.lhs.variables() | self.rhs.variables()
+
+    def get_choice_set(self, boolComponent='boolVar'):
+        """ checks if the equation is a choice set of booleans: 1 == y1 + y2 + ... (exactly one interval is chosen)
+
+        Returns:
+            None if the equation is not a choice set, otherwise the list of the names of the boolean variables
+        """
+        if self.sense != '==' or not self.lhs.is_constant() or self.lhs.constant_value() != 1 \
+                or self.rhs.denominator is not None:
+            return None
+        boolNames = []
+        for monomial, coef in self.rhs.terms.items():
+            if len(monomial) != 1 or coef != 1 or monomial[0][1] != 1 or monomial[0][0][0] != boolComponent:
+                return None
+            boolNames.append(monomial[0][0][1])
+        return boolNames if boolNames else None
+
+    def get_bool_product(self, boolComponent='boolVar'):
+        """ checks if the equation has the form: otherSide == (expression) * y, with y a boolean variable
+        (see make_bool_dependent). Terms of the right side without y are moved to the other side.
+
+        Returns:
+            None if the equation does not have this form, otherwise a tuple:
+            boolKey (tuple): key of the boolean variable y e.g., ('boolVar', 'y_acidi')
+            otherSide (SymbolicExpression): left side (minus the terms of the right side without y)
+            productExpression (SymbolicExpression): the expression multiplied by y
+        """
+        if self.sense != '==' or self.lhs.denominator is not None or self.rhs.denominator is not None:
+            return None
+        boolKeys = {varKey for varKey in self.rhs.variables() if varKey[0] == boolComponent}
+        if len(boolKeys) != 1 or any(varKey[0] == boolComponent for varKey in self.lhs.variables()):
+            return None
+        boolKey = boolKeys.pop()
+
+        productTerms = {}
+        otherSide = self.lhs
+        for monomial, coef in self.rhs.terms.items():
+            powers = dict(monomial)
+            if boolKey not in powers:
+                otherSide = otherSide - SymbolicExpression({monomial: coef})
+            elif powers[boolKey] == 1:
+                del powers[boolKey]
+                productTerms.update({tuple(sorted(powers.items())): coef})
+            else:
+                return None
+        if not productTerms:
+            return None
+        return boolKey, otherSide, SymbolicExpression(productTerms)
+
+    def is_linear(self):
+        return self.lhs.is_linear() and self.rhs.is_linear()
+
+    def to_pyomo(self, model, varMap=None):
+        lhs = self.lhs.to_pyomo(model, varMap)
+        rhs = self.rhs.to_pyomo(model, varMap)
+        if self.sense == '==':
+            return lhs == rhs
+        return lhs <= rhs
+
+    def to_string(self):
+        return '{} {} {}'.format(self.lhs.to_string(), self.sense, self.rhs.to_string())
+
+    def __str__(self):
+        return self.to_string()
+
+    def __repr__(self):
+        return 'SymbolicEquation({})'.format(self.to_string())
+
+
+# ============================================================================================================
+# Functions to make symbolic expressions
+# ============================================================================================================
+
+def sym_var(name, component='var'):
+    """ makes a symbolic variable e.g., sym_var('x') is model.var['x'] """
+    return SymbolicExpression({(((component, name), 1),): 1})
+
+
+def sym_bool(name):
+    """ makes a symbolic boolean variable i.e., model.boolVar['name'] """
+    return sym_var(name, component='boolVar')
+
+
+def sym_fraction(name):
+    """ makes a symbolic fraction variable i.e., model.fractionVar['name'] """
+    return sym_var(name, component='fractionVar')
+
+
+def sym_param(name, component='price'):
+    """ makes a symbolic (mutable) parameter i.e., model.price['name'] """
+    return sym_var(name, component=component)
+
+
+def sym_sum(expressions):
+    """ sums a list of symbolic expressions (or variable names of model.var) """
+    terms = {}
+    denominatorPresent = False
+    expressionList = []
+    for expr in expressions:
+        if isinstance(expr, str):
+            expr = sym_var(expr)
+        else:
+            expr = to_symbolic(expr)
+        if expr.denominator is not None:
+            denominatorPresent = True
+        expressionList.append(expr)
+
+    if denominatorPresent:
+        result = to_symbolic(0)
+        for expr in expressionList:
+            result = result + expr
+        return result
+
+    for expr in expressionList:
+        for monomial, coef in expr.terms.items():
+            terms[monomial] = terms.get(monomial, 0) + coef
+    return SymbolicExpression(terms)
+
+
+def to_symbolic(value):
+    """ transforms numbers into symbolic (constant) expressions """
+    if isinstance(value, SymbolicExpression):
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        try:
+            value = float(value)  # e.g., numpy floats
+        except (TypeError, ValueError):
+            raise Exception("The value '{}' can not be transformed into a symbolic expression".format(value))
+    return SymbolicExpression({(): value})
+
+
+def multiply_monomials(monomial1, monomial2):
+    powers = dict(monomial1)
+    for varKey, power in monomial2:
+        powers[varKey] = powers.get(varKey, 0) + power
+    return tuple(sorted(powers.items()))
+
+
+def monomial_2_pyomo(model, monomial, coef, varMap=None):
+    term = coef
+    for (component, index), power in monomial:
+        try:
+            if varMap is not None:
+                pyomoVar = varMap[(component, index)]
+            else:
+                pyomoVar = getattr(model, component)[index]
+        except (AttributeError, KeyError):
+            raise Exception("The variable model.{}['{}'] is not declared in the pyomo model".format(component, index))
+        if power == 1:
+            term = term * pyomoVar
+        else:
+            term = term * pyomoVar ** power
+    return term
+
+
+def monomial_2_string(monomial, coef):
+    factors = []
+    for (component, index), power in monomial:
+        factor = "model.{}['{}']".format(component, index)
+        if power != 1:
+            factor += '**{}'.format(power)
+        factors.append(factor)
+    if not factors:
+        return '{}'.format(coef)
+    if coef == 1:
+        return ' * '.join(factors)
+    return '{} * {}'.format(coef, ' * '.join(factors))
+
+
+# ============================================================================================================
+# Parse string equations into symbolic equations
+# ============================================================================================================
+
+def get_token_regex(names=None):
+    """ the regular expression of the tokens of the string equations (see tokenize_equation)
+
+    Params:
+        names (list): names that can contain special characters (e.g., 'D-Glucose') and should be read as one name
+
+    Returns:
+        tokenRegex (compiled regex): the groups are 'ref', 'special', 'number', 'name', 'op' and 'space'
+    """
+    if names is None:
+        names = []
+    # longest names first, so 'ace_sep1' is found before 'ace'
+    specialNames = sorted({n for n in names if n and not re.fullmatch(r'[A-Za-z_]\w*', n)}, key=len, reverse=True)
+    return _compile_token_regex(tuple(specialNames))
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_token_regex(specialNames):
+    patterns = [r"(?P<ref>model\.(\w+)\[\s*'([^']*)'\s*\])"]
+    if specialNames:
+        patterns.append(r"(?P<special>(?:{})(?![\w]))".format('|'.join(re.escape(n) for n in specialNames)))
+    patterns += [r"(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)",
+                 r"(?P<name>[A-Za-z_]\w*)",
+                 r"(?P<op>==|<=|>=|\*\*|[-+*/()])",
+                 r"(?P<space>\s+)"]
+    return re.compile('|'.join(patterns))
+
+
+def tokenize_equation(equation, names=None):
+    """ splits a string equation into tokens
+
+    Params:
+        equation (str): string equation e.g., "prop == + D-Glucose * 0.28" or "model.var['x'] == 2 * model.var['y']"
+        names (list): names that can contain special characters (e.g., 'D-Glucose') and should be read as one name
+
+    Returns:
+        tokens (list): list of tuples (type, value), type is 'number', 'name', 'ref' or 'op'
+    """
+    tokenRegex = get_token_regex(names)
+
+    tokens = []
+    position = 0
+    while position < len(equation):
+        match = tokenRegex.match(equation, position)
+        if not match:
+            raise Exception("The equation '{}' can not be read from the character '{}' onwards (position {})"
+                            "".format(equation, equation[position:], position))
+        kind = match.lastgroup
+        if kind == 'ref':
+            tokens.append(('ref', (match.group(2), match.group(3))))
+        elif kind == 'special' or kind == 'name':
+            tokens.append(('name', match.group(kind)))
+        elif kind == 'number':
+            tokens.append(('number', float(match.group(kind))))
+        elif kind == 'op':
+            tokens.append(('op', match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def substitute_names(equation, replacementDict, names=None, referenceDict=None):
+    """ replaces the names of a string equation in one pass over its tokens (see tokenize_equation). Only whole names
+    are replaced, so 'ace' is not replaced in 'ace_sep1' nor in model.var['ace_P_acidi'], the rest of the equation
+    (numbers, operators, spaces) is kept as it is written
+
+    Params:
+        equation (str): string equation e.g., "prop == + D-Glucose * 0.28"
+        replacementDict (dict): {name: the text that replaces the name} e.g., {'D-Glucose': "model.var['glu_P_acidi']"}
+        names (list): other names that can contain special characters and should be read as one name (the keys of
+                      the replacementDict are always read as one name)
+        referenceDict (dict): {index: new index} renames the index of the references to the model
+                              e.g., {'Q_tot': 'energy'} makes model.var['energy'] of model.var['Q_tot']
+
+    Returns:
+        equation (str): the equation with the names replaced
+    """
+    if names is None:
+        names = []
+    if referenceDict is None:
+        referenceDict = {}
+    tokenRegex = get_token_regex(list(names) + list(replacementDict))
+
+    pieces = []
+    position = 0
+    while position < len(equation):
+        match = tokenRegex.match(equation, position)
+        if not match:  # characters that are not part of the grammar of the equations are kept
+            pieces.append(equation[position])
+            position += 1
+            continue
+        kind = match.lastgroup
+        text = match.group()
+        if (kind == 'name' or kind == 'special') and text in replacementDict:
+            text = replacementDict[text]
+        elif kind == 'ref' and match.group(3) in referenceDict:
+            text = "model.{}['{}']".format(match.group(2), referenceDict[match.group(3)])
+        pieces.append(text)
+        position = match.end()
+    return ''.join(pieces)
+
+
+class _EquationParser:
+    """ recursive descent parser for the grammar of the string equations (+, -, *, /, ** and brackets) """
+
+    def __init__(self, tokens, equation):
+        self.tokens = tokens
+        self.position = 0
+        self.equation = equation
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def error(self, message):
+        raise Exception("{} in the equation '{}'".format(message, self.equation))
+
+    def expression(self):
+        result = self.term()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            op = self.take()[1]
+            if op == '+':
+                result = result + self.term()
+            else:
+                result = result - self.term()
+        return result
+
+    def term(self):
+        result = self.factor()
+        while self.peek() in (('op', '*'), ('op', '/')):
+            op = self.take()[1]
+            if op == '*':
+                result = result * self.factor()
+            else:
+                result = result / self.factor()
+        return result
+
+    def factor(self):
+        if self.peek() == ('op', '+'):
+            self.take()
+            return self.factor()
+        if self.peek() == ('op', '-'):
+            self.take()
+            return -self.factor()
+        return self.power()
+
+    def power(self):
+        base = self.atom()
+        if self.peek() == ('op', '**'):
+            self.take()
+            return base ** self.factor()
+        return base
+
+    def atom(self):
+        kind, value = self.take()
+        if kind == 'number':
+            return to_symbolic(value)
+        if kind == 'name':
+            return sym_var(value)
+        if kind == 'ref':
+            return sym_var(value[1], component=value[0])
+        if (kind, value) == ('op', '('):
+            result = self.expression()
+            if self.take() != ('op', ')'):
+                self.error('Missing a closing bracket')
+            return result
+        self.error("Unexpected token '{}'".format(value))
+
+
+def str_2_symbolic_expression(expression, names=None):
+    """ parses a string expression (without '==') into a SymbolicExpression, bare names become model.var """
+    tokens = tokenize_equation(expression, names)
+    parser = _EquationParser(tokens, expression)
+    result = parser.expression()
+    if parser.position != len(tokens):
+        parser.error("Unexpected token '{}'".format(parser.peek()[1]))
+    return result
+
+
+def str_2_symbolic_equation(equation, names=None):
+    """ parses a string equation e.g., "prop == 0.3 * glu" into a SymbolicEquation. Names that are not written as
+    model.component['name'] are read as model.var['name'] so they can be renamed afterwards.
+
+    Params:
+        equation (str): the string equation
+        names (list): names that can contain special characters (e.g., 'D-Glucose')
+
+    Returns:
+        SymbolicEquation
+    """
+    tokens = tokenize_equation(equation, names)
+    parser = _EquationParser(tokens, equation)
+    lhs = parser.expression()
+    kind, sense = parser.take()
+    if kind != 'op' or sense not in ('==', '<=', '>='):
+        parser.error("Missing '==' or '<='")
+    rhs = parser.expression()
+    if parser.position != len(tokens):
+        parser.error("Unexpected token '{}'".format(parser.peek()[1]))
+    if sense == '>=':
+        return SymbolicEquation(rhs, lhs, '<=')
+    return SymbolicEquation(lhs, rhs, sense)
@@ -1,5 +1,8 @@
 import os
 import json
+import pickle
+import hashlib
+import warnings
 
 ########################################################################################################################
 # ============================================================================================================
@@ -91,11 +94,14 @@ def str_2_dict(string, intervalname):
 
 def get_location(file, case = ''):
     """ gets the file location from the Directory 'Excel files'
+    case 'analysis' gives the folder of the analysis of a SBML model in 'SBML screening/Excel analysis'
     """
     loc = os.getcwd()
     posAlquimia = loc.find('Alquimia')
     loc = loc[0:posAlquimia + 8]
 
+    if case == 'analysis':  # see f_screen_SBML.get_analysis_folder
+        return os.path.join(loc, 'SBML screening', 'Excel analysis', file)
 
     if '/' in loc:  # in the case of macOS
         file = r"/{}".format(file)
@@ -155,3 +161,51 @@ def transform_dictionary(input_dict):
             output_dict[key2][key1] = value2
 
     return output_dict
+
+
+def get_file_hash(location):
+    """ sha256 hash of the content of a file """
+    with open(location, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def get_file_stamp(location):
+    """ size and modification time of a file, if these did not change the file did not change """
+    fileStats = os.stat(location)
+    return (fileStats.st_size, fileStats.st_mtime_ns)
+
+
+def load_pickle_cache(cacheLocation, sourceLocation, fileStamp, inputs=None):
+    """ reads the data saved with save_pickle_cache. The data is only used if the source file did not change (the same
+    stamp, see get_file_stamp, or the same hash) and if it is made with the same inputs
+
+    Params:
+        cacheLocation (str): location of the pickle file
+        sourceLocation (str): location of the file the data is made from (e.g., the xml file of a SBML model)
+        fileStamp (tuple): the current stamp of the source file
+        inputs: the other inputs the data is made with (e.g., the arguments of a function), compared with ==
+
+    Returns:
+        data: the saved data, None if there is no cache or it does not match the source file or the inputs
+    """
+    try:
+        with open(cacheLocation, 'rb') as f:
+            cache = pickle.load(f)
+        if cache['inputs'] == inputs and (cache['stamp'] == fileStamp
+                                          or cache['hash'] == get_file_hash(sourceLocation)):
+            return cache['data']
+    except Exception:
+        # no cache, or it is made by another version of the package of the data (e.g., cobra or pandas)
+        pass
+    return None
+
+
+def save_pickle_cache(cacheLocation, data, sourceLocation, fileStamp, inputs=None):
+    """ saves data to a pickle file together with the stamp and hash of its source file and its inputs, so
+    load_pickle_cache can check that the data is still valid """
+    try:
+        cache = {'stamp': fileStamp, 'hash': get_file_hash(sourceLocation), 'inputs': inputs, 'data': data}
+        with open(cacheLocation, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        warnings.warn('The cache could not be saved to {}'.format(cacheLocation))